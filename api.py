@@ -0,0 +1,364 @@
+"""
+HTTP-API für die Berechnung ohne Streamlit
+
+Kleiner asynchroner HTTP-Dienst (asyncio, ohne weitere Abhängigkeiten) um dieselbe Berechnung wie
+app.py (pipeline.py). Ein Perimeter wird als GeoJSON gesendet; die Antwort enthält die Briefkästen,
+Wohnungen und Geschäfte sowie die Detailtabellen als JSON.
+
+Jede Berechnung ist ein Job mit Status und Fortschritt, der abgefragt werden kann, solange er läuft.
+Gleichzeitige Anfragen für denselben Perimeter (gleicher Schlüssel wie im Resultat-Cache) werden
+zusammengelegt und nur einmal berechnet; fertige Resultate kommen aus dem Resultat-Cache. Alle Jobs
+laufen im selben Prozess und teilen sich Verbindungspool, Antwort-Cache und DuckDB-Verbindung.
+
+Endpunkte:
+    POST /jobs[?wait=1]  GeoJSON-Geometrie oder -Feature; 202 mit dem Job, 200 wenn bereits fertig
+                         (mit wait=1 wird auf das Resultat gewartet, 500 wenn der Job fehlschlägt)
+    GET  /jobs/<id>      Status, Fortschritt und (wenn fertig) Resultat des Jobs
+    GET  /health         Anzahl Jobs, Zähler des GeoAdmin-Clients und Cache-Statistik
+
+Aufruf:
+    python api.py [--host 127.0.0.1] [--port 8080]
+
+Für lokale Tests ohne Netzwerk kann JobManager eine eigene calculate-Funktion übergeben werden, oder
+die GeoAdmin API mit GEOADMIN_ENDPOINT auf einen lokalen Stub umgeleitet werden.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+from shapely.errors import ShapelyError
+from shapely.geometry import shape
+
+from geoadmin import BACKEND, get_client_stats
+from overture_release import get_release
+from pipeline import calculate as pipeline_calculate
+from response_cache import get_cache
+from result_cache import get_result_cache, result_key
+
+API_HOST = os.environ.get("API_HOST", "127.0.0.1")
+API_PORT = int(os.environ.get("API_PORT", "8080"))
+
+# Gleichzeitig laufende Berechnungen; jede fragt selbst mit GEOADMIN_MAX_WORKERS Verbindungen ab
+JOB_WORKERS = int(os.environ.get("API_JOB_WORKERS", "2"))
+
+# Fertige Jobs werden so lange (Sekunden) zum Abfragen behalten
+JOB_TTL = int(os.environ.get("API_JOB_TTL", str(60 * 60)))
+
+# Zellfläche des festen Rasters, wie in app.py
+MAX_AREA = 0.000005
+
+# Grösster zulässiger Perimeter mit der GeoAdmin API (ca. 150 km², wie in app.py)
+MAX_POLYGON_AREA = 0.015
+
+MAX_BODY_BYTES = 1024 * 1024
+
+
+def calculate(polygon, on_result=None):
+    """Berechnet einen Perimeter wie app.py, ohne Anzeige (siehe pipeline.calculate)."""
+    return pipeline_calculate(polygon, MAX_AREA, on_result=on_result)
+
+
+def calculation_to_json(calculation):
+    """Wandelt das Resultat von calculate in ein JSON-serialisierbares dict um."""
+    gwr_result = calculation["gwr_result"]
+    return {
+        "briefkaesten": gwr_result.total_wohnungen + calculation["total_geschaefte"],
+        "wohnungen": gwr_result.total_wohnungen,
+        "adressen": gwr_result.total_adressen,
+        "geschaefte": calculation["total_geschaefte"],
+        "overture_release": calculation["release_date"],
+        "fetch_stats": calculation["fetch_stats"],
+        "wohnungen_nach_adresse": [{"Adresse": a, "Wohnungen": c} for a, c in sorted(gwr_result.wohnungen_by_streetnr.items())],
+        "wohnungen_nach_strasse": [{"Strasse": s, "Wohnungen": c} for s, c in sorted(gwr_result.wohnungen_by_street.items())],
+        "geschaefte_nach_adresse": calculation["total_places_pro_adresse_df"].to_pylist(),
+        "geschaefte_liste": calculation["place_and_address_df"].to_pylist(),
+    }
+
+
+@dataclass(slots=True)
+class Job:
+    """Eine Berechnung mit Status und Fortschritt.
+
+    Attributes:
+        id (str): Kennung für GET /jobs/<id>.
+        key (str): Schlüssel im Resultat-Cache (Perimeter und Datenversionen).
+        status (str): "running", "done" oder "failed".
+        done (int): Abgefragte Zellen.
+        total (int): Bisher bekannte Anzahl Zellen (wächst, wenn Zellen geteilt werden).
+        result (dict): Resultat von calculation_to_json, sobald fertig.
+        error (str): Fehlermeldung, wenn fehlgeschlagen.
+        created (float): Startzeit (time.time()).
+        finished (float): Endzeit, oder None solange der Job läuft.
+        cached (bool): Resultat kam aus dem Resultat-Cache.
+    """
+
+    id: str
+    key: str
+    status: str = "running"
+    done: int = 0
+    total: int = 0
+    result: dict = None
+    error: str = None
+    created: float = field(default_factory=time.time)
+    finished: float = None
+    cached: bool = False
+    future: asyncio.Future = None
+
+    def to_json(self):
+        """Gibt den Job als JSON-serialisierbares dict zurück."""
+        job = {
+            "id": self.id,
+            "status": self.status,
+            "progress": {"done": self.done, "total": self.total},
+            "cached": self.cached,
+            "seconds": round((self.finished or time.time()) - self.created, 3),
+        }
+        if self.result is not None:
+            job["result"] = self.result
+        if self.error is not None:
+            job["error"] = self.error
+        return job
+
+
+class JobManager:
+    """Startet und verwaltet die Jobs; gleiche Perimeter werden zusammengelegt.
+
+    Alle Methoden laufen in der Event-Loop; nur die Berechnung selbst läuft in einem Thread-Pool.
+
+    Args:
+        calculate (callable, optional): Funktion (polygon, on_result) -> Resultat wie calculate. Für
+            Tests mit Stubs austauschbar. Standard: calculate.
+        workers (int, optional): Gleichzeitig laufende Berechnungen. Standard: JOB_WORKERS.
+    """
+
+    def __init__(self, calculate=calculate, workers=JOB_WORKERS):
+        self.calculate = calculate
+        self.stats = {"jobs": 0, "coalesced": 0, "cached": 0, "calculations": 0}
+        self._executor = ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="api-job")
+        self._jobs = {}
+        self._running = {}
+
+    def submit(self, polygon):
+        """Gibt den Job für einen Perimeter zurück und startet ihn bei Bedarf.
+
+        Args:
+            polygon (shapely.geometry.Polygon): Der Perimeter in WGS84.
+
+        Returns:
+            Job: Ein bereits laufender Job für denselben Perimeter, ein fertiger Job aus dem
+            Resultat-Cache oder ein neu gestarteter Job.
+        """
+        self._purge()
+        self.stats["jobs"] += 1
+        key = result_key(polygon, get_release()[0])
+
+        running = self._running.get(key)
+        if running is not None:
+            self.stats["coalesced"] += 1
+            return running
+
+        job = Job(id=uuid.uuid4().hex, key=key)
+        self._jobs[job.id] = job
+
+        result_cache = get_result_cache()
+        cached = result_cache.get(key) if result_cache is not None else None
+        if cached is not None:
+            self.stats["cached"] += 1
+            job.status, job.cached, job.finished = "done", True, time.time()
+            job.result = calculation_to_json(cached)
+            return job
+
+        self._running[key] = job
+        job.future = asyncio.ensure_future(self._run(job, polygon))
+        return job
+
+    async def _run(self, job, polygon):
+        """Führt die Berechnung im Thread-Pool aus und legt das Resultat im Resultat-Cache ab."""
+        def on_result(done, total):
+            job.done, job.total = done, total
+
+        self.stats["calculations"] += 1
+        loop = asyncio.get_running_loop()
+        try:
+            calculation = await loop.run_in_executor(self._executor, self.calculate, polygon, on_result)
+            result_cache = get_result_cache()
+            if result_cache is not None:
+                result_cache.put(result_key(polygon, calculation["release_date"]), calculation)
+            job.result = calculation_to_json(calculation)
+            job.status = "done"
+        except Exception as e:
+            print(f"Job {job.id} fehlgeschlagen: {e}")
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            job.finished = time.time()
+            self._running.pop(job.key, None)
+
+    def get(self, job_id):
+        """Gibt den Job mit dieser Kennung zurück, oder None."""
+        return self._jobs.get(job_id)
+
+    def _purge(self):
+        """Entfernt fertige Jobs, die älter als JOB_TTL sind."""
+        now = time.time()
+        for job_id in [j.id for j in self._jobs.values() if j.finished is not None and now - j.finished > JOB_TTL]:
+            del self._jobs[job_id]
+
+
+def parse_polygon(body):
+    """Liest den Perimeter aus einem GeoJSON-Body (Geometrie oder Feature).
+
+    Raises:
+        ValueError: Wenn der Body kein gültiges Polygon ist.
+    """
+    try:
+        geojson = json.loads(body)
+        if geojson.get("type") == "Feature":
+            geojson = geojson["geometry"]
+        polygon = shape(geojson)
+    except (ValueError, KeyError, TypeError, AttributeError, ShapelyError) as e:
+        raise ValueError(f"Ungültiges GeoJSON: {e}")
+    if polygon.geom_type not in ("Polygon", "MultiPolygon") or polygon.is_empty:
+        raise ValueError("Erwartet wird ein Polygon.")
+    if polygon.area > MAX_POLYGON_AREA and BACKEND == "api":
+        raise ValueError("Das Polygon ist grösser als 150 km².")
+    return polygon
+
+
+async def _read_request(reader):
+    """Liest eine HTTP/1.1-Anfrage und gibt (Methode, Pfad, Query, Body) zurück."""
+    request_line = (await reader.readline()).decode("latin-1").strip()
+    if not request_line:
+        return None
+    method, target, _ = request_line.split(" ", 2)
+    headers = {}
+    while True:
+        line = (await reader.readline()).decode("latin-1").strip()
+        if not line:
+            break
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    length = int(headers.get("content-length", "0"))
+    if length > MAX_BODY_BYTES:
+        raise ValueError("Anfrage zu gross.")
+    body = await reader.readexactly(length) if length else b""
+    url = urlsplit(target)
+    return method, url.path, parse_qs(url.query), body
+
+
+def _write_response(writer, status, payload):
+    """Schreibt eine JSON-Antwort und schliesst danach die Verbindung."""
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    status = HTTPStatus(status)
+    writer.write(
+        f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+        f"Content-Type: application/json; charset=utf-8\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: close\r\n\r\n".encode("latin-1") + body
+    )
+
+
+async def handle(manager, reader, writer):
+    """Beantwortet eine Verbindung (eine Anfrage pro Verbindung)."""
+    try:
+        request = await _read_request(reader)
+        if request is None:
+            return
+        method, path, query, body = request
+
+        if method == "GET" and path == "/health":
+            result_cache = get_result_cache()
+            response_cache = get_cache()
+            _write_response(writer, 200, {
+                "jobs": manager.stats,
+                "geoadmin": get_client_stats(),
+                "result_cache": result_cache.get_stats() if result_cache is not None else None,
+                "response_cache": response_cache.get_stats() if response_cache is not None else None,
+            })
+        elif method == "POST" and path == "/jobs":
+            try:
+                polygon = parse_polygon(body)
+            except ValueError as e:
+                _write_response(writer, 400, {"error": str(e)})
+                return
+            job = manager.submit(polygon)
+            if query.get("wait", ["0"])[0] == "1" and job.future is not None:
+                await asyncio.shield(job.future)
+            status = {"running": 202, "failed": 500}.get(job.status, 200)
+            _write_response(writer, status, job.to_json())
+        elif method == "GET" and path.startswith("/jobs/"):
+            job = manager.get(path[len("/jobs/"):])
+            if job is None:
+                _write_response(writer, 404, {"error": "Job nicht gefunden."})
+            else:
+                _write_response(writer, 200, job.to_json())
+        else:
+            _write_response(writer, 404, {"error": f"Unbekannter Endpunkt: {method} {path}"})
+    except (ValueError, asyncio.IncompleteReadError) as e:
+        _write_response(writer, 400, {"error": str(e)})
+    except Exception as e:
+        print(f"Fehler bei der Anfrage: {e}")
+        _write_response(writer, 500, {"error": "Interner Fehler."})
+    finally:
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+        writer.close()
+
+
+async def serve(host=API_HOST, port=API_PORT, manager=None, ready=None):
+    """Startet den Dienst und läuft, bis er abgebrochen wird.
+
+    Args:
+        host (str, optional): Adresse. Standard: API_HOST.
+        port (int, optional): Port (0 für einen freien Port). Standard: API_PORT.
+        manager (JobManager, optional): Eigener JobManager, z.B. mit Stubs. Standard: ein neuer JobManager.
+        ready (callable, optional): Wird mit dem tatsächlichen Port aufgerufen, sobald der Dienst bereit ist.
+    """
+    manager = manager or JobManager()
+    server = await asyncio.start_server(lambda r, w: handle(manager, r, w), host, port)
+    port = server.sockets[0].getsockname()[1]
+    print(f"API bereit auf http://{host}:{port}")
+    if ready is not None:
+        ready(port)
+    async with server:
+        await server.serve_forever()
+
+
+def serve_in_thread(manager=None, host="127.0.0.1"):
+    """Startet den Dienst auf einem freien Port in einem Hintergrund-Thread, z.B. für lokale Tests.
+
+    Returns:
+        int: Der Port.
+    """
+    started = threading.Event()
+    port = []
+
+    def ready(p):
+        port.append(p)
+        started.set()
+
+    threading.Thread(target=lambda: asyncio.run(serve(host, 0, manager, ready)), daemon=True).start()
+    started.wait()
+    return port[0]
+
+
+# Hauptprogramm
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HTTP-API für die Berechnung der Briefkästen.")
+    parser.add_argument("--host", default=API_HOST, help=f"Adresse (Standard: {API_HOST})")
+    parser.add_argument("--port", type=int, default=API_PORT, help=f"Port (Standard: {API_PORT})")
+    args = parser.parse_args()
+
+    asyncio.run(serve(args.host, args.port))
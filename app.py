@@ -20,55 +20,57 @@ Benötigte Bibliotheken:
 - streamlit_folium
 """
 
+import os
+import time
 import streamlit as st
+import streamlit.components.v1 as components
 import requests
-import geopandas as gpd
-import xml.etree.ElementTree as ET
-from shapely.geometry import Polygon, box,MultiPolygon
-from shapely.ops import split
-from shapely.validation import explain_validity
-from collections import defaultdict
-import json
-import numpy as np
+from shapely.geometry import Polygon, mapping
 import pandas as pd
 import folium
 from folium.plugins import Draw
 from streamlit_folium import st_folium
-import duckdb as db
-import ast
-import requests
-import re
-import boto3
-from botocore import UNSIGNED
-from botocore.config import Config
 from bs4 import BeautifulSoup
 from trans import translations
+from geoadmin import BACKEND
+from tiling import to_wgs84
+from response_cache import get_cache
+from gwr import GwrResult
+from overture_release import get_release
+from overture_query import warm_up
+from pipeline import run, start_overture
+from result_cache import get_result_cache, result_key
+from jobs import get_job_queue
+from shapely import wkt
+
+# Zwischenstände während der Berechnung höchstens alle STREAM_INTERVAL Sekunden neu zeichnen
+STREAM_INTERVAL = float(os.environ.get("APP_STREAM_INTERVAL", "1.0"))
+
+MAP_TILES = "https://wmts.geo.admin.ch/1.0.0/ch.swisstopo.pixelkarte-farbe/default/current/3857/{z}/{x}/{y}.jpeg"
+MAP_ATTR = 'Map data: &copy; <a href="https://www.swisstopo.ch" target="_blank" rel="noopener noreferrer">swisstopo</a>, <a href="https://www.housing-stat.ch/" target="_blank" rel="noopener noreferrer">BFS</a>'
+
+# Farbe der ausgelesenen Zellen nach Anzahl Wohnungen: (obere Grenze, Farbe)
+CELL_COLOURS = [(0, "#bdbdbd"), (10, "#fee391"), (50, "#fe9929"), (float("inf"), "#cc4c02")]
+
+# Farbe der Zellen, die auch nach allen Wiederholungen nicht abgefragt werden konnten
+FAILED_COLOUR = "#6a3d9a"
+
+REPO_URL = "https://github.com/davidoesch/wo-sind-briefkaesten/"
+
+# App-Version und Release-Daten ändern selten: höchstens alle METADATA_TTL Sekunden neu abfragen
+METADATA_TTL = int(os.environ.get("APP_METADATA_TTL", str(6 * 60 * 60)))
+
+# Perimeter ab ca. 10 km² laufen als Job in einem Worker-Prozess (jobs.py), statt das Skript zu blockieren
+LARGE_AREA = 0.001
+
+# Fortschritt eines Jobs alle JOB_POLL_INTERVAL Sekunden neu abfragen
+JOB_POLL_INTERVAL = float(os.environ.get("APP_JOB_POLL_INTERVAL", "2.0"))
+
+# DuckDB-Erweiterungen laden und das Overture-Release ermitteln, im Hintergrund, bevor die erste Berechnung sie braucht
+warm_up()
+get_release()
 
 
-global building_codes
-building_codes = {
-    1010: {"CODE": 1010, "KAT": "GKAT", "BESCHREIBUNG": "Provisorische Unterkunft"},
-    1020: {"CODE": 1020, "KAT": "GKAT", "BESCHREIBUNG": "Gebäude mit ausschliesslicher Wohnnutzung"},
-    1030: {"CODE": 1030, "KAT": "GKAT", "BESCHREIBUNG": "Andere Wohngebäude (Wohngebäude mit Nebennutzung)"},
-    1040: {"CODE": 1040, "KAT": "GKAT", "BESCHREIBUNG": "Gebäude mit teilweiser Wohnnutzung"},
-    1060: {"CODE": 1060, "KAT": "GKAT", "BESCHREIBUNG": "Gebäude ohne Wohnnutzung"},
-    1110: {"CODE": 1110, "KAT": "GKLAS", "BESCHREIBUNG": "Gebäude mit einer Wohnung"},
-    1121: {"CODE": 1121, "KAT": "GKLAS", "BESCHREIBUNG": "Gebäude mit zwei Wohnungen"},
-    1122: {"CODE": 1122, "KAT": "GKLAS", "BESCHREIBUNG": "Gebäude mit drei oder mehr Wohnungen"},
-    1130: {"CODE": 1130, "KAT": "GKLAS", "BESCHREIBUNG": "Wohngebäude für Gemeinschaften"},
-    1211: {"CODE": 1211, "KAT": "GKLAS", "BESCHREIBUNG": "Hotelgebäude"},
-    1212: {"CODE": 1212, "KAT": "GKLAS", "BESCHREIBUNG": "Andere Gebäude für kurzfristige Beherbergung"},
-    1220: {"CODE": 1220, "KAT": "GKLAS", "BESCHREIBUNG": "Bürogebäude"},
-    1230: {"CODE": 1230, "KAT": "GKLAS", "BESCHREIBUNG": "Gross-und Einzelhandelsgebäude"},
-    1231: {"CODE": 1231, "KAT": "GKLAS", "BESCHREIBUNG": "Restaurants und Bars in Gebäuden ohne Wohnnutzung"},
-    1241: {"CODE": 1241, "KAT": "GKLAS", "BESCHREIBUNG": "Gebäude des Verkehrs- und Nachrichtenwesens ohne Garagen"},
-    1251: {"CODE": 1251, "KAT": "GKLAS", "BESCHREIBUNG": "Industriegebäude"},
-    1261: {"CODE": 1261, "KAT": "GKLAS", "BESCHREIBUNG": "Gebäude für Kultur- und Freizeitzwecke"},
-    1262: {"CODE": 1262, "KAT": "GKLAS", "BESCHREIBUNG": "Museen und Bibliotheken"},
-    1263: {"CODE": 1263, "KAT": "GKLAS", "BESCHREIBUNG": "Schul- und Hochschulgebäude"},
-    1264: {"CODE": 1264, "KAT": "GKLAS", "BESCHREIBUNG": "Krankenhäuser und Facheinrichtungen des Gesundheitswesens"},
-    1275: {"CODE": 1275, "KAT": "GKLAS", "BESCHREIBUNG": "Andere Gebäude für die kollektive Unterkunft"},
-}
 
 def get_latest_release_date(repo_url):
     """
@@ -84,7 +86,7 @@ def get_latest_release_date(repo_url):
     releases_url = f"{repo_url}/releases"
 
     # Send a GET request to the releases page
-    response = requests.get(releases_url)
+    response = requests.get(releases_url, timeout=10)
 
     if response.status_code != 200:
         raise Exception(f"Failed to fetch the releases page: {response.status_code}")
@@ -113,224 +115,27 @@ def get_latest_release_date(repo_url):
 
     return latest_release, release_date
 
-def extract_freeform(addresses):
-    """
-    Extracts 'freeform' fields from a list of address dictionaries.
-
-    This function takes a list of dictionaries, each representing an address,
-    and extracts the value associated with the 'freeform' key from each dictionary.
-    If the input is a JSON string, it will be parsed into a list of dictionaries first.
-    The extracted 'freeform' values are then concatenated into a single string,
-    separated by commas.
-
-    Args:
-        addresses (str or list): A JSON string or a list of dictionaries, where each
-                                 dictionary contains address information.
-
-    Returns:
-        str: A comma-separated string of 'freeform' values, or None if an error occurs.
-    """
-    try:
-        # Parse the JSON if it's in string format
-        if isinstance(addresses, str):
-            addresses = json.loads(addresses)
-        # Extract 'freeform' fields from the list of dictionaries
-        return ', '.join([addr.get('freeform', '') for addr in addresses if 'freeform' in addr])
-    except Exception as e:
-        return None
-
-def clean_df(df, column_name):
-    """
-    Converts list-like strings in a specified column to comma-separated strings.
-
-    Args:
-        df (pd.DataFrame): The input DataFrame.
-        column_name (str): The name of the column to clean.
-
-    Returns:
-        pd.DataFrame: The modified DataFrame with the cleaned column.
-    """
-    def convert_to_comma_separated(value):
-        try:
-            # Safely evaluate the string as a list
-            items = ast.literal_eval(value)
-            # Join the items with a comma
-            return ",".join(items)
-        except (ValueError, SyntaxError):
-            # Return the original value if conversion fails
-            return value
-
-    df[column_name] = df[column_name].apply(convert_to_comma_separated)
-    return df
-
 
-def split_polygon(polygon, max_area, export_gpkg=False, gpkg_path="grid_output.gpkg"):
-    """Teilt ein Polygon in kleinere Polygone, deren Fläche eine vorgegebene Maximalgröße nicht überschreitet.
+@st.cache_data(ttl=METADATA_TTL, show_spinner=False)
+def get_app_version(repo_url):
+    """Gibt die App-Version für die Fusszeile zurück, für alle Sitzungen während METADATA_TTL zwischengespeichert.
 
-    Args:
-        polygon (shapely.geometry.Polygon): Das zu teilende Polygon.
-        max_area (float): Maximale Fläche eines Teilpolygons.
-        export_gpkg (bool, optional): Gibt an, ob die Teilpolygone als GeoPackage exportiert werden sollen. Standard: False.
-        gpkg_path (str, optional): Pfad zur Ausgabe des GeoPackages. Standard: "grid_output.gpkg".
-
-    Returns:
-        list: Liste der generierten Teilpolygone.
-    """
-    # Check if the polygon is valid
-    if not polygon.is_valid:
-        print(f"Invalid polygon: {explain_validity(polygon)}")
-        # Attempt to fix the polygon
-        polygon = polygon.buffer(0)
-        if not polygon.is_valid:
-            raise ValueError("The input polygon is invalid and could not be fixed.")
-
-    bounds = polygon.bounds  # (minx, miny, maxx, maxy)
-    width = bounds[2] - bounds[0]
-    height = bounds[3] - bounds[1]
-
-    num_x = int(np.ceil(width / np.sqrt(max_area)))
-    num_y = int(np.ceil(height / np.sqrt(max_area)))
-
-    x_step = width / num_x
-    y_step = height / num_y
-
-    sub_polygons = []
-    for i in range(num_x):
-        for j in range(num_y):
-            minx = bounds[0] + i * x_step
-            miny = bounds[1] + j * y_step
-            maxx = minx + x_step
-            maxy = miny + y_step
-
-            grid_cell = box(minx, miny, maxx, maxy)
-            intersection = polygon.intersection(grid_cell)
-
-            if not intersection.is_empty:
-                sub_polygons.append(intersection)
-
-    if export_gpkg:
-        # Exportiere die Sub-Polygone als GeoPackage
-        gdf = gpd.GeoDataFrame(geometry=sub_polygons, crs="EPSG:4326")
-        gdf.to_file(gpkg_path, driver="GPKG")
-        print(f"GeoPackage wurde exportiert nach: {gpkg_path}")
-
-    return sub_polygons
-
-def query_geoadmin_with_polygon(polygon, sr=4326):
-    """Sendet eine Anfrage an die GeoAdmin API mit einem gegebenen Polygon.
+    Gewöhnliche Reruns (Karte verschieben, Sprache wechseln) lösen damit keine Anfrage an GitHub aus.
 
     Args:
-        polygon (shapely.geometry.Polygon or shapely.geometry.MultiPolygon): Das Polygon für die Anfrage.
-        sr (int, optional): Raumbezugssystem (Spatial Reference). Standard: 4326 (WGS84).
+        repo_url (str): Die URL des GitHub-Repositorys.
 
     Returns:
-        dict: Das Antwort-JSON der API.
+        tuple: (Version, Datum) wie bei get_latest_release_date, oder ("-", "-") wenn GitHub nicht erreichbar ist.
     """
-    endpoint = "https://api3.geo.admin.ch/rest/services/api/MapServer/identify"
-
-    # Handle both Polygon and MultiPolygon
-    if isinstance(polygon, Polygon):
-        polygon_coords = [[x, y] for x, y in polygon.exterior.coords]
-    elif isinstance(polygon, MultiPolygon):
-        polygon_coords = []
-        for poly in polygon.geoms:
-            polygon_coords.extend([[x, y] for x, y in poly.exterior.coords])
-    else:
-        raise ValueError("Unsupported geometry type")
-
-    polygon_geometry = {
-        "rings": [polygon_coords],
-        "spatialReference": {"wkid": sr}
-    }
-
-    params = {
-        "geometryType": "esriGeometryPolygon",
-        "geometry": json.dumps(polygon_geometry),
-        "tolerance": 0,
-        "layers": "all:ch.bfs.gebaeude_wohnungs_register",
-        "imageDisplay": "500,600,96",
-        "sr": sr,
-        "limit": 1000,
-        "returnGeometry": False
-    }
-
     try:
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/116.0.0.0 Safari/537.36"
-        }
-        response = requests.get(endpoint, params=params, headers=headers, timeout=15)
-        if response.status_code == 200:
-            return response.json()
-        else:
-            response.raise_for_status()
-    except requests.exceptions.RequestException as e:
-        print(f"Failed to connect to api.geo.admin.ch: {e}")
-        return
-
-
-def extract_wohnungen_and_counts(result):
-    global total_adressen
-    total_wohnungen = 0
-    wohnungen_by_streetnr = defaultdict(int)
-    wohnungen_by_street = defaultdict(int)
-    total_features = 0
-
-    if result and 'results' in result:
-        total_features = len(result['results'])
-
-        if total_features == 0:
-            print("Keine Adressen gefunden.")
-            return 0, {}, {}
-
-        for feature in result['results']:
-            attributes = feature.get('attributes', {})
-            ganzwhg = attributes.get('ganzwhg', 0) or 0
-            # Check if ganzwhg is 0 and apply the additional checks
-            if ganzwhg == 0:
-
-                gkat = attributes.get('gkat')
-                gklas = attributes.get('gklas')
-
-                # Check if either gkat or gklas matches the specified values in building_codes
-                if any(building_codes[code]["CODE"] == gkat for code in building_codes if "CODE" in building_codes[code]) or any(building_codes[code]["KAT"] == gklas for code in building_codes if "KAT" in building_codes[code]):
-
-                    #prüf ob der dict gwrgeschaefte_by_streetnr schon besteht, falls nihct setzte eine globale variable gwrgeschaefte_by_streetnr
-                    if 'gwrgeschaefte_by_streetnr' not in globals():
-                        global gwrgeschaefte_by_streetnr
-                        gwrgeschaefte_by_streetnr = []
-
-                    # Create a new record
-                    new_record = {
-                        'address': attributes.get('strname_deinr', "Unbekannt"),
-                        'category': building_codes.get(gkat, {}).get("BESCHREIBUNG", "Code not found"),
-                        'category_alt': building_codes.get(gklas, {}).get("BESCHREIBUNG", "Code not found")
-                    }
-
-                    # Append the new record to the list if category or category_alt is not "Code not found"
-                    if new_record['category_alt'] != "Code not found":
-                        gwrgeschaefte_by_streetnr.append(new_record)
-
-            strnamenr = attributes.get('strname_deinr', "Unbekannt")
-            strname = ", ".join(attributes.get('strname', "Unbekannt"))
-            total_wohnungen += ganzwhg
-            wohnungen_by_streetnr[strnamenr] += ganzwhg
-            wohnungen_by_street[strname] += ganzwhg
-
-        print(f"Anzahl der gefundenen Adressen: {total_features}")
-        total_adressen = total_adressen + total_features
+        return get_latest_release_date(repo_url)
+    except Exception as e:
+        print(f"App-Version nicht ermittelbar: {e}")
+        return "-", "-"
 
-        if total_features >= 200:
-            print("***************")
-            print("Warnung: Mehr als 200 Adressen. Bitte unterteilen Sie die Zeichnung in kleinere Abschnitte und führen Sie die Abfrage mehrfach aus.")
-            print("***************")
-            wohnungen_by_streetnr = defaultdict(int)
-            total_wohnungen = 0
 
-    else:
-        print("Keine Ergebnisse gefunden.")
-        return 0, {}, {}
 
-    return total_wohnungen, wohnungen_by_streetnr, wohnungen_by_street
 
 
 def create_map(center, zoom):
@@ -346,8 +151,8 @@ def create_map(center, zoom):
     m = folium.Map(location=center,
         zoom_start=zoom,
         control_scale=True,
-        tiles="https://wmts.geo.admin.ch/1.0.0/ch.swisstopo.pixelkarte-farbe/default/current/3857/{z}/{x}/{y}.jpeg",
-        attr='Map data: &copy; <a href="https://www.swisstopo.ch" target="_blank" rel="noopener noreferrer">swisstopo</a>, <a href="https://www.housing-stat.ch/" target="_blank" rel="noopener noreferrer">BFS</a>',
+        tiles=MAP_TILES,
+        attr=MAP_ATTR,
         )
 
     Draw(
@@ -371,191 +176,290 @@ def create_map(center, zoom):
     ).add_to(m)
     return m
 
-import boto3
-from botocore import UNSIGNED
-from botocore.config import Config
-
-def fetch_latest_overture_release():
-    """Fetch the latest Overture Maps release version from S3."""
-    try:
-        # Create S3 client without credentials (public bucket)
-        s3 = boto3.client(
-            's3',
-            region_name='us-west-2',
-            config=Config(signature_version=UNSIGNED)
-        )
-
-        # List directories in the release folder
-        response = s3.list_objects_v2(
-            Bucket='overturemaps-us-west-2',
-            Prefix='release/',
-            Delimiter='/'
-        )
-
-        # Extract release versions
-        releases = []
-        for prefix in response.get('CommonPrefixes', []):
-            release_name = prefix['Prefix'].replace('release/', '').rstrip('/')
-            # Filter out any non-release directories (like README files)
-            if re.match(r'\d{4}-\d{2}-\d{2}\.\d+', release_name):
-                releases.append(release_name)
-
-        if releases:
-            # Sort and get latest (date-based versions sort correctly alphabetically)
-            latest_release = sorted(releases)[-1]
-            print(f"Overture release date: {latest_release}")
-            return latest_release
-        else:
-            # Fallback to a recent known version
-            fallback = "2026-01-21.0"
-            print(f"No releases found, using fallback: {fallback}")
-            return fallback
-
-    except Exception as e:
-        print(f"Error fetching release info: {e}")
-        # Try fallback to HTML scraping as backup
-        try:
-            import requests
-            response = requests.get("https://docs.overturemaps.org/release-calendar/")
-            match = re.search(r'latest Overture data release is <code>(\d{4}-\d{2}-\d{2}\.\d+)</code>', response.text)
-            if match:
-                return match.group(1)
-        except:
-            pass
-        return "2026-01-21.0"  # Final fallback
-
-
-
 
-def extract_overture(polygon):        # Initial setup
-        """
-        Extracts place names and addresses from Overture Maps data within a specified polygon.
-        This function connects to a DuckDB database, installs and loads necessary extensions,
-        fetches the latest release information from the Overture Maps GitHub repository, constructs
-        the parquet path using the latest release date, and performs a spatial query to extract
-        place names and addresses within the specified polygon. It checks foralready existing  possible addresses and categories from the global variable gwrgeschaefte_by_streetnr and adds them to the DataFrame. The function then aggregates the place names and addresses by flattened addresses and returns the number of frames (rows) in the resulting DataFrame, the DataFrame containing the extracted place names, categories, and flattened addresses, and a list of lists containing a flattened address and the count of places associated with that address.
-        Args:
-            polygon (shapely.geometry.Polygon): The polygon within which to extract place names and addresses.
-        Returns:
-            tuple: A tuple containing:
-                - num_frames (int): The number of frames (rows) in the resulting DataFrame.
-                - place_and_address_df (pandas.DataFrame): A DataFrame containing the extracted place names,
-                    categories, and flattened addresses.
-                - total_places_pro_adresse (list): A list of lists, where each inner list contains a flattened address
-                    and the count of places associated with that address.
-        """
-        con = db.connect()
+def get_map(center, zoom):
+    """Gibt die Karte mit Zeichentools zurück, einmal pro Sitzung erstellt und bei Reruns wiederverwendet.
 
-        # To perform spatial operations, the spatial extension is required.
-        # src - https://duckdb.org/docs/api/python/overview.html#loading-and-installing-extensions
+    Die Karte liegt in st.session_state statt in st.cache_resource: folium.Map ist veränderlich und
+    darf nicht von allen Sitzungen geteilt werden.
 
-        con.install_extension("spatial")
-        con.load_extension("spatial")
-
-        # To load a Parquet file from S3, the httpfs extension is required.
-        # src - https://duckdb.org/docs/guides/import/s3_import.html
-
-        con.install_extension("httpfs")
-        con.load_extension("httpfs")
-
-        # Tell DuckDB which S3 region to find Overture's data bucket in
-        # src - https://github.com/OvertureMaps/data/blob/main/README.md#how-to-access-overture-maps-data
-        con.sql("SET s3_region='us-west-2'")
-
-        # Overture structure
-        # https://github.com/OvertureMaps/data/blob/main/README.md#how-to-access-overture-maps-data
-
-        # Fetch the latest release information from the Overture Maps GitHub repository
-        response = requests.get("https://docs.overturemaps.org/release/latest/")
-        html_content = response.text
-
-        # Use regular expression to find the release date in the title
-
-        release_date = fetch_latest_overture_release()
-
-
-        # Construct the parquet path using the latest release date
-        parquet_path = f"s3://overturemaps-us-west-2/release/{release_date}/theme=places/type=*/*"
+    Args:
+        center (tuple): Mittelpunkt der Karte (Breitengrad, Längengrad).
+        zoom (int): Zoomstufe der Karte.
 
+    Returns:
+        folium.Map: Die Karte von create_map.
+    """
+    if "map" not in st.session_state:
+        st.session_state["map"] = create_map(list(center), zoom)
+    return st.session_state["map"]
 
 
-        query = f"""
-        SELECT
-            id,
-            names.primary AS primary_name,
-            json_extract_string(categories, 'primary') AS category,
-            json_extract_string(categories, 'alternate') AS category_alt,
-            addresses AS addresses,
-            ST_AsText(geometry) as geometry
-        FROM
-            read_parquet('{parquet_path}', filename=true, hive_partitioning=1)
-        WHERE
-            ST_Intersects(geometry, ST_GeomFromText('{polygon.wkt}'))
-        """
+def cell_colour(wohnungen):
+    """Gibt die Füllfarbe einer ausgelesenen Zelle nach Anzahl Wohnungen zurück (siehe CELL_COLOURS).
 
+    Für fehlgeschlagene Zellen (wohnungen None) wird FAILED_COLOUR zurückgegeben.
+    """
+    if wohnungen is None:
+        return FAILED_COLOUR
+    for limit, colour in CELL_COLOURS:
+        if wohnungen <= limit:
+            return colour
 
-        result_df = con.execute(query).fetchdf()
 
-        # explicitly close the connection
-        con.close()
+def create_cell_map(polygon, cells):
+    """Erstellt eine Karte mit dem gezeichneten Polygon und den bereits ausgelesenen Zellen.
 
-        # Extract place names and addresses
-        place_and_address_df = result_df[['primary_name', 'addresses','category','category_alt']].dropna()
+    Args:
+        polygon (shapely.geometry.Polygon): Das gezeichnete Polygon in WGS84.
+        cells (list): GeoJSON-Features der ausgelesenen Zellen in WGS84 mit der Eigenschaft 'wohnungen'.
 
-        # Apply the extract freeform function to the 'addresses' column
-        place_and_address_df['flattened_addresses'] = place_and_address_df['addresses'].apply(extract_freeform)
+    Returns:
+        folium.Map: Eine Folium-Karte, die Zellen eingefärbt nach Anzahl Wohnungen.
+    """
+    minx, miny, maxx, maxy = polygon.bounds
+    m = folium.Map(control_scale=True, tiles=MAP_TILES, attr=MAP_ATTR)
+    m.fit_bounds([[miny, minx], [maxy, maxx]])
+
+    folium.GeoJson(
+        {"type": "FeatureCollection", "features": cells},
+        style_function=lambda feature: {
+            "fillColor": cell_colour(feature["properties"]["wohnungen"]),
+            "fillOpacity": 0.6,
+            "color": "#636363",
+            "weight": 0.5,
+        },
+        tooltip=folium.GeoJsonTooltip(fields=["wohnungen"], aliases=["Wohnungen"]),
+    ).add_to(m)
+    folium.GeoJson(
+        mapping(polygon),
+        style_function=lambda feature: {"color": "#ff0000", "weight": 2, "fill": False},
+    ).add_to(m)
+    return m
 
-        # Drop the original 'addresses' column for cleaner output (optional)
-        place_and_address_df = place_and_address_df.drop(columns=['addresses'])
 
-        # converting dict to list
-        place_and_address_df = clean_df(place_and_address_df, 'category_alt')
+def calculate(polygon, t):
+    """Berechnet Wohnungen und Geschäfte eines Polygons und zeigt dabei die Zwischenstände an.
 
+    Args:
+        polygon (shapely.geometry.Polygon): Das gezeichnete Polygon in WGS84.
+        t (dict): Übersetzungen der gewählten Sprache.
 
-        #check if the variable gwrgeschaefte_by_streetnr exists
-        if 'gwrgeschaefte_by_streetnr' in globals() and len(gwrgeschaefte_by_streetnr) !=0:
-            #convert gwrgechaeft_by_streetnr to a dataframe with geopandas
-            gwrgeschaefte_by_streetnr_df = pd.DataFrame(gwrgeschaefte_by_streetnr)
+    Returns:
+        dict: 'gwr_result', 'fetch_stats', 'total_geschaefte', 'place_and_address_df',
+        'total_places_pro_adresse_df' und 'release_date'.
+    """
+    max_area = 0.000005
+    gwr_result = GwrResult()  # eigenes Resultat pro Berechnung, nicht zwischen Sitzungen geteilt
+
+    progress_bar = st.progress(0)
+    progress_text = st.empty()  # Platzhalter für Fortschrittsanzeige
+
+    # Platzhalter für die Zwischenstände: Summen, Karte der ausgelesenen Zellen, Tabellen
+    live_totals = st.empty()
+    live_map = st.empty()
+    live_tables = st.empty()
+    live_cells = []
+    last_render = [0.0]
+
+    # Overture-Abfrage im Hintergrund starten, sie läuft parallel zu den GWR-Abfragen
+    overture = start_overture(polygon)
+
+    # Zwischenstand zeichnen, höchstens alle STREAM_INTERVAL Sekunden (ausser force)
+    def render_live(force=False):
+        if not force and time.monotonic() - last_render[0] < STREAM_INTERVAL:
+            return
+        with live_totals.container():
+            st.subheader(f"{t['interim_header']}: {gwr_result.total_wohnungen}")
+            if overture.done() and overture.exception() is None:
+                businesses = f"{t['businesses_interim']}: {overture.result()[0].num_rows}"
+            else:
+                businesses = t["businesses_pending"]
+            st.markdown(f"{t['total_addresses']} {gwr_result.total_adressen}, {businesses}")
+        with live_map.container():
+            components.html(create_cell_map(polygon, live_cells).get_root().render(), height=400)
+        with live_tables.container():
+            col_streets, col_addresses = st.columns(2)
+            col_streets.dataframe(pd.DataFrame(
+                [{"Strasse": street, "Wohnungen": count} for street, count in gwr_result.wohnungen_by_street.items()],
+                columns=["Strasse", "Wohnungen"],
+            ).sort_values("Wohnungen", ascending=False), height=250, hide_index=True)
+            col_addresses.dataframe(pd.DataFrame(
+                [{"Adresse": adr, "Wohnungen": count} for adr, count in gwr_result.wohnungen_by_streetnr.items()],
+                columns=["Adresse", "Wohnungen"],
+            ).sort_values("Wohnungen", ascending=False), height=250, hide_index=True)
+        last_render[0] = time.monotonic()
+
+    # Jede Zelle anzeigen, sobald pipeline.run sie ausgewertet hat; die Summen hängen nicht von der
+    # Reihenfolge ab, da mehrfach gelieferte Gebäude über gwr_result.seen_buildings nur einmal gezählt werden
+    def add_cell(cell, sr, result, new_wohnungen):
+        cell_wgs84 = to_wgs84(cell) if sr == 2056 else cell
+        live_cells.append({
+            "type": "Feature",
+            "geometry": mapping(cell_wgs84),
+            "properties": {"wohnungen": new_wohnungen if result is not None else None},
+        })
+        render_live()
+
+    # Countdown nachführen, sobald eine Antwort eintrifft
+    def update_progress(done, total):
+        progress_text.text(f"{t['progress_text']} {total - done}")
+        progress_bar.progress(done / total)
+
+    # Alle Zellen abgefragt: Endstand der Zellen zeigen, während auf die Overture-Abfrage gewartet wird
+    def show_fetched():
+        render_live(force=True)
+        progress_text.text(t["spinner_text"])
+
+    # Gleicher Ablauf wie madd_extract.py, api.py und jobs.py (pipeline.run): Subsets parallel abfragen,
+    # Zellen aus einem abgebrochenen Lauf für denselben Perimeter aus den Checkpoints, dann die Geschäfte
+    fetch_stats, (total_geschaefte, place_and_address_df, total_places_pro_adresse_df, release_date) = run(
+        polygon, max_area, gwr_result, on_result=update_progress, on_cell=add_cell, overture=overture,
+        on_fetched=show_fetched,
+    )
+    if get_cache() is not None:
+        print(f"GeoAdmin-Cache: {get_cache().get_stats()}")
+    progress_text.text(t["progress_complete"])
+    print(f"Anzahl der Geschäfte: {total_geschaefte}")
+
+    # Zwischenstände durch das Endresultat ersetzen; die Karte der Zellen bleibt stehen
+    live_totals.empty()
+    live_tables.empty()
+
+    return {
+        "gwr_result": gwr_result,
+        "fetch_stats": fetch_stats,
+        "total_geschaefte": total_geschaefte,
+        "place_and_address_df": place_and_address_df,
+        "total_places_pro_adresse_df": total_places_pro_adresse_df,
+        "release_date": release_date,
+    }
 
-            # Create a new DataFrame with the required columns and values
-            new_df = pd.DataFrame({
-                'primary_name': 'Unbekannt',
-                'flattened_addresses': gwrgeschaefte_by_streetnr_df['address'],
-                'category': gwrgeschaefte_by_streetnr_df['category'],
-                'category_alt': gwrgeschaefte_by_streetnr_df['category_alt']
-            })
 
-            # Filter out rows where 'flattened_addresses' are already present in place_and_address_df
-            new_df = new_df[~new_df['flattened_addresses'].isin(place_and_address_df['flattened_addresses'])]
+def show_results(calculation, t):
+    """Zeigt das Resultat einer Berechnung an.
 
-            # Concatenate the new DataFrame to place_and_address_df
-            place_and_address_df = pd.concat([place_and_address_df, new_df], ignore_index=True)
+    Args:
+        calculation (dict): Resultat von calculate.
+        t (dict): Übersetzungen der gewählten Sprache.
+    """
+    gwr_result = calculation["gwr_result"]
+    fetch_stats = calculation["fetch_stats"]
+    total_wohnungen = gwr_result.total_wohnungen
+    total_geschaefte = calculation["total_geschaefte"]
+    place_and_address_df = calculation["place_and_address_df"]
+    total_places_pro_adresse_df = calculation["total_places_pro_adresse_df"]
+
+    # Fehlende Zellen nicht stillschweigend als 0 zählen
+    if fetch_stats.get("failed_cells"):
+        st.error(f"{t['failed_cells']} {fetch_stats['failed_cells']}")
+
+    # Briefkästen direkt anzeigen
+    total_briefkaesten = total_wohnungen + total_geschaefte
+    st.subheader(f"{t['mailboxes_header']}: {total_briefkaesten}")
+    st.markdown(f"{t['mailboxes_explanation_1']}: {total_wohnungen} {t['mailboxes_explanation_2']}: {total_geschaefte}")
+
+
+    # Details als Tabellen anzeigen
+    with st.expander(t["details_apartments_by_address"]):
+        adressen_df = pd.DataFrame(
+            [{"Adresse": adr, "Wohnungen": count} for adr, count in gwr_result.wohnungen_by_streetnr.items()]
+        )
+        if not adressen_df.empty:
+            adressen_df_sorted = adressen_df.sort_values("Adresse")
+            st.write(adressen_df_sorted)
+        else:
+            st.write(t["no_addresses_found"])
 
 
-        #print(place_and_address_df)
-        num_frames = len(place_and_address_df)
-        #print(f"Anzahl der Frames: {num_frames}")
+    with st.expander(t["details_apartments_by_street"]):
+        strassen_df = pd.DataFrame(
+            [{"Strasse": street, "Wohnungen": count} for street, count in gwr_result.wohnungen_by_street.items()]
+        )
+        if not strassen_df.empty:
+            strassen_df_sorted = strassen_df.sort_values("Strasse")
+            st.write(strassen_df_sorted)
+        else:
+            st.write(t["no_streets_found"])
+
+
+    with st.expander(t["details_addresses"]):
+        st.write(f"{t['total_addresses']} {gwr_result.total_adressen}")
+        st.write(f"{t['api_requests']} {fetch_stats['requests']}")
+        if "saved_requests" in fetch_stats:
+            st.write(f"{t['api_requests_saved']} {fetch_stats['saved_requests']}")
+        st.write(f"{t['saturated_cells']} {fetch_stats['saturated_cells']}, {t['max_depth']} {fetch_stats['max_depth']}")
+        if fetch_stats.get("reused_cells"):
+            st.write(f"{t['reused_cells']} {fetch_stats['reused_cells']}")
+
+    #Tabelle mit total_places_pro_adresse anzeigen
+    with st.expander(t["details_businesses_by_address"]):
+        if total_places_pro_adresse_df.num_rows > 0:
+            st.write(total_places_pro_adresse_df)
+        else:
+            st.write(t["no_businesses_found"])
 
-        #aggregate place_and_address_df by flattened_addresses
-        total_places_pro_adresse_df = place_and_address_df.groupby('flattened_addresses').size().reset_index(name='count')
-        total_places_pro_adresse_df =total_places_pro_adresse_df.rename(columns={'flattened_addresses': 'Adresse', 'count': 'Geschäfte'})
+    # Tabelle mit place_and_address_df anzeigen
+    with st.expander(t["details_businesses"]):
+        if place_and_address_df.num_rows > 0:
+            st.write(place_and_address_df)
+        else:
+            st.write(t["no_businesses_found"])
 
-        #sortiere total_places_pro_adresse_df nach 'Adresse' absteigend
-        total_places_pro_adresse_df = total_places_pro_adresse_df.sort_values(by='Geschäfte', ascending=False)
 
-        #ändere in place_and_address_df den Namen der Spalte 'flattened_addresses' in 'Adresse' und die Spalte 'category' in 'Kategorie' und 'category_alt' in 'Kategorie_Alternative' und 'primary_name' in 'Geschäft'
-        place_and_address_df = place_and_address_df.rename(columns={'flattened_addresses': 'Adresse', 'primary_name': 'Geschäft', 'category': 'Kategorie', 'category_alt': 'Kategorie_Alternative'})
+@st.fragment(run_every=JOB_POLL_INTERVAL)
+def show_job_progress(job_id, t):
+    """Zeigt den Fortschritt eines Jobs an; nur dieses Fragment wird regelmässig neu ausgeführt.
 
-        #re-order: erste Spalte in place_and_address_df ist die Adresse, die zweite Spalte ist das Geschäft, die dritte Spalte ist die Kategorie und die vierte Spalte ist die Kategorie_Alternative
-        place_and_address_df = place_and_address_df[['Adresse', 'Geschäft', 'Kategorie', 'Kategorie_Alternative']]
+    Ist der Job nicht mehr eingereiht oder laufend, wird das ganze Skript neu ausgeführt, damit
+    show_job das Resultat bzw. den Fehler anzeigt.
+    """
+    job = get_job_queue().get(job_id)
+    if job is None or job["status"] not in ("queued", "running"):
+        st.rerun()
+    if job["status"] == "queued":
+        st.info(t["job_queued"])
+        return
+    st.progress(job["done"] / job["total"] if job["total"] else 0.0)
+    text = f"{t['job_progress']}: {job['done']} / {job['total']}"
+    if job["reused"]:
+        text += f" ({job['reused']} {t['job_reused']})"
+    st.text(text)
 
-        #Sortiere place_and_address_df nach 'Adresse' absteigend
-        place_and_address_df = place_and_address_df.sort_values(by='Adresse', ascending=False)
 
+def show_job(job_id, t):
+    """Zeigt den Status eines Jobs an und gibt sein Resultat zurück, sobald er fertig ist.
 
-        #total_places_pro_adresse = total_places_pro_adresse_df.values.tolist()
+    Args:
+        job_id (str): Kennung des Jobs (aus dieser Sitzung oder aus dem Link ?job=...).
+        t (dict): Übersetzungen der gewählten Sprache.
 
-        return num_frames, place_and_address_df,total_places_pro_adresse_df,release_date
+    Returns:
+        dict: Resultat wie bei calculate, oder None solange der Job läuft, fehlgeschlagen oder unbekannt ist.
+    """
+    queue = get_job_queue()
+    job = queue.get(job_id)
+    if job is None:
+        st.warning(t["job_not_found"])
+        return None
+    if job["status"] == "failed":
+        st.error(f"{t['job_failed']}: {job['error']}")
+        return None
+    if job["status"] == "done":
+        result_cache = get_result_cache()
+        calculation = result_cache.get(job["key"]) if result_cache is not None else None
+        if calculation is None:
+            calculation = queue.result(job_id)
+            if result_cache is not None:
+                # Unter dem Schlüssel des Jobs und dem des tatsächlich abgefragten Release ablegen
+                result_cache.put(job["key"], calculation)
+                result_cache.put(result_key(wkt.loads(job["polygon"]), calculation["release_date"]), calculation)
+        return calculation
+
+    st.warning(t["warning_large_polygon"])
+    st.markdown(f"[{t['job_link']}](?job={job_id})")
+    show_job_progress(job_id, t)
+    return None
 
 
 # Hauptprogramm
@@ -563,7 +467,7 @@ def extract_overture(polygon):        # Initial setup
 # Set the page title and icon
 
 # Streamlit app
-release_date = "-"
+release_date, _ = get_release()  # aktuelles Overture-Release, nach einer Berechnung das abgefragte
 gh_release= "-"
 gh_date= "-"
 
@@ -638,104 +542,70 @@ st.markdown(t["description"])
 #map_placeholder = st.empty()
 
 # Create the map and display it in the placeholder
-m = create_map(center=[46.8182, 8.2275], zoom=8)  # Centered on Switzerland
-output = st_folium(m, width=700)
+# (einmal pro Sitzung erstellt, siehe get_map)
+m = get_map(center=(46.8182, 8.2275), zoom=8)  # Centered on Switzerland
+output = st_folium(m, width=700, returned_objects=["last_active_drawing"])
 
 
 # Add a small vertical space if needed
 st.markdown("<div style='margin-top: -30px;'></div>", unsafe_allow_html=True)
 
+polygon = None
+if output["last_active_drawing"]:
+    drawn_polygon = output["last_active_drawing"]["geometry"]["coordinates"][0]
+    polygon = Polygon(drawn_polygon)
+
+# Resultate liegen im gemeinsamen Resultat-Cache; die Sitzung merkt sich nur, welche sie berechnet hat
+result_cache = get_result_cache()
+shown_results = st.session_state.setdefault("shown_results", set())
+key = result_key(polygon, get_release()[0]) if polygon is not None else None
+calculation = result_cache.get(key) if result_cache is not None and key is not None else None
+
+# Job dieser Sitzung oder aus dem Link (?job=...), siehe jobs.py
+job_id = st.query_params.get("job")
+
 if st.button(t["button_calculate"]):
-    if output["last_active_drawing"]:
-        drawn_polygon = output["last_active_drawing"]["geometry"]["coordinates"][0]
-        polygon = Polygon(drawn_polygon)
+    if polygon is not None:
         #st.write(f"polyarea: {polygon.area }")
 
         # Wenn polygon.area > 0.015, dann wird die Berechnung nihct gestartet und der nutzer aufgefordert ein kleineres Polygon zu zeichnen (max 150km2)
-        if polygon.area > 0.015:
+        # Mit dem lokalen GWR-Bestand (GWR_BACKEND=snapshot) gibt es keine API-Limits und damit keine Obergrenze
+        if polygon.area > 0.015 and BACKEND == "api":
             st.error(t["error_large_polygon"])
         else:
-            if polygon.area > 0.001:  # 0.001 entspricht ungefähr 10 km²
-                st.warning(t["warning_large_polygon"])
-
-            # Use the drawn polygon for calculations
-            max_area = 0.000005
-            sub_polygons = split_polygon(polygon, max_area)
-
-            total_adressen = 0
-            total_wohnungen = 0
-            aggregated_wohnungen_by_streetnr = defaultdict(int)
-            aggregated_wohnungen_by_street = defaultdict(int)
-
-            progress_bar = st.progress(0)
-            progress_text = st.empty()  # Platzhalter für Fortschrittsanzeige
-
-            # Iteriere über Subsets mit Countdown
-            for i, sub_polygon in enumerate(sub_polygons):
-                progress_text.text(f"{t['progress_text']} {len(sub_polygons) - i}")
-                result = query_geoadmin_with_polygon(sub_polygon)
-                if result:
-                    sub_total_wohnungen, sub_wohnungen_by_streetnr, sub_wohnungen_by_street = extract_wohnungen_and_counts(result)
-                    total_wohnungen += sub_total_wohnungen
-                    for street, count in sub_wohnungen_by_streetnr.items():
-                        aggregated_wohnungen_by_streetnr[street] += count
-                    for street, count in sub_wohnungen_by_street.items():
-                        aggregated_wohnungen_by_street[street] += count
-                progress_bar.progress((i + 1) / len(sub_polygons))
-            progress_text.text(t["progress_complete"])
-
-            # Geschäfte extraktion
-            with st.spinner(t['spinner_text']):
-                total_geschaefte, place_and_address_df, total_places_pro_adresse_df, release_date = extract_overture(polygon)
-            print(f"Anzahl der Geschäfte: {total_geschaefte}")
-
-
-            # Briefkästen direkt anzeigen
-            total_briefkaesten = total_wohnungen + total_geschaefte
-            st.subheader(f"{t['mailboxes_header']}: {total_briefkaesten}")
-            st.markdown(f"{t['mailboxes_explanation_1']}: {total_wohnungen} {t['mailboxes_explanation_2']}: {total_geschaefte}")
-
-
-            # Details als Tabellen anzeigen
-            with st.expander(t["details_apartments_by_address"]):
-                adressen_df = pd.DataFrame(
-                    [{"Adresse": adr, "Wohnungen": count} for adr, count in aggregated_wohnungen_by_streetnr.items()]
-                )
-                if not adressen_df.empty:
-                    adressen_df_sorted = adressen_df.sort_values("Adresse")
-                    st.write(adressen_df_sorted)
-                else:
-                    st.write(t["no_addresses_found"])
-
-
-            with st.expander(t["details_apartments_by_street"]):
-                strassen_df = pd.DataFrame(
-                    [{"Strasse": street, "Wohnungen": count} for street, count in aggregated_wohnungen_by_street.items()]
-                )
-                if not strassen_df.empty:
-                    strassen_df_sorted = strassen_df.sort_values("Strasse")
-                    st.write(strassen_df_sorted)
-                else:
-                    st.write(t["no_streets_found"])
-
-
-            with st.expander(t["details_addresses"]):
-                st.write(f"{t['total_addresses']} {total_adressen}")
-
-            #Tabelle mit total_places_pro_adresse anzeigen
-            with st.expander(t["details_businesses_by_address"]):
-                if not total_places_pro_adresse_df.empty:
-                    st.write(total_places_pro_adresse_df)
-                else:
-                    st.write(t["no_businesses_found"])
-
-            # Tabelle mit place_and_address_df anzeigen
-            with st.expander(t["details_businesses"]):
-                if not place_and_address_df.empty:
-                    st.write(place_and_address_df)
-                else:
-                    st.write(t["no_businesses_found"])
-
+            if calculation is not None:
+                # Derselbe Perimeter mit denselben Datenversionen wurde bereits berechnet (auch in einer anderen Sitzung)
+                print(f"Resultat {key[:12]} aus dem Resultat-Cache")
+            elif polygon.area > LARGE_AREA and BACKEND == "api":  # 0.001 entspricht ungefähr 10 km²
+                # Im Hintergrund berechnen; läuft für diesen Perimeter bereits ein Job, wird er übernommen
+                job_id = get_job_queue().submit(polygon, key)
+                st.query_params["job"] = job_id
+                calculation = show_job(job_id, t)
+            else:
+                st.query_params.pop("job", None)
+                calculation = calculate(polygon, t)
+                # Schlüssel mit dem tatsächlich abgefragten Release; unvollständige Resultate nicht ablegen,
+                # ein erneuter Klick fragt dann nur die fehlenden Zellen ab (checkpoint.py)
+                key = result_key(polygon, calculation["release_date"])
+                if result_cache is not None and not calculation["fetch_stats"].get("failed_cells"):
+                    result_cache.put(key, calculation)
+                    print(f"Resultat-Cache: {result_cache.get_stats()}")
+            if calculation is not None:
+                shown_results.add(key)
+                show_results(calculation, t)
+                release_date = calculation["release_date"]
+
+elif job_id is not None:
+    # Laufender oder fertiger Job: Fortschritt bzw. Resultat anzeigen, auch nach dem Neuladen der Seite
+    calculation = show_job(job_id, t)
+    if calculation is not None:
+        show_results(calculation, t)
+        release_date = calculation["release_date"]
+
+elif calculation is not None and key in shown_results:
+    # Gewöhnlicher Rerun (z.B. Sprache gewechselt): Resultat ohne neue Abfragen wieder anzeigen
+    show_results(calculation, t)
+    release_date = calculation["release_date"]
 
 else:
     st.warning(t["warning_draw_polygon"])
@@ -744,7 +614,7 @@ st.write("")
 st.write("")
 
 
-gh_release,gh_date=get_latest_release_date("https://github.com/davidoesch/wo-sind-briefkaesten/")
+gh_release,gh_date=get_app_version(REPO_URL)
 
 st.markdown("---")
 st.write(f"{t['footer_text']} {release_date}, App Version: {gh_release}, {gh_date}")
@@ -0,0 +1,282 @@
+"""
+Stapelverarbeitung vieler Perimeter
+
+Berechnet Wohnungen, Geschäfte und Briefkästen für alle Perimeter einer Datei (GeoPackage, GeoJSON
+oder KML), z.B. die Zustellbezirke einer Kampagne, und schreibt Summen und Detailtabellen als
+Parquet- oder CSV-Dateien.
+
+Die GWR-Abfragen laufen nicht pro Perimeter, sondern einmal über das schweizweite Kachelraster der
+Vereinigung aller Perimeter. Kacheln, die sich benachbarte Bezirke teilen, werden so nur einmal
+abgefragt. Die Antworten enthalten die Punktgeometrie der Gebäude und werden danach den Perimetern
+zugeordnet, in denen das Gebäude liegt. Alle Anfragen teilen sich den Verbindungspool und den
+Antwort-Cache; die Overture-Abfragen laufen parallel zu den GWR-Abfragen (siehe pipeline.py).
+Für viele Perimeter empfiehlt sich der lokale Overture-Auszug (overture_local.py).
+
+Aufruf:
+    python batch.py bezirke.gpkg --out resultate [--format parquet|csv] [--name-column NAME] [--layer LAYER]
+
+Ausgabe (im Verzeichnis --out):
+    totals: Wohnungen, Adressen, Geschäfte und Briefkästen pro Perimeter
+    apartments_by_address, apartments_by_street: Wohnungen pro Adresse bzw. Strasse
+    businesses, businesses_by_address: Geschäfte und Geschäfte pro Adresse
+"""
+
+import argparse
+import os
+import time
+import xml.etree.ElementTree as ET
+
+import geopandas as gpd
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+import shapely
+from shapely.geometry import Polygon
+from shapely.ops import unary_union
+
+from geoadmin import ADAPTIVE, BACKEND, COARSE_FACTOR, TILING, fetch_adaptive, grid_cells
+from gwr import GwrResult, extract_wohnungen_and_counts
+from gwr_snapshot import query_snapshot_with_polygon
+from pipeline import finish_overture, start_overture
+from response_cache import get_cache
+from tiling import to_lv95
+
+# Zellfläche des festen Rasters an der Bounding Box (nur für GEOADMIN_TILING=bbox), wie in app.py
+MAX_AREA = 0.000005
+
+KML_NAMESPACE = {"kml": "http://www.opengis.net/kml/2.2"}
+
+
+def _read_kml(path):
+    """Liest alle Placemarks mit Polygonen aus einer KML-Datei."""
+    root = ET.parse(path).getroot()
+    perimeters = []
+    for i, placemark in enumerate(root.iterfind(".//kml:Placemark", KML_NAMESPACE)):
+        polygons = []
+        for coordinates in placemark.iterfind(".//kml:Polygon/kml:outerBoundaryIs//kml:coordinates", KML_NAMESPACE):
+            coords = [tuple(map(float, coord.split(",")[:2])) for coord in coordinates.text.split()]
+            polygons.append(Polygon(coords))
+        if not polygons:
+            continue
+        name = placemark.findtext("kml:name", default=str(i), namespaces=KML_NAMESPACE)
+        perimeters.append((name, unary_union(polygons)))
+    return perimeters
+
+
+def read_perimeters(path, name_column=None, layer=None):
+    """Liest die Perimeter aus einer GeoPackage-, GeoJSON- oder KML-Datei.
+
+    Args:
+        path (str): Pfad der Datei.
+        name_column (str, optional): Spalte mit dem Namen des Perimeters. Standard: "name", falls
+            vorhanden, sonst die Zeilennummer. Bei KML der Name des Placemarks.
+        layer (str, optional): Layer im GeoPackage. Standard: der erste.
+
+    Returns:
+        list: (Name, Polygon in WGS84) pro Perimeter.
+    """
+    if path.lower().endswith(".kml"):
+        return _read_kml(path)
+
+    gdf = gpd.read_file(path, layer=layer)
+    if gdf.crs is not None and gdf.crs.to_epsg() != 4326:
+        gdf = gdf.to_crs(4326)
+
+    if name_column is not None:
+        names = gdf[name_column]
+    elif "name" in gdf.columns:
+        names = gdf["name"]
+    else:
+        names = gdf.index
+    return [(str(name), geometry) for name, geometry in zip(names, gdf.geometry) if geometry is not None and not geometry.is_empty]
+
+
+def feature_xy(feature):
+    """Gibt die Koordinaten eines Features der identify-Antwort zurück (Punktgeometrie oder Mitte der bbox).
+
+    Returns:
+        tuple: (x, y), oder (nan, nan) wenn das Feature keine Geometrie hat.
+    """
+    geometry = feature.get("geometry") or {}
+    if "x" in geometry and "y" in geometry:
+        return geometry["x"], geometry["y"]
+    bbox = feature.get("bbox")
+    if bbox and len(bbox) == 4:
+        return (bbox[0] + bbox[2]) / 2, (bbox[1] + bbox[3]) / 2
+    return np.nan, np.nan
+
+
+def fetch_gwr(perimeters, max_area=MAX_AREA, on_result=None):
+    """Fragt das GWR für alle Perimeter ab, gemeinsame Kacheln nur einmal.
+
+    Args:
+        perimeters (list): (Name, Polygon in WGS84) pro Perimeter, siehe read_perimeters.
+        max_area (float, optional): Zellfläche des festen Rasters (nur für tiling="bbox"). Standard: MAX_AREA.
+        on_result (callable, optional): Fortschritts-Callback, siehe geoadmin.fetch_adaptive.
+
+    Returns:
+        tuple: Ein Tupel bestehend aus:
+            - gwr_results (list): GwrResult pro Perimeter, in derselben Reihenfolge.
+            - stats (dict): Wie bei geoadmin.fetch_adaptive, ergänzt um 'separate_start_cells' (Startzellen,
+              wenn jeder Perimeter einzeln abgefragt würde), 'features_without_geometry' und
+              'failed_cells_by_perimeter' (fehlgeschlagene Zellen, die den Perimeter berühren, pro Perimeter).
+    """
+    gwr_results = [GwrResult() for _ in perimeters]
+
+    if BACKEND == "snapshot":
+        # Keine HTTP-Anfragen: jeder Perimeter wird direkt aus dem lokalen Bestand beantwortet
+        for (_, polygon), gwr_result in zip(perimeters, gwr_results):
+            extract_wohnungen_and_counts(query_snapshot_with_polygon(polygon), gwr_result)
+        return gwr_results, {"requests": 0, "saturated_cells": 0, "max_depth": 0, "truncated_cells": 0, "failed_cells": 0,
+                             "separate_start_cells": 0, "features_without_geometry": 0,
+                             "failed_cells_by_perimeter": [0] * len(perimeters)}
+
+    # Wie geoadmin.fetch_polygon: im adaptiven Modus mit groben Zellen beginnen
+    scale = COARSE_FACTOR if ADAPTIVE else 1
+    union = unary_union([polygon for _, polygon in perimeters])
+    cells, cell_bounds, sr, base_area = grid_cells(union, max_area, scale, TILING)
+
+    # Perimeter im Raumbezugssystem der Zellen, für die Zuordnung der Gebäude
+    shapes = [to_lv95(polygon) if sr == 2056 else polygon for _, polygon in perimeters]
+    tree = shapely.STRtree(shapes)
+    without_geometry = [0]
+    failed_cells = [0] * len(perimeters)
+
+    def assign(cell, sr, result):
+        if result is None:
+            # Zelle fehlt auch nach allen Wiederholungen: die betroffenen Perimeter sind unvollständig
+            for k in tree.query(cell, predicate="intersects"):
+                failed_cells[k] += 1
+            return
+        features = result.get("results", [])
+        if not features:
+            return
+        xy = np.array([feature_xy(feature) for feature in features], dtype=float)
+        without_geometry[0] += int(np.isnan(xy[:, 0]).sum())
+        for k in tree.query(cell, predicate="intersects"):
+            inside = shapely.contains_xy(shapes[k], xy[:, 0], xy[:, 1]).nonzero()[0]
+            if len(inside):
+                extract_wohnungen_and_counts({"results": [features[i] for i in inside]}, gwr_results[k])
+
+    _, stats = fetch_adaptive(cells, base_area / COARSE_FACTOR, sr=sr, on_result=on_result,
+                              cell_bounds=cell_bounds, on_cell=assign, return_geometry=True)
+
+    stats["separate_start_cells"] = sum(len(grid_cells(polygon, max_area, scale, TILING)[0]) for _, polygon in perimeters)
+    stats["features_without_geometry"] = without_geometry[0]
+    stats["failed_cells_by_perimeter"] = failed_cells
+    print(f"Startzellen: {len(cells)} gemeinsam (einzeln: {stats['separate_start_cells']}), Anfragen: {stats['requests']}")
+    if without_geometry[0]:
+        print(f"Warnung: {without_geometry[0]} Gebäude ohne Geometrie konnten keinem Perimeter zugeordnet werden.")
+
+    return gwr_results, stats
+
+
+def _with_perimeter(table, name):
+    """Stellt einer Tabelle die Spalte Perimeter voran."""
+    return table.add_column(0, "Perimeter", pa.array([name] * table.num_rows, pa.string()))
+
+
+def run_batch(perimeters, max_area=MAX_AREA):
+    """Berechnet alle Perimeter; die Overture-Abfragen laufen parallel zu den GWR-Abfragen.
+
+    Args:
+        perimeters (list): (Name, Polygon in WGS84) pro Perimeter, siehe read_perimeters.
+        max_area (float, optional): Zellfläche des festen Rasters (nur für tiling="bbox"). Standard: MAX_AREA.
+
+    Returns:
+        tuple: Ein Tupel bestehend aus:
+            - tables (dict): pyarrow.Table pro Ausgabe (totals, apartments_by_address, apartments_by_street,
+              businesses, businesses_by_address).
+            - stats (dict): Wie bei fetch_gwr.
+
+    Raises:
+        ValueError: Wenn keine Perimeter übergeben werden.
+    """
+    if not perimeters:
+        raise ValueError("Keine Perimeter mit Polygonen gefunden.")
+    start = time.perf_counter()
+    overture = [start_overture(polygon) for _, polygon in perimeters]
+
+    def print_progress(done, total):
+        print(f"Zelle {done} von {total} abgefragt...")
+
+    gwr_results, stats = fetch_gwr(perimeters, max_area, on_result=print_progress)
+    if get_cache() is not None:
+        print(f"GeoAdmin-Cache: {get_cache().get_stats()}")
+
+    totals = []
+    details = {"apartments_by_address": [], "apartments_by_street": [], "businesses": [], "businesses_by_address": []}
+    for (name, _), gwr_result, future, failed in zip(perimeters, gwr_results, overture, stats["failed_cells_by_perimeter"]):
+        total_geschaefte, places, places_per_address, release_date = finish_overture(future, gwr_result.businesses)
+        totals.append({
+            "Perimeter": name,
+            "Wohnungen": gwr_result.total_wohnungen,
+            "Adressen": gwr_result.total_adressen,
+            "Geschäfte": total_geschaefte,
+            "Briefkästen": gwr_result.total_wohnungen + total_geschaefte,
+            "Overture_Release": release_date,
+            "Fehlende_Zellen": failed,
+        })
+        details["apartments_by_address"].append(_with_perimeter(pa.table({
+            "Adresse": pa.array(list(gwr_result.wohnungen_by_streetnr.keys()), pa.string()),
+            "Wohnungen": pa.array(list(gwr_result.wohnungen_by_streetnr.values()), pa.int64()),
+        }), name))
+        details["apartments_by_street"].append(_with_perimeter(pa.table({
+            "Strasse": pa.array(list(gwr_result.wohnungen_by_street.keys()), pa.string()),
+            "Wohnungen": pa.array(list(gwr_result.wohnungen_by_street.values()), pa.int64()),
+        }), name))
+        details["businesses"].append(_with_perimeter(places, name))
+        details["businesses_by_address"].append(_with_perimeter(places_per_address, name))
+        print(f"{name}: {totals[-1]['Briefkästen']} Briefkästen ({gwr_result.total_wohnungen} Wohnungen, {total_geschaefte} Geschäfte)")
+        if failed:
+            print(f"Warnung: {name} ist unvollständig, {failed} Zellen konnten nicht abgefragt werden.")
+
+    tables = {"totals": pa.Table.from_pylist(totals)}
+    for kind, parts in details.items():
+        tables[kind] = pa.concat_tables(parts)
+
+    print(f"{len(perimeters)} Perimeter in {time.perf_counter() - start:.1f} s berechnet")
+    return tables, stats
+
+
+def write_tables(tables, out_dir, file_format="parquet"):
+    """Schreibt die Tabellen von run_batch als Parquet- oder CSV-Dateien.
+
+    Args:
+        tables (dict): pyarrow.Table pro Ausgabe.
+        out_dir (str): Zielverzeichnis, wird bei Bedarf angelegt.
+        file_format (str, optional): "parquet" oder "csv". Standard: "parquet".
+
+    Returns:
+        list: Pfade der geschriebenen Dateien.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for kind, table in tables.items():
+        path = os.path.join(out_dir, f"{kind}.{file_format}")
+        if file_format == "csv":
+            pa_csv.write_csv(table, path)
+        else:
+            pq.write_table(table, path)
+        paths.append(path)
+    print(f"Resultate nach {out_dir} geschrieben: {', '.join(os.path.basename(p) for p in paths)}")
+    return paths
+
+
+# Hauptprogramm
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Briefkästen für viele Perimeter berechnen.")
+    parser.add_argument("perimeters", help="GeoPackage, GeoJSON oder KML mit den Perimetern")
+    parser.add_argument("--out", default="batch_results", help="Zielverzeichnis (Standard: batch_results)")
+    parser.add_argument("--format", choices=("parquet", "csv"), default="parquet", help="Ausgabeformat (Standard: parquet)")
+    parser.add_argument("--name-column", help="Spalte mit dem Namen des Perimeters (Standard: name)")
+    parser.add_argument("--layer", help="Layer im GeoPackage (Standard: der erste)")
+    args = parser.parse_args()
+
+    perimeters = read_perimeters(args.perimeters, args.name_column, args.layer)
+    if not perimeters:
+        parser.exit(1, f"Keine Perimeter mit Polygonen in {args.perimeters} gefunden.\n")
+    print(f"{len(perimeters)} Perimeter aus {args.perimeters} gelesen")
+    tables, _ = run_batch(perimeters)
+    write_tables(tables, args.out, args.format)
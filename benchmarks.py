@@ -0,0 +1,313 @@
+"""
+Benchmarks
+
+Kleine Messungen mit synthetischen Daten, um Optimierungen vorher/nachher zu vergleichen. Es wird
+kein Netzwerk benötigt.
+
+Aufruf:
+    python benchmarks.py places [--rows 300000]
+    python benchmarks.py codes [--features 100000]
+    python benchmarks.py rerun [--reruns 20] [--latency 0.3]
+
+places:
+    Speicherbedarf und Laufzeit der Nachbearbeitung der Overture-Orte (Zusammenführen mit den
+    GWR-Geschäften, Gruppieren pro Adresse, Sortieren). Verglichen wird der frühere Weg über
+    pandas-DataFrames mit summarise_places (DuckDB/Arrow). Jede Variante läuft in einem eigenen
+    Prozess; gemessen wird der Zuwachs des Spitzen-Arbeitsspeichers (ru_maxrss), da die Puffer von
+    DuckDB und Arrow für tracemalloc unsichtbar sind.
+
+codes:
+    Einordnung der Gebäude ohne Wohnungen über GKAT/GKLAS für eine synthetische identify-Antwort.
+    Verglichen wird die frühere Suche mit any() über die ganze Tabelle der Gebäudecodes mit den
+    vorberechneten Indizes in gwr.classify_business.
+
+rerun:
+    Dauer und CPU-Zeit eines gewöhnlichen Streamlit-Reruns von app.py (z.B. nach Verschieben der
+    Karte) mit streamlit.testing. Die Dauer enthält die Wartezeiten von streamlit.testing, die
+    CPU-Zeit (process_time) zeigt den Aufwand des Servers. Ausgehende Anfragen über requests.get werden durch eine Attrappe mit fester
+    Latenz ersetzt und gezählt.
+"""
+
+import argparse
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import duckdb as db
+import pandas as pd
+import requests
+
+from gwr import BUILDING_CODES, GwrBusiness, GwrResult, classify_business, extract_wohnungen_and_counts
+
+
+def _peak_rss_mb():
+    """Spitzen-Arbeitsspeicher des Prozesses in MB (ru_maxrss ist unter Linux in KB)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _write_places(path, rows):
+    """Schreibt synthetische Orte mit den Spalten von build_places_query als Parquet-Datei."""
+    con = db.connect()
+    con.execute(f"""
+        COPY (
+            SELECT
+                'Geschäft ' || i AS primary_name,
+                'kategorie_' || (i % 50) AS category,
+                'alt_' || (i % 7) || ',alt_' || (i % 11) AS category_alt,
+                'Strasse ' || (i % (({rows} // 3) + 1)) || ', 3000 Bern' AS flattened_addresses
+            FROM range({rows}) t(i)
+        ) TO '{path}' (FORMAT PARQUET)
+    """)
+    con.close()
+
+
+def _gwr_businesses(rows):
+    """Synthetische Geschäfte aus dem GWR, etwa ein Drittel davon an Adressen, die auch in Overture vorkommen."""
+    return [
+        GwrBusiness(f"Strasse {i * 20}, 3000 Bern", "Gebäude ohne Wohnnutzung", "Bürogebäude")
+        for i in range(rows // 20)
+    ]
+
+
+def _places_pandas(con, query, gwr_businesses):
+    """Früherer Weg über pandas (fetchdf, concat, groupby, rename, sort_values)."""
+    place_and_address_df = con.execute(query).fetchdf()
+
+    gwrgeschaefte_by_streetnr_df = pd.DataFrame(
+        [{"address": b.address, "category": b.category, "category_alt": b.category_alt} for b in gwr_businesses]
+    )
+    new_df = pd.DataFrame({
+        'primary_name': 'Unbekannt',
+        'flattened_addresses': gwrgeschaefte_by_streetnr_df['address'],
+        'category': gwrgeschaefte_by_streetnr_df['category'],
+        'category_alt': gwrgeschaefte_by_streetnr_df['category_alt']
+    })
+    new_df = new_df[~new_df['flattened_addresses'].isin(place_and_address_df['flattened_addresses'])]
+    place_and_address_df = pd.concat([place_and_address_df, new_df], ignore_index=True)
+
+    num_frames = len(place_and_address_df)
+
+    total_places_pro_adresse_df = place_and_address_df.groupby('flattened_addresses').size().reset_index(name='count')
+    total_places_pro_adresse_df = total_places_pro_adresse_df.rename(columns={'flattened_addresses': 'Adresse', 'count': 'Geschäfte'})
+    total_places_pro_adresse_df = total_places_pro_adresse_df.sort_values(by='Geschäfte', ascending=False)
+
+    place_and_address_df = place_and_address_df.rename(columns={'flattened_addresses': 'Adresse', 'primary_name': 'Geschäft', 'category': 'Kategorie', 'category_alt': 'Kategorie_Alternative'})
+    place_and_address_df = place_and_address_df[['Adresse', 'Geschäft', 'Kategorie', 'Kategorie_Alternative']]
+    place_and_address_df = place_and_address_df.sort_values(by='Adresse', ascending=False)
+
+    return num_frames, len(place_and_address_df), len(total_places_pro_adresse_df)
+
+
+def _places_arrow(con, query, gwr_businesses):
+    """Neuer Weg: summarise_places (DuckDB/Arrow)."""
+    from overture_query import summarise_places
+
+    num_frames, places, places_per_address = summarise_places(con, query, gwr_businesses)
+    return num_frames, places.num_rows, places_per_address.num_rows
+
+
+def _run_places_variant(variant, path, rows):
+    """Führt eine Variante im aktuellen Prozess aus und gibt die Messwerte aus (für den Kindprozess)."""
+    con = db.connect()
+    query = f"SELECT * FROM read_parquet('{path}')"
+    gwr_businesses = _gwr_businesses(rows)
+    run = _places_pandas if variant == "pandas" else _places_arrow
+
+    # Importe und Datenaufbau sollen nicht mitgemessen werden
+    if variant == "arrow":
+        import overture_query  # noqa: F401
+    baseline = _peak_rss_mb()
+
+    start = time.perf_counter()
+    counts = run(con, query, gwr_businesses)
+    elapsed = time.perf_counter() - start
+
+    print(f"{variant} {elapsed:.3f} {_peak_rss_mb() - baseline:.1f} {counts[0]} {counts[1]} {counts[2]}")
+
+
+def benchmark_places(rows):
+    """Vergleicht den Speicherbedarf der Nachbearbeitung der Overture-Orte vorher/nachher.
+
+    Args:
+        rows (int): Anzahl synthetischer Orte.
+
+    Returns:
+        dict: Pro Variante Laufzeit (s), Zuwachs des Spitzenspeichers (MB) und Anzahl Zeilen.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "places.parquet")
+        _write_places(path, rows)
+
+        for variant in ("pandas", "arrow"):
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "_places_variant", variant, path, str(rows)],
+                check=True, capture_output=True, text=True,
+                cwd=os.path.dirname(os.path.abspath(__file__)),
+            ).stdout.split()
+            results[variant] = {
+                "seconds": float(output[1]),
+                "peak_mb": float(output[2]),
+                "rows": int(output[3]),
+            }
+
+    print(f"Nachbearbeitung von {rows} Orten:")
+    print(f"{'Variante':<10}{'Zeit (s)':>10}{'Spitze (MB)':>14}{'Zeilen':>10}")
+    for variant, r in results.items():
+        print(f"{variant:<10}{r['seconds']:>10.3f}{r['peak_mb']:>14.1f}{r['rows']:>10}")
+    return results
+
+
+def _classify_any(gkat, gklas):
+    """Frühere Einordnung: zwei any()-Suchen über die ganze Tabelle (mit vertauschtem Vergleich)."""
+    building_codes = BUILDING_CODES
+    if any(building_codes[code]["CODE"] == gkat for code in building_codes if "CODE" in building_codes[code]) or any(building_codes[code]["KAT"] == gklas for code in building_codes if "KAT" in building_codes[code]):
+        category = building_codes.get(gkat, {}).get("BESCHREIBUNG", "Code not found")
+        category_alt = building_codes.get(gklas, {}).get("BESCHREIBUNG", "Code not found")
+        if category_alt != "Code not found":
+            return category, category_alt
+    return None
+
+
+def _synthetic_response(features):
+    """Synthetische identify-Antwort mit Gebäuden ohne Wohnungen und gemischten GKAT/GKLAS-Codes."""
+    rng = random.Random(42)
+    # Auch Codes, die nicht in der Tabelle stehen (z.B. GKAT 1080, GKLAS 1242)
+    gkats = [1010, 1020, 1030, 1040, 1060, 1080]
+    gklases = [code for code, entry in BUILDING_CODES.items() if entry["KAT"] == "GKLAS"] + [1242, 1252, 1271]
+    return {"results": [
+        {
+            "featureId": f"{i}_0",
+            "attributes": {
+                "ganzwhg": 0,
+                "gkat": rng.choice(gkats),
+                "gklas": rng.choice(gklases),
+                "strname": [f"Strasse {i % 500}"],
+                "strname_deinr": f"Strasse {i % 500} {i}",
+            },
+        }
+        for i in range(features)
+    ]}
+
+
+def benchmark_codes(features):
+    """Vergleicht die Einordnung über any()-Suchen mit den vorberechneten Indizes.
+
+    Args:
+        features (int): Anzahl synthetischer Gebäude.
+
+    Returns:
+        dict: Laufzeiten (s) der Einordnung vorher/nachher, der ganzen Auswertung und Anzahl abweichender Einordnungen.
+    """
+    attributes = [f["attributes"] for f in _synthetic_response(features)["results"]]
+
+    timings = {}
+    for name, classify in (("any", _classify_any), ("index", classify_business)):
+        start = time.perf_counter()
+        for a in attributes:
+            classify(a["gkat"], a["gklas"])
+        timings[name] = time.perf_counter() - start
+
+    differences = sum(1 for a in attributes if _classify_any(a["gkat"], a["gklas"]) != classify_business(a["gkat"], a["gklas"]))
+
+    # Ganze Auswertung einer Antwort mit den neuen Indizes (inkl. Deduplizierung und Summen)
+    response = _synthetic_response(features)
+    start = time.perf_counter()
+    extract_wohnungen_and_counts(response, GwrResult())
+    timings["extract"] = time.perf_counter() - start
+
+    print(f"Einordnung von {features} Gebäuden ohne Wohnungen:")
+    print(f"  any() über die Tabelle:  {timings['any']:.3f} s ({timings['any'] / features * 1e6:.2f} µs pro Gebäude)")
+    print(f"  Indizes:                 {timings['index']:.3f} s ({timings['index'] / features * 1e6:.2f} µs pro Gebäude)")
+    print(f"  extract_wohnungen_and_counts gesamt: {timings['extract']:.3f} s")
+    print(f"  Abweichende Einordnungen (korrigierter Vergleich): {differences}")
+    timings["differences"] = differences
+    return timings
+
+
+def benchmark_rerun(reruns, latency):
+    """Misst die Dauer gewöhnlicher Reruns von app.py und zählt die ausgehenden Anfragen.
+
+    Args:
+        reruns (int): Anzahl Reruns nach dem ersten Lauf.
+        latency (float): Simulierte Antwortzeit einer Anfrage in Sekunden.
+
+    Returns:
+        dict: 'first_run' (s), 'rerun_median' (s), 'rerun_cpu_median' (s), 'requests_first_run' und
+        'requests_per_rerun'.
+    """
+    from unittest import mock
+    from streamlit.testing.v1 import AppTest
+
+    # Antwort im Format der GitHub-Releases-Seite
+    page = (b'<a class="Link--primary" href="/davidoesch/wo-sind-briefkaesten/releases/tag/v1.0">v1.0</a>'
+            b'<relative-time datetime="2025-01-01T00:00:00Z"></relative-time>')
+    urls = []
+
+    def fake_get(url, *args, **kwargs):
+        urls.append(url)
+        time.sleep(latency)
+        response = requests.Response()
+        response.status_code = 200
+        response._content = page
+        return response
+
+    app_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+    with mock.patch("requests.get", fake_get):
+        at = AppTest.from_file(app_path, default_timeout=60)
+        start = time.perf_counter()
+        at.run()
+        first_run = time.perf_counter() - start
+        requests_first_run = len(urls)
+
+        timings = []
+        cpu_timings = []
+        for _ in range(reruns):
+            start, cpu_start = time.perf_counter(), time.process_time()
+            at.run()
+            timings.append(time.perf_counter() - start)
+            cpu_timings.append(time.process_time() - cpu_start)
+
+    timings.sort()
+    cpu_timings.sort()
+    results = {
+        "first_run": first_run,
+        "rerun_median": timings[len(timings) // 2],
+        "rerun_cpu_median": cpu_timings[len(cpu_timings) // 2],
+        "requests_first_run": requests_first_run,
+        "requests_per_rerun": (len(urls) - requests_first_run) / reruns,
+    }
+    print(f"app.py, {reruns} Reruns, simulierte Latenz {latency} s pro Anfrage:")
+    print(f"  erster Lauf:        {results['first_run']:.3f} s ({results['requests_first_run']} Anfragen)")
+    print(f"  Rerun (Median):     {results['rerun_median']:.3f} s ({results['requests_per_rerun']:.1f} Anfragen pro Rerun)")
+    print(f"  CPU pro Rerun (Median): {results['rerun_cpu_median'] * 1000:.1f} ms")
+    return results
+
+
+# Hauptprogramm
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "_places_variant":
+        _run_places_variant(sys.argv[2], sys.argv[3], int(sys.argv[4]))
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(description="Benchmarks mit synthetischen Daten.")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+    places_parser = subparsers.add_parser("places", help="Nachbearbeitung der Overture-Orte: pandas gegen DuckDB/Arrow")
+    places_parser.add_argument("--rows", type=int, default=300000, help="Anzahl synthetischer Orte (Standard: 300000)")
+    codes_parser = subparsers.add_parser("codes", help="Einordnung über GKAT/GKLAS: any() gegen Indizes")
+    codes_parser.add_argument("--features", type=int, default=100000, help="Anzahl synthetischer Gebäude (Standard: 100000)")
+    rerun_parser = subparsers.add_parser("rerun", help="Dauer gewöhnlicher Reruns von app.py")
+    rerun_parser.add_argument("--reruns", type=int, default=20, help="Anzahl Reruns (Standard: 20)")
+    rerun_parser.add_argument("--latency", type=float, default=0.3, help="Simulierte Latenz pro Anfrage in s (Standard: 0.3)")
+    args = parser.parse_args()
+
+    if args.benchmark == "places":
+        benchmark_places(args.rows)
+    elif args.benchmark == "codes":
+        benchmark_codes(args.features)
+    elif args.benchmark == "rerun":
+        benchmark_rerun(args.reruns, args.latency)
@@ -0,0 +1,155 @@
+"""
+Checkpoints der abgefragten Zellen
+
+Persistenter SQLite-Speicher für die Antworten der Zellen eines Perimeters, damit ein abgebrochener
+Lauf (Zeitüberschreitung einer Anfrage, abgebrochene Browser-Sitzung, Neustart eines Workers) nicht
+von vorne beginnt. Jede Antwort wird sofort nach dem Eintreffen gespeichert, mit der Zell-ID aus dem
+Quadtree (siehe geoadmin.fetch_adaptive). Ein erneuter Lauf für denselben Perimeter fragt nur die
+fehlenden Zellen ab und meldet, wie viele übernommen wurden.
+
+Der Schlüssel besteht aus dem kanonischen Hash des Perimeters (result_cache.perimeter_key), dem Stand
+des GWR und dem Raster (die Zell-IDs hängen von Kachelung, Modus, Zellfläche, COARSE_FACTOR und
+Kachelgrösse ab). Nach einem vollständigen Lauf
+werden die Checkpoints des Perimeters gelöscht; das Resultat liegt dann im Resultat-Cache. Nicht
+abgeschlossene Checkpoints verfallen nach CHECKPOINT_TTL.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from geoadmin import ADAPTIVE, BACKEND, COARSE_FACTOR, TILING
+from result_cache import gwr_version, perimeter_key
+from tiling import TILE_SIZE
+
+CHECKPOINT_PATH = os.environ.get("CHECKPOINT_PATH", "checkpoints.sqlite")
+
+# Das GWR wird täglich aktualisiert: Checkpoints sind einen Tag gültig
+CHECKPOINT_TTL = int(os.environ.get("CHECKPOINT_TTL", str(24 * 60 * 60)))
+
+
+def checkpoint_key(polygon, max_area):
+    """Erzeugt den Schlüssel der Checkpoints eines Perimeters.
+
+    Args:
+        polygon (shapely.geometry.Polygon): Der Perimeter in WGS84.
+        max_area (float): Zellfläche des Rasters (siehe geoadmin.fetch_polygon).
+
+    Returns:
+        str: SHA-1-Hash aus Perimeter, GWR-Stand und Raster.
+    """
+    payload = json.dumps(
+        [perimeter_key(polygon), gwr_version(), TILING, ADAPTIVE, max_area, COARSE_FACTOR, TILE_SIZE],
+        separators=(",", ":"),
+    )
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class CheckpointStore:
+    """Thread-sicherer SQLite-Speicher der Zellantworten, pro Perimeter und Zell-ID.
+
+    Args:
+        path (str, optional): Pfad der SQLite-Datei. Standard: CHECKPOINT_PATH.
+        ttl (int, optional): Gültigkeit eines Eintrags in Sekunden. Standard: CHECKPOINT_TTL.
+    """
+
+    def __init__(self, path=CHECKPOINT_PATH, ttl=CHECKPOINT_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._con = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._con.execute("PRAGMA journal_mode=WAL")
+        self._con.execute(
+            "CREATE TABLE IF NOT EXISTS cells ("
+            "perimeter TEXT NOT NULL, cell_id TEXT NOT NULL, created REAL NOT NULL, body TEXT NOT NULL, "
+            "PRIMARY KEY (perimeter, cell_id))"
+        )
+        self._con.execute("CREATE INDEX IF NOT EXISTS cells_created ON cells (created)")
+        self._con.execute("DELETE FROM cells WHERE created < ?", (time.time() - ttl,))
+        self._con.commit()
+
+    def get(self, perimeter, cell_id):
+        """Gibt die gespeicherte Antwort einer Zelle zurück, oder None wenn sie fehlt oder abgelaufen ist."""
+        with self._lock:
+            row = self._con.execute(
+                "SELECT body FROM cells WHERE perimeter = ? AND cell_id = ? AND created >= ?",
+                (perimeter, cell_id, time.time() - self.ttl),
+            ).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def put(self, perimeter, cell_id, response):
+        """Speichert die Antwort einer Zelle."""
+        body = json.dumps(response, separators=(",", ":"))
+        with self._lock:
+            self._con.execute(
+                "INSERT OR REPLACE INTO cells (perimeter, cell_id, created, body) VALUES (?, ?, ?, ?)",
+                (perimeter, cell_id, time.time(), body),
+            )
+            self._con.commit()
+
+    def count(self, perimeter):
+        """Gibt die Anzahl gültiger gespeicherter Zellen eines Perimeters zurück."""
+        with self._lock:
+            return self._con.execute(
+                "SELECT COUNT(*) FROM cells WHERE perimeter = ? AND created >= ?", (perimeter, time.time() - self.ttl)
+            ).fetchone()[0]
+
+    def clear(self, perimeter):
+        """Löscht die Checkpoints eines Perimeters."""
+        with self._lock:
+            self._con.execute("DELETE FROM cells WHERE perimeter = ?", (perimeter,))
+            self._con.commit()
+
+
+class Checkpoint:
+    """Checkpoints eines Perimeters für geoadmin.fetch_adaptive (get/put pro Zell-ID).
+
+    Args:
+        store (CheckpointStore): Der Speicher.
+        perimeter (str): Schlüssel des Perimeters (checkpoint_key).
+    """
+
+    def __init__(self, store, perimeter):
+        self.store = store
+        self.perimeter = perimeter
+
+    def get(self, cell_id):
+        return self.store.get(self.perimeter, cell_id)
+
+    def put(self, cell_id, response):
+        self.store.put(self.perimeter, cell_id, response)
+
+    def count(self):
+        """Gibt die Anzahl bereits gespeicherter Zellen zurück."""
+        return self.store.count(self.perimeter)
+
+    def clear(self):
+        """Löscht die Checkpoints, z.B. nachdem alle Zellen erfolgreich abgefragt wurden."""
+        self.store.clear(self.perimeter)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def open_checkpoint(polygon, max_area):
+    """Gibt die Checkpoints eines Perimeters im prozessweiten Speicher zurück.
+
+    Args:
+        polygon (shapely.geometry.Polygon): Der Perimeter in WGS84.
+        max_area (float): Zellfläche des Rasters, mit der der Perimeter abgefragt wird.
+
+    Returns:
+        Checkpoint: Die Checkpoints, oder None mit CHECKPOINT=0 oder dem lokalen GWR-Bestand (dort
+        gibt es keine Zellen abzufragen).
+    """
+    global _store
+    if os.environ.get("CHECKPOINT", "1") == "0" or BACKEND == "snapshot":
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = CheckpointStore()
+    return Checkpoint(_store, checkpoint_key(polygon, max_area))
@@ -0,0 +1,703 @@
+"""
+GeoAdmin-Client
+
+Gemeinsame Funktionen für die Abfrage des Gebäude- und Wohnungsregisters (GWR) über die
+identify-Schnittstelle von api3.geo.admin.ch. Wird von app.py und madd_extract.py verwendet.
+
+Die Teilpolygone aus split_polygon werden parallel abgefragt. Alle Anfragen teilen sich eine
+requests.Session, deren Keep-Alive-Verbindungen im Pool wiederverwendet werden. Im adaptiven Modus
+wird mit groben Zellen begonnen und nur dort verfeinert, wo die API das Trefferlimit erreicht. Auch
+mit festem Raster werden Zellen, die das Trefferlimit erreichen, in Teilzellen neu abgefragt.
+
+Fehlgeschlagene Anfragen (Zeitüberschreitung, Verbindungsfehler, HTTP 429 und 5xx) werden mit
+exponentiellem Backoff und Jitter wiederholt. Ein Token-Bucket in einer gemeinsamen SQLite-Datei begrenzt
+die Anfragen pro Sekunde über alle Sitzungen und Prozesse, und ein Circuit Breaker setzt die Anfragen aus,
+wenn die API wiederholt nicht antwortet. Zellen, die auch danach fehlen, werden in den Statistiken als
+'failed_cells' gemeldet.
+"""
+
+import json
+import math
+import os
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import requests
+from requests.adapters import HTTPAdapter
+from shapely.geometry import Polygon, MultiPolygon
+
+from gwr_snapshot import fetch_polygon_snapshot
+from response_cache import get_cache, cache_key
+from tiling import split_polygon, split_polygon_lv95, split_cell, TILE_SIZE
+
+# identify-Schnittstelle, mit GEOADMIN_ENDPOINT z.B. auf einen lokalen Stub umleitbar
+ENDPOINT = os.environ.get("GEOADMIN_ENDPOINT", "https://api3.geo.admin.ch/rest/services/api/MapServer/identify")
+LAYER = "all:ch.bfs.gebaeude_wohnungs_register"
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/116.0.0.0 Safari/537.36"
+}
+
+# Maximale Anzahl gleichzeitiger Anfragen an api3.geo.admin.ch (über Umgebungsvariable anpassbar)
+MAX_WORKERS = int(os.environ.get("GEOADMIN_MAX_WORKERS", "8"))
+
+# Die identify-Schnittstelle liefert höchstens 200 Treffer pro Anfrage
+RESULT_CAP = 200
+
+# Adaptiver Modus (Quadtree) statt festem Raster, mit GEOADMIN_ADAPTIVE=0 abschaltbar
+ADAPTIVE = os.environ.get("GEOADMIN_ADAPTIVE", "1") != "0"
+
+# Datenquelle: "api" (identify-Anfragen an api3.geo.admin.ch) oder "snapshot" (lokaler GWR-Bestand, siehe gwr_snapshot.py)
+BACKEND = os.environ.get("GWR_BACKEND", "api")
+
+# Raster der Zellen: "lv95" (festes, schweizweites Kachelraster) oder "bbox" (an der Bounding Box des Polygons)
+TILING = os.environ.get("GEOADMIN_TILING", "lv95")
+
+# Adaptiver Modus: Startzellen sind COARSE_FACTOR-mal grösser als max_area, die kleinsten Zellen COARSE_FACTOR-mal kleiner
+COARSE_FACTOR = 16
+
+# Wiederholungen einer fehlgeschlagenen Anfrage (Zeitüberschreitung, Verbindungsfehler, RETRY_STATUS)
+RETRIES = int(os.environ.get("GEOADMIN_RETRIES", "4"))
+
+# Wartezeit vor der n-ten Wiederholung: zufällig zwischen 0 und min(BACKOFF_MAX, BACKOFF_BASE * 2**n) Sekunden
+BACKOFF_BASE = float(os.environ.get("GEOADMIN_BACKOFF_BASE", "0.5"))
+BACKOFF_MAX = float(os.environ.get("GEOADMIN_BACKOFF_MAX", "30"))
+
+# HTTP-Status, bei denen sich eine Wiederholung lohnt
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# Höchstens RATE Anfragen pro Sekunde über alle Sitzungen und Prozesse (0 schaltet die Begrenzung ab)
+RATE = float(os.environ.get("GEOADMIN_RATE", "20"))
+
+# SQLite-Datei, über die sich alle Prozesse (Streamlit, Job-Worker, api.py) den Bucket teilen; leer für
+# einen Bucket pro Prozess
+RATE_PATH = os.environ.get("GEOADMIN_RATE_PATH", "geoadmin_rate.sqlite")
+
+# Nach BREAKER_THRESHOLD Fehlschlägen in Folge werden BREAKER_COOLDOWN Sekunden lang keine Anfragen gesendet
+BREAKER_THRESHOLD = int(os.environ.get("GEOADMIN_BREAKER_THRESHOLD", "10"))
+BREAKER_COOLDOWN = float(os.environ.get("GEOADMIN_BREAKER_COOLDOWN", "30"))
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class TokenBucket:
+    """Thread-sicherer Token-Bucket: höchstens rate Anfragen pro Sekunde, Spitzen bis capacity.
+
+    Args:
+        rate (float, optional): Anfragen pro Sekunde, 0 für unbegrenzt. Standard: RATE.
+        capacity (int, optional): Grösse des Buckets. Standard: MAX_WORKERS.
+    """
+
+    def __init__(self, rate=RATE, capacity=MAX_WORKERS):
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _apply(self, change):
+        """Füllt den Bucket bis jetzt auf und wendet change an.
+
+        Args:
+            change (callable): Erhält den Stand und gibt (neuer Stand, Rückgabewert) zurück.
+
+        Returns:
+            Der Rückgabewert von change.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens, result = change(self._tokens)
+        return result
+
+    def acquire(self):
+        """Wartet, bis ein Token frei ist, und verbraucht es."""
+        if self.rate <= 0:
+            return
+
+        def take(tokens):
+            if tokens >= 1:
+                return tokens - 1, 0
+            return tokens, (1 - tokens) / self.rate
+
+        while True:
+            delay = self._apply(take)
+            if delay <= 0:
+                return
+            time.sleep(delay)
+
+    def pause(self, seconds):
+        """Leert den Bucket für seconds Sekunden, z.B. nach HTTP 429 mit Retry-After (gilt für alle Threads)."""
+        if self.rate <= 0:
+            return
+        # Erst bis jetzt auffüllen (siehe _apply), sonst schreibt das nächste acquire die Pause wieder gut
+        self._apply(lambda tokens: (min(tokens, -seconds * self.rate), None))
+
+
+class SharedTokenBucket(TokenBucket):
+    """Token-Bucket in einer SQLite-Datei, den sich alle Prozesse auf demselben Rechner teilen.
+
+    Jeder Prozess (Streamlit-Server, Job-Worker, api.py) hätte mit TokenBucket ein eigenes Budget,
+    die tatsächliche Rate wäre ein Vielfaches von rate. Stand und Zeitpunkt liegen deshalb in einer
+    Zeile, die in einer Schreibtransaktion gelesen und aktualisiert wird. Ist die Datei nicht
+    verfügbar, gilt vorübergehend der Bucket des Prozesses.
+
+    Args:
+        path (str, optional): Pfad der SQLite-Datei. Standard: RATE_PATH.
+        rate (float, optional): Anfragen pro Sekunde, 0 für unbegrenzt. Standard: RATE.
+        capacity (int, optional): Grösse des Buckets. Standard: MAX_WORKERS.
+    """
+
+    def __init__(self, path=RATE_PATH, rate=RATE, capacity=MAX_WORKERS):
+        super().__init__(rate, capacity)
+        self.path = path
+        self._con = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._con.execute("PRAGMA journal_mode=WAL")
+        self._con.execute(
+            "CREATE TABLE IF NOT EXISTS bucket (id INTEGER PRIMARY KEY CHECK (id = 0), tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+        self._con.execute("INSERT OR IGNORE INTO bucket (id, tokens, updated) VALUES (0, ?, ?)", (self.capacity, time.time()))
+
+    def _apply(self, change):
+        # Prozessübergreifend zählt die Uhrzeit statt time.monotonic()
+        try:
+            with self._lock:
+                self._con.execute("BEGIN IMMEDIATE")
+                try:
+                    tokens, updated = self._con.execute("SELECT tokens, updated FROM bucket WHERE id = 0").fetchone()
+                    now = time.time()
+                    tokens = min(self.capacity, tokens + max(now - updated, 0) * self.rate)
+                    tokens, result = change(tokens)
+                    self._con.execute("UPDATE bucket SET tokens = ?, updated = ? WHERE id = 0", (tokens, now))
+                    self._con.execute("COMMIT")
+                except BaseException:
+                    self._con.execute("ROLLBACK")
+                    raise
+            return result
+        except sqlite3.Error as e:
+            print(f"Gemeinsamer Token-Bucket nicht verfügbar ({e}), Begrenzung nur im Prozess")
+            return super()._apply(change)
+
+
+class CircuitBreaker:
+    """Thread-sicherer Circuit Breaker für die GeoAdmin API.
+
+    Nach threshold Fehlschlägen in Folge ist er offen: cooldown Sekunden lang wird nicht angefragt,
+    statt die API weiter zu belasten. Danach wird eine einzelne Probe-Anfrage durchgelassen; gelingt
+    sie, ist er wieder geschlossen, sonst bleibt er für einen weiteren cooldown offen. Die übrigen
+    Anfragen warten so lange (siehe wait), statt sofort aufzugeben; erst wenn die API länger ausfällt,
+    geben sie ohne Warten auf.
+
+    Args:
+        threshold (int, optional): Fehlschläge in Folge bis zum Öffnen. Standard: BREAKER_THRESHOLD.
+        cooldown (float, optional): Pause in Sekunden. Standard: BREAKER_COOLDOWN.
+    """
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._failures = 0
+        self._opened = None
+        self._probe = None
+        self._trips = 0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Gibt zurück, ob eine Anfrage gesendet werden darf (offen: nur die Probe-Anfrage nach dem cooldown)."""
+        with self._lock:
+            if self._opened is None:
+                return True
+            if time.monotonic() - self._opened >= self.cooldown and self._probe is None:
+                # Probe-Anfrage dieses Threads; weitere erst nach ihrem Ergebnis
+                self._probe = threading.get_ident()
+                return True
+            return False
+
+    def wait(self, max_trips=RETRIES):
+        """Wartet, bis eine Anfrage gesendet werden darf.
+
+        Args:
+            max_trips (int, optional): Ist der Breaker seit der letzten Antwort öfter als max_trips Mal
+                geöffnet worden (die API ist ausgefallen), wird nicht mehr gewartet, ausser auf die
+                eigene Probe-Anfrage. Standard: RETRIES.
+
+        Returns:
+            bool: True, sobald angefragt werden darf; False, wenn währenddessen eine Probe-Anfrage
+            fehlgeschlagen ist und der Breaker für einen weiteren cooldown offen bleibt.
+        """
+        with self._lock:
+            trips = self._trips
+        while not self.allow():
+            with self._lock:
+                if self._trips != trips or self._trips > max_trips:
+                    return False
+                if self._probe is not None:
+                    # Ergebnis der Probe-Anfrage abwarten
+                    delay = min(self.cooldown, 0.1)
+                else:
+                    delay = self.cooldown - (time.monotonic() - self._opened)
+            time.sleep(max(delay, 0.01))
+        return True
+
+    def record(self, success):
+        """Meldet das Ergebnis einer Anfrage.
+
+        Args:
+            success (bool): True, wenn die API geantwortet hat; False bei Zeitüberschreitung,
+                Verbindungsfehler oder HTTP 5xx; None, wenn die Antwort nichts über die Verfügbarkeit
+                aussagt (z.B. HTTP 429, die Drosselung übernehmen Token-Bucket und Retry-After).
+        """
+        with self._lock:
+            probe = self._probe == threading.get_ident()
+            if probe:
+                self._probe = None
+            if success is None:
+                return
+            if success:
+                if self._opened is not None:
+                    print("GeoAdmin API antwortet wieder, Anfragen werden fortgesetzt")
+                self._failures = 0
+                self._opened = None
+                self._probe = None
+                self._trips = 0
+                return
+            self._failures += 1
+            if self._failures >= self.threshold and (self._opened is None or probe):
+                if self._opened is None:
+                    print(f"GeoAdmin API: {self._failures} Fehlschläge in Folge, Anfragen werden {self.cooldown:.0f} s ausgesetzt")
+                self._opened = time.monotonic()
+                self._trips += 1
+
+
+# Prozessweit, von allen Sitzungen und Threads geteilt
+_bucket = None
+_bucket_lock = threading.Lock()
+_breaker = CircuitBreaker()
+_client_stats = {"requests": 0, "retries": 0, "throttled": 0, "rejected": 0, "failed": 0}
+_client_stats_lock = threading.Lock()
+
+
+def _count(name):
+    with _client_stats_lock:
+        _client_stats[name] += 1
+
+
+def get_client_stats():
+    """Gibt die prozessweiten Zähler des Clients zurück.
+
+    Returns:
+        dict: 'requests' (gesendete HTTP-Anfragen), 'retries' (Wiederholungen), 'throttled' (Antworten
+        mit HTTP 429), 'rejected' (Versuche, die mit einer fehlgeschlagenen Probe-Anfrage des Circuit
+        Breakers verfallen sind) und 'failed' (Zellen, die auch nach allen Wiederholungen fehlen).
+    """
+    with _client_stats_lock:
+        return dict(_client_stats)
+
+
+def get_bucket():
+    """Gibt den Token-Bucket für die Anfragen zurück (beim ersten Aufruf erstellt).
+
+    Returns:
+        TokenBucket: Mit RATE_PATH ein SharedTokenBucket, den sich alle Prozesse teilen, sonst ein
+        Bucket pro Prozess.
+    """
+    global _bucket
+    with _bucket_lock:
+        if _bucket is None:
+            if RATE_PATH and RATE > 0:
+                try:
+                    _bucket = SharedTokenBucket(RATE_PATH)
+                except sqlite3.Error as e:
+                    print(f"Gemeinsamer Token-Bucket {RATE_PATH} nicht verfügbar ({e}), Begrenzung nur im Prozess")
+                    _bucket = TokenBucket()
+            else:
+                _bucket = TokenBucket()
+    return _bucket
+
+
+def _retry_after(response):
+    """Liest den Header Retry-After (in Sekunden), oder None."""
+    try:
+        return min(float(response.headers["Retry-After"]), BACKOFF_MAX)
+    except (KeyError, ValueError):
+        return None
+
+
+def get_session():
+    """Gibt die prozessweite requests.Session mit Verbindungspool zurück.
+
+    Der Pool ist so gross wie MAX_WORKERS, damit jeder Worker-Thread seine Keep-Alive-Verbindung
+    behalten kann, statt pro Anfrage eine neue TLS-Verbindung aufzubauen.
+
+    Returns:
+        requests.Session: Die gemeinsam genutzte Session.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(MAX_WORKERS, 1))
+            session.mount("https://", adapter)
+            session.headers.update(HEADERS)
+            _session = session
+    return _session
+
+
+def query_geoadmin_with_polygon(polygon, sr=4326, return_geometry=False):
+    """Sendet eine Anfrage an die GeoAdmin API mit einem gegebenen Polygon.
+
+    Antworten werden im persistenten Antwort-Cache (response_cache.py) abgelegt; eine erneute Abfrage
+    derselben Zelle innerhalb eines Tages wird ohne HTTP-Aufruf aus dem Cache beantwortet.
+
+    Zeitüberschreitungen, Verbindungsfehler und HTTP 429/5xx werden bis zu RETRIES Mal wiederholt, mit
+    exponentiellem Backoff und Jitter (bei Retry-After mindestens so lange). Jede Anfrage wartet auf ein
+    Token des Token-Buckets; ist der Circuit Breaker offen, wartet sie auf die Probe-Anfrage (eine
+    fehlgeschlagene Probe zählt als Versuch). Die Zelle fehlt erst, wenn alle Versuche aufgebraucht sind.
+
+    Args:
+        polygon (shapely.geometry.Polygon or shapely.geometry.MultiPolygon): Das Polygon für die Anfrage.
+        sr (int, optional): Raumbezugssystem (Spatial Reference). Standard: 4326 (WGS84).
+        return_geometry (bool, optional): Punktgeometrie der Gebäude mitliefern (im Raumbezugssystem sr).
+            Standard: False.
+
+    Returns:
+        dict: Das Antwort-JSON der API, oder None wenn die Zelle nicht abgefragt werden konnte.
+    """
+    # Handle both Polygon and MultiPolygon: ein Ring pro Teilfläche, nicht zu einem Ring verbunden
+    if isinstance(polygon, Polygon):
+        parts = [polygon]
+    elif isinstance(polygon, MultiPolygon):
+        parts = list(polygon.geoms)
+    else:
+        raise ValueError("Unsupported geometry type")
+
+    polygon_geometry = {
+        "rings": [[[x, y] for x, y in part.exterior.coords] for part in parts],
+        "spatialReference": {"wkid": sr}
+    }
+
+    cache = get_cache()
+    key = cache_key(polygon_geometry["rings"], LAYER, sr, return_geometry)
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    params = {
+        "geometryType": "esriGeometryPolygon",
+        "geometry": json.dumps(polygon_geometry),
+        "tolerance": 0,
+        "layers": LAYER,
+        "imageDisplay": "500,600,96",
+        "sr": sr,
+        "limit": 1000,
+        "returnGeometry": return_geometry
+    }
+
+    session = get_session()
+    for attempt in range(RETRIES + 1):
+        if not _breaker.wait():
+            # Probe-Anfrage während des Wartens fehlgeschlagen: zählt als Versuch
+            _count("rejected")
+            error = "Circuit Breaker offen"
+            continue
+
+        get_bucket().acquire()
+        _count("requests")
+        retry_after = None
+        try:
+            response = session.get(ENDPOINT, params=params, timeout=15)
+            if response.status_code == 200:
+                result = response.json()
+                _breaker.record(True)
+                if cache is not None:
+                    cache.put(key, result)
+                return result
+            error = f"HTTP {response.status_code}"
+            if response.status_code not in RETRY_STATUS:
+                # z.B. 400: die Anfrage selbst ist fehlerhaft, eine Wiederholung ändert nichts
+                _breaker.record(None)
+                _count("failed")
+                print(f"Failed to connect to api.geo.admin.ch: {error}")
+                return None
+            retry_after = _retry_after(response)
+            # Gedrosselt, aber erreichbar: kein Fehlschlag für den Circuit Breaker
+            throttled = response.status_code == 429
+            if throttled:
+                _count("throttled")
+                get_bucket().pause(retry_after if retry_after is not None else BACKOFF_BASE)
+        except requests.exceptions.RequestException as e:
+            error = str(e)
+            throttled = False
+
+        _breaker.record(None if throttled else False)
+        if attempt == RETRIES:
+            break
+        delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        _count("retries")
+        print(f"api.geo.admin.ch: {error}, Wiederholung {attempt + 1}/{RETRIES} in {delay:.1f} s")
+        time.sleep(delay)
+
+    _count("failed")
+    print(f"Failed to connect to api.geo.admin.ch: {error}")
+    return None
+
+
+def is_saturated(result, result_cap=RESULT_CAP):
+    """Prüft, ob eine Antwort das Trefferlimit der API erreicht und damit abgeschnitten sein kann.
+
+    Args:
+        result (dict): Das Antwort-JSON der API.
+        result_cap (int, optional): Trefferlimit pro Anfrage. Standard: RESULT_CAP.
+
+    Returns:
+        bool: True, wenn die Antwort result_cap oder mehr Treffer enthält.
+    """
+    return bool(result) and len(result.get('results', [])) >= result_cap
+
+
+def fetch_adaptive(cells, min_cell_area, sr=4326, result_cap=RESULT_CAP, max_workers=MAX_WORKERS, on_result=None, cell_bounds=None, on_cell=None, return_geometry=False, checkpoint=None):
+    """Fragt Zellen parallel ab und teilt gesättigte Zellen rekursiv in Quadranten (Quadtree).
+
+    Erreicht die Antwort einer Zelle das Trefferlimit, wird die Zelle in vier Quadranten geteilt und
+    diese werden neu abgefragt. Die Verfeinerung stoppt, sobald eine Zelle unter dem Limit bleibt oder
+    ihre Bounding Box nicht mehr grösser als min_cell_area ist. Nur die Antworten der Blattzellen werden
+    zurückgegeben, sortiert nach Zell-ID, damit das Zusammenführen deterministisch bleibt. Gesättigte
+    Zellen gehen so nicht verloren, sondern werden vollständig über ihre Teilzellen gezählt.
+
+    Args:
+        cells (list): Startzellen, z.B. aus split_polygon.
+        min_cell_area (float): Zellen, deren Bounding Box nicht grösser ist, werden nicht mehr geteilt.
+        sr (int, optional): Raumbezugssystem (Spatial Reference). Standard: 4326 (WGS84).
+        result_cap (int, optional): Trefferlimit pro Anfrage. Standard: RESULT_CAP.
+        max_workers (int, optional): Maximale Anzahl gleichzeitiger Anfragen. Standard: MAX_WORKERS.
+        on_result (callable, optional): Wird im aufrufenden Thread nach jeder eingetroffenen Antwort
+            (auch einer geteilten Zelle) mit (erledigt, total) aufgerufen. total wächst, wenn Zellen
+            geteilt werden.
+        cell_bounds (list, optional): Rechteck pro Startzelle, das beim Teilen in Quadranten zerlegt wird
+            (z.B. die unbeschnittenen Kacheln aus split_polygon_lv95). Standard: Bounding Box der Zelle.
+        on_cell (callable, optional): Wird im aufrufenden Thread für jede Blattzelle mit (Zelle, sr,
+            Antwort) aufgerufen, sobald ihre Antwort eintrifft, z.B. um Zwischenresultate anzuzeigen.
+            Die Reihenfolge entspricht der Ankunft, nicht der Zell-ID. Löst on_result oder on_cell eine
+            Ausnahme aus, werden die noch wartenden Anfragen abgebrochen und die Ausnahme weitergegeben.
+        return_geometry (bool, optional): Punktgeometrie der Gebäude mitliefern. Standard: False.
+        checkpoint (object, optional): Speicher für bereits abgefragte Zellen mit get(cell_id) und
+            put(cell_id, Antwort), z.B. checkpoint.Checkpoint. Zellen mit gespeicherter Antwort werden
+            nicht erneut abgefragt, jede neue Antwort wird sofort gespeichert. cell_id ist der Pfad
+            im Quadtree als Text, z.B. "3.0.2".
+
+    Returns:
+        tuple: Ein Tupel bestehend aus:
+            - results (list): Antwort-JSON (oder None bei Fehlern) pro Blattzelle.
+            - stats (dict): 'requests' (gesendete Anfragen), 'saturated_cells' (gesättigte und
+              deshalb geteilte Zellen), 'max_depth' (tiefste erreichte Teilungsstufe, 0 = Startzellen),
+              'truncated_cells' (Zellen, die auch in minimaler Grösse gesättigt blieben),
+              'reused_cells' (Antworten aus dem checkpoint) und 'failed_cells' (Zellen ohne Antwort,
+              auch nach allen Wiederholungen; die Summen sind dann unvollständig).
+    """
+    leaves = []
+    stats = {"requests": 0, "saturated_cells": 0, "max_depth": 0, "truncated_cells": 0, "reused_cells": 0, "failed_cells": 0}
+    if not cells:
+        return [], stats
+
+    with ThreadPoolExecutor(max_workers=max(max_workers, 1)) as executor:
+        pending = {}
+
+        def submit(cell_id, cell, bounds):
+            stats["max_depth"] = max(stats["max_depth"], len(cell_id) - 1)
+            saved = checkpoint.get(".".join(map(str, cell_id))) if checkpoint is not None else None
+            if saved is not None:
+                # Bereits abgefragt: als erledigte Anfrage einreihen, damit Teilung und Reihenfolge gleich bleiben
+                future = Future()
+                future.set_result(saved)
+                pending[future] = (cell_id, cell, bounds, True)
+                stats["reused_cells"] += 1
+                return
+            future = executor.submit(query_geoadmin_with_polygon, cell, sr, return_geometry)
+            pending[future] = (cell_id, cell, bounds, False)
+            stats["requests"] += 1
+
+        for i, cell in enumerate(cells):
+            submit((i,), cell, cell_bounds[i] if cell_bounds is not None else cell.bounds)
+
+        done_count = 0
+        try:
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    cell_id, cell, bounds, reused = pending.pop(future)
+                    result = future.result()
+                    done_count += 1
+                    # Fehlgeschlagene Zellen (None) werden nicht gespeichert, sondern beim nächsten Lauf erneut abgefragt
+                    if result is None:
+                        stats["failed_cells"] += 1
+                    elif checkpoint is not None and not reused:
+                        checkpoint.put(".".join(map(str, cell_id)), result)
+
+                    cell_area = (bounds[2] - bounds[0]) * (bounds[3] - bounds[1])
+                    split = False
+                    if is_saturated(result, result_cap):
+                        if cell_area > min_cell_area:
+                            stats["saturated_cells"] += 1
+                            for k, (child, child_bounds) in enumerate(split_cell(cell, bounds)):
+                                submit(cell_id + (k,), child, child_bounds)
+                            split = True
+                        else:
+                            stats["truncated_cells"] += 1
+                            print(f"Warnung: Zelle {cell_id} bleibt auch in minimaler Grösse beim Trefferlimit von {result_cap} Adressen.")
+
+                    if not split:
+                        leaves.append((cell_id, result))
+                        if on_cell is not None:
+                            on_cell(cell, sr, result)
+
+                    # Auch geteilte Zellen melden: erledigt und total wachsen gemeinsam um die Quadranten
+                    if on_result is not None:
+                        on_result(done_count, stats["requests"] + stats["reused_cells"])
+
+        except BaseException:
+            # z.B. Abbruch durch on_result/on_cell (Streamlit-Rerun): wartende Anfragen nicht mehr senden
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    if stats["reused_cells"]:
+        print(f"Checkpoint: {stats['reused_cells']} Zellen wiederverwendet, {stats['requests']} neu abgefragt")
+    if stats["failed_cells"]:
+        print(f"Warnung: {stats['failed_cells']} Zellen konnten nicht abgefragt werden, die Summen sind unvollständig.")
+    leaves.sort(key=lambda leaf: leaf[0])
+    return [result for _, result in leaves], stats
+
+
+def grid_cells(polygon, max_area, scale=1, tiling=TILING):
+    """Erzeugt die Startzellen für das gewählte Raster.
+
+    Args:
+        polygon (shapely.geometry.Polygon): Das gezeichnete Polygon in WGS84.
+        max_area (float): Zellfläche des Rasters an der Bounding Box (nur für tiling="bbox").
+        scale (float, optional): Flächenfaktor gegenüber der Standardzelle (z.B. COARSE_FACTOR). Standard: 1.
+        tiling (str, optional): "lv95" oder "bbox". Standard: TILING.
+
+    Returns:
+        tuple: Ein Tupel bestehend aus:
+            - cells (list): Die Zellen.
+            - cell_bounds (list): Das Rechteck pro Zelle, das beim Teilen zerlegt wird.
+            - sr (int): Raumbezugssystem der Zellen (2056 oder 4326).
+            - base_area (float): Fläche einer Standardzelle im Raumbezugssystem der Zellen.
+    """
+    if tiling == "lv95":
+        cells, cell_bounds = split_polygon_lv95(polygon, TILE_SIZE * math.sqrt(scale))
+        return cells, cell_bounds, 2056, TILE_SIZE ** 2
+
+    cells = split_polygon(polygon, max_area * scale)
+    return cells, [cell.bounds for cell in cells], 4326, max_area
+
+
+def fetch_polygon_adaptive(polygon, max_area, coarse_factor=COARSE_FACTOR, tiling=TILING, max_workers=MAX_WORKERS, on_result=None, on_cell=None, checkpoint=None):
+    """Fragt ein Polygon im adaptiven Modus ab und vergleicht mit dem festen Raster.
+
+    Gestartet wird mit Zellen der coarse_factor-fachen Standardfläche; gesättigte Zellen werden bis
+    zur Standardfläche / coarse_factor verfeinert. Im LV95-Raster sind auch die Startzellen und ihre
+    Quadranten an das schweizweite Kachelraster ausgerichtet.
+
+    Args:
+        polygon (shapely.geometry.Polygon): Das gezeichnete Polygon.
+        max_area (float): Zellfläche des festen Rasters (z.B. 0.000005 für ca. 130m x 130m), nur für tiling="bbox".
+        coarse_factor (int, optional): Faktor für grobe Start- und feinste Zellen. Standard: COARSE_FACTOR.
+        tiling (str, optional): "lv95" oder "bbox". Standard: TILING.
+        max_workers (int, optional): Maximale Anzahl gleichzeitiger Anfragen. Standard: MAX_WORKERS.
+        on_result (callable, optional): Fortschritts-Callback, siehe fetch_adaptive.
+        on_cell (callable, optional): Callback pro Blattzelle, siehe fetch_adaptive.
+        checkpoint (object, optional): Speicher für bereits abgefragte Zellen, siehe fetch_adaptive.
+
+    Returns:
+        tuple: Ein Tupel bestehend aus:
+            - results (list): Antwort-JSON pro Blattzelle.
+            - stats (dict): Wie bei fetch_adaptive, ergänzt um 'fixed_grid_requests' (Anzahl Anfragen
+              mit festem Raster) und 'saved_requests' (eingesparte Anfragen, negativ bei Mehraufwand).
+    """
+    cells, cell_bounds, sr, base_area = grid_cells(polygon, max_area, coarse_factor, tiling)
+    results, stats = fetch_adaptive(cells, base_area / coarse_factor, sr=sr, max_workers=max_workers,
+                                    on_result=on_result, cell_bounds=cell_bounds, on_cell=on_cell, checkpoint=checkpoint)
+
+    stats["fixed_grid_requests"] = len(grid_cells(polygon, max_area, 1, tiling)[0])
+    stats["saved_requests"] = stats["fixed_grid_requests"] - stats["requests"]
+    print(f"Anfragen: {stats['requests']} (festes Raster: {stats['fixed_grid_requests']}, eingespart: {stats['saved_requests']}, "
+          f"gesättigte Zellen: {stats['saturated_cells']}, Rekursionstiefe: {stats['max_depth']})")
+
+    return results, stats
+
+
+def fetch_polygon_fixed(polygon, max_area, coarse_factor=COARSE_FACTOR, tiling=TILING, max_workers=MAX_WORKERS, on_result=None, on_cell=None, checkpoint=None):
+    """Fragt ein Polygon mit festem Raster ab und fragt gesättigte Zellen in Teilzellen neu ab.
+
+    Args:
+        polygon (shapely.geometry.Polygon): Das gezeichnete Polygon.
+        max_area (float): Zellfläche des festen Rasters (z.B. 0.000005 für ca. 130m x 130m), nur für tiling="bbox".
+        coarse_factor (int, optional): Gesättigte Zellen werden bis zur Standardfläche / coarse_factor
+            verfeinert. Standard: COARSE_FACTOR.
+        tiling (str, optional): "lv95" oder "bbox". Standard: TILING.
+        max_workers (int, optional): Maximale Anzahl gleichzeitiger Anfragen. Standard: MAX_WORKERS.
+        on_result (callable, optional): Fortschritts-Callback, siehe fetch_adaptive.
+        on_cell (callable, optional): Callback pro Blattzelle, siehe fetch_adaptive.
+        checkpoint (object, optional): Speicher für bereits abgefragte Zellen, siehe fetch_adaptive.
+
+    Returns:
+        tuple: Ein Tupel bestehend aus:
+            - results (list): Antwort-JSON pro Blattzelle.
+            - stats (dict): Wie bei fetch_adaptive.
+    """
+    cells, cell_bounds, sr, base_area = grid_cells(polygon, max_area, 1, tiling)
+    results, stats = fetch_adaptive(cells, base_area / coarse_factor, sr=sr, max_workers=max_workers,
+                                    on_result=on_result, cell_bounds=cell_bounds, on_cell=on_cell, checkpoint=checkpoint)
+    print(f"Anfragen: {stats['requests']} (gesättigte Zellen: {stats['saturated_cells']}, Rekursionstiefe: {stats['max_depth']})")
+
+    return results, stats
+
+
+def fetch_polygon(polygon, max_area, on_result=None, on_cell=None, checkpoint=None):
+    """Fragt ein Polygon mit der konfigurierten Datenquelle und dem konfigurierten Modus ab.
+
+    Args:
+        polygon (shapely.geometry.Polygon): Das gezeichnete Polygon.
+        max_area (float): Zellfläche des festen Rasters (z.B. 0.000005 für ca. 130m x 130m).
+        on_result (callable, optional): Fortschritts-Callback, siehe fetch_adaptive.
+        on_cell (callable, optional): Callback pro Blattzelle, siehe fetch_adaptive.
+        checkpoint (object, optional): Speicher für bereits abgefragte Zellen, siehe fetch_adaptive.
+
+    Returns:
+        tuple: (results, stats) wie bei fetch_polygon_fixed.
+    """
+    if BACKEND == "snapshot":
+        return fetch_polygon_snapshot(polygon, on_result=on_result, on_cell=on_cell)
+    if ADAPTIVE:
+        return fetch_polygon_adaptive(polygon, max_area, on_result=on_result, on_cell=on_cell, checkpoint=checkpoint)
+    return fetch_polygon_fixed(polygon, max_area, on_result=on_result, on_cell=on_cell, checkpoint=checkpoint)
+
+
+def building_key(feature):
+    """Gibt einen kompakten Schlüssel für ein GWR-Feature der identify-Antwort zurück.
+
+    Die featureId des GWR-Layers hat die Form "EGID_EDID" (Gebäude und Eingang). Beide Teile werden
+    in eine einzige Ganzzahl gepackt, damit die Menge der bereits gezählten Gebäude auch bei
+    100'000+ Gebäuden klein bleibt (deutlich kleiner als eine Menge von Strings).
+
+    Args:
+        feature (dict): Ein Eintrag aus result['results'].
+
+    Returns:
+        int: Der Schlüssel, oder None, wenn das Feature keine verwertbare Kennung hat.
+    """
+    feature_id = feature.get('featureId', feature.get('id'))
+    try:
+        if feature_id is not None:
+            egid, _, edid = str(feature_id).partition('_')
+            return (int(egid) << 16) | int(edid or 0)
+        return int(feature.get('attributes', {})['egid']) << 16
+    except (KeyError, ValueError, TypeError):
+        return None
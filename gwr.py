@@ -0,0 +1,153 @@
+"""
+Auswertung der GWR-Antworten
+
+Sammelt die Wohnungszahlen und die Geschäfte aus dem GWR für genau eine Berechnung. Jede Berechnung
+erhält ein eigenes GwrResult, das durch die Verarbeitung gereicht wird; es gibt keinen modulweiten
+Zustand, den sich gleichzeitige Streamlit-Sitzungen teilen würden.
+
+Die Tabelle der Gebäudecodes wird beim Import einmalig in Mengen und Dicts pro Merkmal (GKAT, GKLAS)
+übersetzt, sodass die Einordnung eines Gebäudes unabhängig von der Grösse der Tabelle ist.
+"""
+
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+from geoadmin import building_key
+
+# Gebäudecodes des GWR: Gebäudekategorie (GKAT) und Gebäudeklasse (GKLAS) mit Beschreibung
+BUILDING_CODES = {
+    1010: {"CODE": 1010, "KAT": "GKAT", "BESCHREIBUNG": "Provisorische Unterkunft"},
+    1020: {"CODE": 1020, "KAT": "GKAT", "BESCHREIBUNG": "Gebäude mit ausschliesslicher Wohnnutzung"},
+    1030: {"CODE": 1030, "KAT": "GKAT", "BESCHREIBUNG": "Andere Wohngebäude (Wohngebäude mit Nebennutzung)"},
+    1040: {"CODE": 1040, "KAT": "GKAT", "BESCHREIBUNG": "Gebäude mit teilweiser Wohnnutzung"},
+    1060: {"CODE": 1060, "KAT": "GKAT", "BESCHREIBUNG": "Gebäude ohne Wohnnutzung"},
+    1110: {"CODE": 1110, "KAT": "GKLAS", "BESCHREIBUNG": "Gebäude mit einer Wohnung"},
+    1121: {"CODE": 1121, "KAT": "GKLAS", "BESCHREIBUNG": "Gebäude mit zwei Wohnungen"},
+    1122: {"CODE": 1122, "KAT": "GKLAS", "BESCHREIBUNG": "Gebäude mit drei oder mehr Wohnungen"},
+    1130: {"CODE": 1130, "KAT": "GKLAS", "BESCHREIBUNG": "Wohngebäude für Gemeinschaften"},
+    1211: {"CODE": 1211, "KAT": "GKLAS", "BESCHREIBUNG": "Hotelgebäude"},
+    1212: {"CODE": 1212, "KAT": "GKLAS", "BESCHREIBUNG": "Andere Gebäude für kurzfristige Beherbergung"},
+    1220: {"CODE": 1220, "KAT": "GKLAS", "BESCHREIBUNG": "Bürogebäude"},
+    1230: {"CODE": 1230, "KAT": "GKLAS", "BESCHREIBUNG": "Gross-und Einzelhandelsgebäude"},
+    1231: {"CODE": 1231, "KAT": "GKLAS", "BESCHREIBUNG": "Restaurants und Bars in Gebäuden ohne Wohnnutzung"},
+    1241: {"CODE": 1241, "KAT": "GKLAS", "BESCHREIBUNG": "Gebäude des Verkehrs- und Nachrichtenwesens ohne Garagen"},
+    1251: {"CODE": 1251, "KAT": "GKLAS", "BESCHREIBUNG": "Industriegebäude"},
+    1261: {"CODE": 1261, "KAT": "GKLAS", "BESCHREIBUNG": "Gebäude für Kultur- und Freizeitzwecke"},
+    1262: {"CODE": 1262, "KAT": "GKLAS", "BESCHREIBUNG": "Museen und Bibliotheken"},
+    1263: {"CODE": 1263, "KAT": "GKLAS", "BESCHREIBUNG": "Schul- und Hochschulgebäude"},
+    1264: {"CODE": 1264, "KAT": "GKLAS", "BESCHREIBUNG": "Krankenhäuser und Facheinrichtungen des Gesundheitswesens"},
+    1275: {"CODE": 1275, "KAT": "GKLAS", "BESCHREIBUNG": "Andere Gebäude für die kollektive Unterkunft"},
+}
+
+# Indizes pro Merkmal, einmalig beim Import erstellt
+GKAT_DESCRIPTIONS = {code: entry["BESCHREIBUNG"] for code, entry in BUILDING_CODES.items() if entry["KAT"] == "GKAT"}
+GKLAS_DESCRIPTIONS = {code: entry["BESCHREIBUNG"] for code, entry in BUILDING_CODES.items() if entry["KAT"] == "GKLAS"}
+GKLAS_CODES = frozenset(GKLAS_DESCRIPTIONS)
+
+
+@dataclass(slots=True, frozen=True)
+class GwrBusiness:
+    """Ein Gebäude ohne Wohnungen, das gemäss GKAT/GKLAS Geschäfte enthalten kann.
+
+    Attributes:
+        address (str): Adresse (Strasse und Hausnummer).
+        category (str): Beschreibung der Gebäudekategorie (GKAT).
+        category_alt (str): Beschreibung der Gebäudeklasse (GKLAS).
+    """
+
+    address: str
+    category: str
+    category_alt: str
+
+
+@dataclass(slots=True)
+class GwrResult:
+    """Laufende Summen einer Berechnung über alle Zellen.
+
+    Attributes:
+        total_wohnungen (int): Anzahl Wohnungen.
+        total_adressen (int): Anzahl gezählter Adressen (Gebäudeeingänge).
+        wohnungen_by_streetnr (defaultdict): Wohnungen pro Adresse.
+        wohnungen_by_street (defaultdict): Wohnungen pro Strasse.
+        businesses (list): Geschäfte aus dem GWR (GwrBusiness).
+        seen_buildings (set): Kompakte Schlüssel (EGID/EDID) bereits gezählter Gebäude.
+    """
+
+    total_wohnungen: int = 0
+    total_adressen: int = 0
+    wohnungen_by_streetnr: defaultdict = field(default_factory=lambda: defaultdict(int))
+    wohnungen_by_street: defaultdict = field(default_factory=lambda: defaultdict(int))
+    businesses: list = field(default_factory=list)
+    seen_buildings: set = field(default_factory=set)
+
+
+def classify_business(gkat, gklas):
+    """Ordnet ein Gebäude ohne Wohnungen anhand von GKAT und GKLAS ein.
+
+    Args:
+        gkat (int): Gebäudekategorie.
+        gklas (int): Gebäudeklasse.
+
+    Returns:
+        tuple: (Beschreibung GKAT, Beschreibung GKLAS), oder None wenn das Gebäude nicht als Geschäft
+        gezählt wird. Fehlt eine Beschreibung, steht dort "Code not found".
+    """
+    # Massgebend ist die Gebäudeklasse; die Kategorie wird nur als Beschreibung übernommen
+    if gklas not in GKLAS_CODES:
+        return None
+    return GKAT_DESCRIPTIONS.get(gkat, "Code not found"), GKLAS_DESCRIPTIONS[gklas]
+
+
+def extract_wohnungen_and_counts(result, gwr_result):
+    """Zählt die Wohnungen einer Antwort und sammelt Gebäude mit möglichen Geschäften.
+
+    Args:
+        result (dict): Antwort der identify-Schnittstelle für eine Zelle.
+        gwr_result (GwrResult): Resultat der laufenden Berechnung, wird ergänzt.
+
+    Returns:
+        int: Anzahl neu gezählter Adressen dieser Antwort.
+    """
+    total_features = 0
+    new_features = 0
+
+    if result and 'results' in result:
+        total_features = len(result['results'])
+
+        if total_features == 0:
+            print("Keine Adressen gefunden.")
+            return 0
+
+        for feature in result['results']:
+            # Gebäude an Zellgrenzen werden von mehreren Zellen geliefert: nur einmal zählen
+            key = building_key(feature)
+            if key is not None:
+                if key in gwr_result.seen_buildings:
+                    continue
+                gwr_result.seen_buildings.add(key)
+            new_features += 1
+
+            attributes = feature.get('attributes', {})
+            ganzwhg = attributes.get('ganzwhg', 0) or 0
+
+            # Gebäude ohne Wohnungen können Geschäfte enthalten: Einordnung über GKAT/GKLAS
+            if ganzwhg == 0:
+                categories = classify_business(attributes.get('gkat'), attributes.get('gklas'))
+                if categories is not None:
+                    gwr_result.businesses.append(
+                        GwrBusiness(attributes.get('strname_deinr', "Unbekannt"), *categories)
+                    )
+
+            strnamenr = attributes.get('strname_deinr', "Unbekannt")
+            strname = ", ".join(attributes.get('strname', "Unbekannt"))
+            gwr_result.total_wohnungen += ganzwhg
+            gwr_result.wohnungen_by_streetnr[strnamenr] += ganzwhg
+            gwr_result.wohnungen_by_street[strname] += ganzwhg
+
+        print(f"Anzahl der gefundenen Adressen: {total_features} (davon neu: {new_features})")
+        gwr_result.total_adressen += new_features
+
+    else:
+        print("Keine Ergebnisse gefunden.")
+
+    return new_features
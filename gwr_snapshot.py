@@ -0,0 +1,180 @@
+"""
+Offline-Backend für das Gebäude- und Wohnungsregister (GWR)
+
+Statt tausender identify-Anfragen an api3.geo.admin.ch wird ein Perimeter mit einer einzigen
+Punkt-in-Polygon-Abfrage gegen einen lokalen GWR-Bestand beantwortet. Der Bestand wird einmalig aus
+dem öffentlichen GWR-Export (https://www.housing-stat.ch/de/data/supply/public.html, Dateien
+gebaeude_batiment_edificio.csv und eingang_entree_entrata.csv) in eine DuckDB-Datei geladen.
+
+Die Zeilen werden nach einem 1-km-Kachelschlüssel in LV95 sortiert gespeichert. Die Min/Max-Statistik
+pro Row Group wirkt dadurch als Raster-Index: eine Bounding-Box-Abfrage liest nur die Row Groups der
+betroffenen Kacheln.
+
+Die Antwort hat dieselbe Form wie die identify-Antwort der GeoAdmin API, damit
+extract_wohnungen_and_counts und die Anzeige unverändert bleiben.
+
+Aufruf zum Einlesen:
+    python gwr_snapshot.py gebaeude_batiment_edificio.csv eingang_entree_entrata.csv
+"""
+
+import argparse
+import os
+from datetime import datetime, timezone
+
+import duckdb as db
+import shapely
+
+from tiling import to_lv95
+
+SNAPSHOT_PATH = os.environ.get("GWR_SNAPSHOT_PATH", "gwr_snapshot.duckdb")
+
+# Kantenlänge der Sortier-Kacheln in Metern
+INDEX_TILE_SIZE = 1000
+
+
+def ingest(buildings_path, entrances_path, db_path=SNAPSHOT_PATH):
+    """Lädt einen GWR-Export in eine lokale DuckDB-Datei.
+
+    Jede Zeile entspricht einem Gebäudeeingang (EGID, EDID), wie die Features der identify-Schnittstelle.
+    Als Koordinate wird die Eingangskoordinate verwendet, falls vorhanden, sonst die Gebäudekoordinate.
+
+    Args:
+        buildings_path (str): Gebäudedatei (CSV/TSV oder Parquet) mit EGID, GKODE, GKODN, GKAT, GKLAS, GANZWHG.
+        entrances_path (str): Eingangsdatei (CSV/TSV oder Parquet) mit EGID, EDID, STRNAME, DEINR, DKODE, DKODN.
+        db_path (str, optional): Ziel-Datei. Standard: SNAPSHOT_PATH.
+
+    Returns:
+        int: Anzahl eingelesener Eingänge.
+    """
+    def source(path):
+        if path.endswith(".parquet"):
+            return f"read_parquet('{path}')"
+        return f"read_csv_auto('{path}', header=true, all_varchar=true)"
+
+    con = db.connect(db_path)
+    try:
+        con.execute(f"""
+            CREATE OR REPLACE TABLE gwr AS
+            WITH entrances AS (
+                SELECT
+                    CAST(e.EGID AS BIGINT) AS egid,
+                    CAST(e.EDID AS INTEGER) AS edid,
+                    e.STRNAME AS strname,
+                    e.DEINR AS deinr,
+                    CAST(b.GKAT AS INTEGER) AS gkat,
+                    CAST(b.GKLAS AS INTEGER) AS gklas,
+                    COALESCE(TRY_CAST(b.GANZWHG AS INTEGER), 0) AS ganzwhg,
+                    COALESCE(TRY_CAST(e.DKODE AS DOUBLE), TRY_CAST(b.GKODE AS DOUBLE)) AS x,
+                    COALESCE(TRY_CAST(e.DKODN AS DOUBLE), TRY_CAST(b.GKODN AS DOUBLE)) AS y
+                FROM {source(entrances_path)} e
+                JOIN {source(buildings_path)} b ON CAST(e.EGID AS BIGINT) = CAST(b.EGID AS BIGINT)
+            )
+            SELECT *
+            FROM entrances
+            WHERE x IS NOT NULL AND y IS NOT NULL
+            ORDER BY CAST(floor(y / {INDEX_TILE_SIZE}) AS INTEGER), CAST(floor(x / {INDEX_TILE_SIZE}) AS INTEGER), x, y
+        """)
+        count = con.execute("SELECT COUNT(*) FROM gwr").fetchone()[0]
+        con.execute("CREATE OR REPLACE TABLE meta AS SELECT ? AS ingested, ? AS buildings, ? AS entrances",
+                    [datetime.now(timezone.utc).isoformat(), buildings_path, entrances_path])
+    finally:
+        con.close()
+
+    print(f"GWR-Bestand mit {count} Eingängen nach {db_path} geschrieben.")
+    return count
+
+
+def query_snapshot_with_polygon(polygon, db_path=SNAPSHOT_PATH):
+    """Beantwortet einen ganzen Perimeter aus dem lokalen GWR-Bestand.
+
+    Args:
+        polygon (shapely.geometry.Polygon): Das gezeichnete Polygon in WGS84.
+        db_path (str, optional): Pfad der DuckDB-Datei. Standard: SNAPSHOT_PATH.
+
+    Returns:
+        dict: Antwort in der Form der identify-Schnittstelle ({'results': [{'featureId', 'attributes'}, ...]}).
+    """
+    if not os.path.exists(db_path):
+        raise FileNotFoundError(f"GWR-Bestand nicht gefunden: {db_path}. Bitte zuerst mit gwr_snapshot.py einlesen.")
+
+    polygon_lv95 = to_lv95(polygon)
+    minx, miny, maxx, maxy = polygon_lv95.bounds
+
+    con = db.connect(db_path, read_only=True)
+    try:
+        # Bounding-Box-Vorfilter in DuckDB, exakter Punkt-in-Polygon-Test anschliessend vektorisiert in shapely
+        rows = con.execute(
+            "SELECT egid, edid, strname, deinr, COALESCE(gkat, 0) AS gkat, COALESCE(gklas, 0) AS gklas, ganzwhg, x, y FROM gwr "
+            "WHERE x BETWEEN ? AND ? AND y BETWEEN ? AND ?",
+            [minx, maxx, miny, maxy],
+        ).fetchnumpy()
+    finally:
+        con.close()
+
+    inside = shapely.contains_xy(polygon_lv95, rows["x"], rows["y"])
+
+    # fetchnumpy liefert Spalten mit NULL als maskierte Arrays; tolist() gibt fehlende Werte als None zurück
+    strnames = rows["strname"].tolist()
+    deinrs = rows["deinr"].tolist()
+
+    results = []
+    for k in inside.nonzero()[0]:
+        strname = strnames[k] or "Unbekannt"
+        deinr = deinrs[k]
+        results.append({
+            "featureId": f"{rows['egid'][k]}_{rows['edid'][k]}",
+            "attributes": {
+                "egid": str(rows["egid"][k]),
+                "strname": [strname],
+                "deinr": deinr,
+                "strname_deinr": f"{strname} {deinr}" if deinr else strname,
+                "gkat": int(rows["gkat"][k]),
+                "gklas": int(rows["gklas"][k]),
+                "ganzwhg": int(rows["ganzwhg"][k]),
+            },
+        })
+
+    return {"results": results}
+
+
+def fetch_polygon_snapshot(polygon, db_path=SNAPSHOT_PATH, on_result=None, on_cell=None):
+    """Fragt ein Polygon aus dem lokalen GWR-Bestand ab, mit derselben Rückgabe wie geoadmin.fetch_polygon_fixed.
+
+    Args:
+        polygon (shapely.geometry.Polygon): Das gezeichnete Polygon in WGS84.
+        db_path (str, optional): Pfad der DuckDB-Datei. Standard: SNAPSHOT_PATH.
+        on_result (callable, optional): Fortschritts-Callback, wird einmal mit (1, 1) aufgerufen.
+        on_cell (callable, optional): Wird einmal mit (polygon, 4326, Antwort) aufgerufen, der ganze
+            Perimeter gilt als eine Zelle.
+
+    Returns:
+        tuple: Ein Tupel bestehend aus:
+            - results (list): Eine einzige Antwort für den ganzen Perimeter.
+            - stats (dict): Wie bei geoadmin.fetch_adaptive (keine HTTP-Anfragen).
+    """
+    result = query_snapshot_with_polygon(polygon, db_path)
+    if on_cell is not None:
+        on_cell(polygon, 4326, result)
+    if on_result is not None:
+        on_result(1, 1)
+    print(f"GWR-Bestand: {len(result['results'])} Eingänge im Polygon")
+    stats = {
+        "requests": 0,
+        "saturated_cells": 0,
+        "max_depth": 0,
+        "truncated_cells": 0,
+        "reused_cells": 0,
+        "failed_cells": 0,
+    }
+    return [result], stats
+
+
+# Hauptprogramm
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="GWR-Export in einen lokalen DuckDB-Bestand einlesen.")
+    parser.add_argument("buildings", help="gebaeude_batiment_edificio.csv (oder Parquet)")
+    parser.add_argument("entrances", help="eingang_entree_entrata.csv (oder Parquet)")
+    parser.add_argument("--db", default=SNAPSHOT_PATH, help=f"Ziel-Datei (Standard: {SNAPSHOT_PATH})")
+    args = parser.parse_args()
+
+    ingest(args.buildings, args.entrances, args.db)
@@ -0,0 +1,372 @@
+"""
+Job-Warteschlange für grosse Perimeter
+
+Grosse Perimeter (ca. 10 bis 150 km²) brauchen mehrere Minuten und würden das Streamlit-Skript
+so lange blockieren. Sie laufen deshalb als Job in einem eigenen Worker-Prozess; der Streamlit-Server
+bleibt für alle anderen Sitzungen reaktionsfähig.
+
+Status, Fortschritt und Resultat der Jobs liegen in einer SQLite-Datei (JOBS_PATH), die alle Prozesse
+teilen. Jede Sitzung kann einen Job über seine Kennung abfragen oder sich nach einem Neuladen der Seite
+wieder mit ihm verbinden. Bricht ein Worker ab (Absturz, Neustart des Servers), wird der Job erneut
+eingereiht und fragt dank der Checkpoints (checkpoint.py) nur die noch fehlenden Zellen ab. Für denselben
+Perimeter (gleicher Schlüssel wie im Resultat-Cache) läuft höchstens ein Job.
+"""
+
+import multiprocessing
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+
+from shapely import wkt
+
+from checkpoint import open_checkpoint
+from pipeline import calculate
+
+JOBS_PATH = os.environ.get("JOBS_PATH", "jobs.sqlite")
+
+# Höchstens so viele Worker-Prozesse gleichzeitig
+JOBS_PROCESSES = int(os.environ.get("JOBS_PROCESSES", "2"))
+
+# Ein Job wird nach so vielen abgebrochenen Versuchen als fehlgeschlagen markiert
+JOBS_MAX_ATTEMPTS = int(os.environ.get("JOBS_MAX_ATTEMPTS", "3"))
+
+# Fertige Jobs werden so lange (Sekunden) zum Abfragen behalten
+JOBS_TTL = int(os.environ.get("JOBS_TTL", str(24 * 60 * 60)))
+
+# Abstand (Sekunden) zwischen zwei Runden des Dispatchers bzw. zwei Fortschrittsmeldungen eines Workers
+POLL_INTERVAL = 1.0
+
+# Ein laufender Job ohne Worker-Prozess gilt erst als verwaist, wenn sein Dispatcher so lange (Sekunden)
+# kein Lebenszeichen gegeben hat
+JOBS_STALE_AFTER = int(os.environ.get("JOBS_STALE_AFTER", "30"))
+
+# Zellfläche des festen Rasters, wie in app.py
+MAX_AREA = 0.000005
+
+
+class JobStore:
+    """Zugriff auf die gemeinsame SQLite-Datei der Jobs.
+
+    Jeder Prozess öffnet eine eigene Verbindung; innerhalb eines Prozesses ist der Zugriff über einen
+    Lock thread-sicher.
+
+    Args:
+        path (str, optional): Pfad der SQLite-Datei. Standard: JOBS_PATH.
+    """
+
+    def __init__(self, path=JOBS_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._con = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._con.execute("PRAGMA journal_mode=WAL")
+        self._con.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, key TEXT NOT NULL, polygon TEXT NOT NULL, status TEXT NOT NULL, "
+            "done INTEGER NOT NULL DEFAULT 0, total INTEGER NOT NULL DEFAULT 0, reused INTEGER NOT NULL DEFAULT 0, "
+            "attempts INTEGER NOT NULL DEFAULT 0, pid INTEGER, owner INTEGER, heartbeat REAL, error TEXT, "
+            "result BLOB, created REAL NOT NULL, updated REAL NOT NULL)"
+        )
+        # Dateien älterer Versionen ohne Besitzer und Lebenszeichen
+        columns = {row[1] for row in self._con.execute("PRAGMA table_info(jobs)")}
+        for column, kind in (("owner", "INTEGER"), ("heartbeat", "REAL")):
+            if column not in columns:
+                self._con.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+        self._con.execute("CREATE INDEX IF NOT EXISTS jobs_key ON jobs (key)")
+        self._con.commit()
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            rows = self._con.execute(sql, params).fetchall()
+            self._con.commit()
+        return rows
+
+    def _update(self, sql, params=()):
+        """Führt ein UPDATE aus und gibt die Anzahl geänderter Zeilen zurück."""
+        with self._lock:
+            count = self._con.execute(sql, params).rowcount
+            self._con.commit()
+        return count
+
+    def create(self, key, polygon):
+        """Reiht einen Job ein, ausser für denselben Schlüssel ist bereits einer unterwegs.
+
+        Args:
+            key (str): Schlüssel im Resultat-Cache (siehe result_cache.result_key).
+            polygon (shapely.geometry.Polygon): Der Perimeter in WGS84.
+
+        Returns:
+            str: Kennung des neuen oder des bereits eingereihten bzw. laufenden Jobs.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._con.execute(
+                "SELECT id FROM jobs WHERE key = ? AND status IN ('queued', 'running')", (key,)
+            ).fetchone()
+            if row is not None:
+                return row[0]
+            job_id = uuid.uuid4().hex
+            self._con.execute(
+                "INSERT INTO jobs (id, key, polygon, status, created, updated) VALUES (?, ?, ?, 'queued', ?, ?)",
+                (job_id, key, polygon.wkt, now, now),
+            )
+            self._con.commit()
+        return job_id
+
+    def get(self, job_id):
+        """Gibt Status und Fortschritt eines Jobs zurück (ohne Resultat), oder None."""
+        rows = self._execute(
+            "SELECT id, key, polygon, status, done, total, reused, attempts, pid, owner, heartbeat, error, created, updated "
+            "FROM jobs WHERE id = ?", (job_id,)
+        )
+        if not rows:
+            return None
+        columns = (
+            "id", "key", "polygon", "status", "done", "total", "reused", "attempts", "pid", "owner", "heartbeat",
+            "error", "created", "updated",
+        )
+        return dict(zip(columns, rows[0]))
+
+    def result(self, job_id):
+        """Gibt das Resultat eines fertigen Jobs zurück (dict wie pipeline.calculate), oder None."""
+        rows = self._execute("SELECT result FROM jobs WHERE id = ? AND status = 'done'", (job_id,))
+        return pickle.loads(rows[0][0]) if rows and rows[0][0] is not None else None
+
+    def ids(self, status):
+        """Gibt die Kennungen aller Jobs mit diesem Status zurück, die ältesten zuerst."""
+        return [row[0] for row in self._execute("SELECT id FROM jobs WHERE status = ? ORDER BY created", (status,))]
+
+    def claim(self, job_id, owner):
+        """Übernimmt einen eingereihten Job für einen Dispatcher (vor dem Start des Workers).
+
+        Status, Besitzer und Lebenszeichen werden in einer einzigen Anweisung gesetzt: bis der Worker
+        seine PID einträgt, erkennen die Dispatcher anderer Prozesse den Job am frischen Lebenszeichen
+        als übernommen und reihen ihn nicht erneut ein.
+
+        Args:
+            job_id (str): Kennung des Jobs.
+            owner (int): PID des Dispatcher-Prozesses.
+
+        Returns:
+            bool: True, wenn der Job übernommen wurde; False, wenn ihn ein anderer Dispatcher schon hat.
+        """
+        now = time.time()
+        return self._update(
+            "UPDATE jobs SET status = 'running', pid = NULL, owner = ?, heartbeat = ?, attempts = attempts + 1, "
+            "updated = ? WHERE id = ? AND status = 'queued'",
+            (owner, now, now, job_id),
+        ) == 1
+
+    def set_pid(self, job_id, pid):
+        """Speichert den Worker-Prozess eines laufenden Jobs."""
+        self._execute(
+            "UPDATE jobs SET pid = ?, heartbeat = ? WHERE id = ? AND status = 'running'", (pid, time.time(), job_id)
+        )
+
+    def heartbeat(self, owner):
+        """Erneuert das Lebenszeichen aller laufenden Jobs eines Dispatchers."""
+        self._execute("UPDATE jobs SET heartbeat = ? WHERE owner = ? AND status = 'running'", (time.time(), owner))
+
+    def requeue(self, job):
+        """Reiht einen abgebrochenen Job erneut ein, oder markiert ihn nach JOBS_MAX_ATTEMPTS als fehlgeschlagen.
+
+        Args:
+            job (dict): Der Job, wie ihn JobStore.get beim Feststellen des Abbruchs zurückgegeben hat. Hat ihn
+                seither ein Dispatcher erneut übernommen (anderer Versuch), bleibt er unverändert.
+        """
+        now = time.time()
+        if job["attempts"] >= JOBS_MAX_ATTEMPTS:
+            changed = self._update(
+                "UPDATE jobs SET status = 'failed', error = ?, pid = NULL, updated = ? "
+                "WHERE id = ? AND status = 'running' AND attempts = ?",
+                (f"Abgebrochen nach {job['attempts']} Versuchen", now, job["id"], job["attempts"]),
+            )
+        else:
+            changed = self._update(
+                "UPDATE jobs SET status = 'queued', pid = NULL, owner = NULL, updated = ? "
+                "WHERE id = ? AND status = 'running' AND attempts = ?",
+                (now, job["id"], job["attempts"]),
+            )
+            if changed:
+                print(f"Job {job['id']}: Worker abgebrochen, wird erneut eingereiht")
+
+    def progress(self, job_id, done, total, reused):
+        """Speichert den Fortschritt eines laufenden Jobs."""
+        now = time.time()
+        self._execute(
+            "UPDATE jobs SET done = ?, total = ?, reused = ?, heartbeat = ?, updated = ? WHERE id = ?",
+            (done, total, reused, now, now, job_id),
+        )
+
+    def finish(self, job_id, calculation):
+        """Speichert das Resultat eines Jobs."""
+        self._execute(
+            "UPDATE jobs SET status = 'done', result = ?, pid = NULL, updated = ? WHERE id = ?",
+            (pickle.dumps(calculation), time.time(), job_id),
+        )
+
+    def fail(self, job_id, error):
+        """Markiert einen Job als fehlgeschlagen; ein neuer Job für denselben Perimeter setzt bei den Checkpoints fort."""
+        self._execute(
+            "UPDATE jobs SET status = 'failed', error = ?, pid = NULL, updated = ? WHERE id = ?",
+            (error, time.time(), job_id),
+        )
+
+    def purge(self, ttl=JOBS_TTL):
+        """Löscht fertige und fehlgeschlagene Jobs, die älter als ttl Sekunden sind."""
+        self._execute("DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated < ?", (time.time() - ttl,))
+
+
+def run_job(job_id, path=JOBS_PATH):
+    """Führt einen Job aus (Einstiegspunkt des Worker-Prozesses).
+
+    Args:
+        job_id (str): Kennung des Jobs.
+        path (str, optional): Pfad der Job-Datei. Standard: JOBS_PATH.
+    """
+    store = JobStore(path)
+    job = store.get(job_id)
+    polygon = wkt.loads(job["polygon"])
+    checkpoint = open_checkpoint(polygon, MAX_AREA)
+    saved_cells = checkpoint.count() if checkpoint is not None else 0
+    progress = {"done": 0, "total": 0, "written": 0.0}
+
+    # Fortschritt höchstens alle POLL_INTERVAL Sekunden schreiben
+    def on_result(done, total):
+        progress["done"], progress["total"] = done, total
+        if time.monotonic() - progress["written"] >= POLL_INTERVAL:
+            store.progress(job_id, done, total, saved_cells)
+            progress["written"] = time.monotonic()
+
+    try:
+        calculation = calculate(polygon, MAX_AREA, on_result=on_result)
+        reused = calculation["fetch_stats"].get("reused_cells", 0)
+        store.progress(job_id, progress["done"], progress["total"], reused)
+        store.finish(job_id, calculation)
+        print(f"Job {job_id}: fertig, {reused} Zellen aus dem Checkpoint")
+    except Exception as e:
+        print(f"Job {job_id} fehlgeschlagen: {e}")
+        store.fail(job_id, str(e))
+
+
+def _alive(pid):
+    """Prüft, ob ein Prozess mit dieser PID noch läuft."""
+    try:
+        os.kill(pid, 0)
+    except OSError:
+        return False
+    return True
+
+
+class JobQueue:
+    """Reiht Jobs ein und startet sie in Worker-Prozessen (höchstens processes gleichzeitig).
+
+    Ein Dispatcher-Thread startet eingereihte Jobs, sobald ein Worker frei ist, und reiht Jobs erneut
+    ein, deren Worker abgebrochen ist (auch solche eines früheren Server-Prozesses).
+
+    Args:
+        path (str, optional): Pfad der Job-Datei. Standard: JOBS_PATH.
+        processes (int, optional): Maximale Anzahl Worker-Prozesse. Standard: JOBS_PROCESSES.
+    """
+
+    def __init__(self, path=JOBS_PATH, processes=JOBS_PROCESSES):
+        self.path = path
+        self.processes = max(processes, 1)
+        self.store = JobStore(path)
+        # "spawn" statt "fork": der Server-Prozess hat bereits Threads (Streamlit, Thread-Pools)
+        self._context = multiprocessing.get_context("spawn")
+        self._workers = {}
+        self._lock = threading.Lock()
+        self.store.purge()
+        threading.Thread(target=self._dispatch_forever, daemon=True, name="job-dispatcher").start()
+
+    def submit(self, polygon, key):
+        """Reiht einen Perimeter ein und gibt die Kennung des Jobs zurück.
+
+        Args:
+            polygon (shapely.geometry.Polygon): Der Perimeter in WGS84.
+            key (str): Schlüssel im Resultat-Cache; läuft für ihn bereits ein Job, wird dessen Kennung
+                zurückgegeben.
+
+        Returns:
+            str: Kennung des Jobs.
+        """
+        job_id = self.store.create(key, polygon)
+        self._dispatch()
+        return job_id
+
+    def get(self, job_id):
+        """Gibt Status und Fortschritt eines Jobs zurück, oder None (siehe JobStore.get)."""
+        return self.store.get(job_id)
+
+    def result(self, job_id):
+        """Gibt das Resultat eines fertigen Jobs zurück, oder None."""
+        return self.store.result(job_id)
+
+    def _dispatch(self):
+        """Räumt beendete Worker auf, reiht abgebrochene Jobs erneut ein und startet eingereihte Jobs."""
+        with self._lock:
+            for job_id, process in list(self._workers.items()):
+                if process.is_alive():
+                    continue
+                process.join()
+                del self._workers[job_id]
+                job = self.store.get(job_id)
+                if job is not None and job["status"] == "running":
+                    self.store.requeue(job)
+
+            owner = os.getpid()
+            self.store.heartbeat(owner)
+
+            # Jobs, deren Worker nicht mehr existiert (z.B. nach einem Neustart des Servers). Ein Job ohne
+            # PID ist gerade von einem Dispatcher übernommen worden; er gilt erst als verwaist, wenn es der
+            # eigene ist oder das Lebenszeichen seines Dispatchers ausbleibt.
+            stale = time.time() - JOBS_STALE_AFTER
+            for job_id in self.store.ids("running"):
+                job = self.store.get(job_id)
+                if job is None or job_id in self._workers:
+                    continue
+                if job["pid"] is not None:
+                    orphaned = not _alive(job["pid"])
+                else:
+                    orphaned = job["owner"] == owner or (job["heartbeat"] or 0) < stale
+                if orphaned:
+                    self.store.requeue(job)
+
+            for job_id in self.store.ids("queued"):
+                if len(self._workers) >= self.processes:
+                    break
+                if not self.store.claim(job_id, owner):
+                    continue
+                process = self._context.Process(target=run_job, args=(job_id, self.path), daemon=True, name=f"job-{job_id[:8]}")
+                process.start()
+                self._workers[job_id] = process
+                self.store.set_pid(job_id, process.pid)
+                print(f"Job {job_id}: gestartet in Prozess {process.pid}")
+
+    def _dispatch_forever(self):
+        while True:
+            try:
+                self._dispatch()
+            except sqlite3.Error as e:
+                print(f"Job-Dispatcher: {e}")
+            time.sleep(POLL_INTERVAL)
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    """Gibt die prozessweite Job-Warteschlange zurück (beim ersten Aufruf wird der Dispatcher gestartet).
+
+    Returns:
+        JobQueue: Die gemeinsam genutzte Warteschlange.
+    """
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue()
+    return _queue
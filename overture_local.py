@@ -0,0 +1,140 @@
+"""
+Lokaler Overture-Auszug für die Schweiz
+
+Statt bei jeder Berechnung das ganze places-Theme auf S3 zu lesen (rund eine Minute), wird pro
+Overture-Release einmalig ein Auszug mit allen Orten innerhalb der Schweizer Bounding Box als lokale
+Parquet-Datei geschrieben. Die Zeilen sind entlang einer Hilbert-Kurve sortiert und in kleine Row
+Groups aufgeteilt; zusammen mit den bbox-Spalten von Overture kann DuckDB dadurch die meisten Row
+Groups anhand ihrer Min/Max-Statistik überspringen.
+
+Neben der Parquet-Datei liegt eine JSON-Datei mit der Release-Version, damit veraltete Auszüge
+erkannt werden.
+
+Aufruf zum Erstellen (ohne Angabe das neueste Release):
+    python overture_local.py [2026-01-21.0]
+"""
+
+import argparse
+import json
+import os
+from datetime import datetime, timezone
+
+from overture_query import bbox_filter, cursor
+
+LOCAL_PATH = os.environ.get("OVERTURE_LOCAL_PATH", "overture_places_ch.parquet")
+
+# Bounding Box der Schweiz in WGS84 (minx, miny, maxx, maxy), grosszügig gerundet
+CH_BBOX = (5.9, 45.8, 10.5, 47.9)
+
+# Kleine Row Groups, damit die bbox-Statistik räumlich eng begrenzt ist
+ROW_GROUP_SIZE = 10000
+
+
+def s3_path(release):
+    """Gibt den S3-Pfad des places-Themes eines Overture-Releases zurück."""
+    return f"s3://overturemaps-us-west-2/release/{release}/theme=places/type=*/*"
+
+
+def release_path(path=LOCAL_PATH):
+    """Gibt den Pfad der JSON-Datei mit den Angaben zum Auszug zurück."""
+    return os.path.splitext(path)[0] + ".json"
+
+
+def read_release(path=LOCAL_PATH):
+    """Liest die Release-Version eines lokalen Auszugs.
+
+    Args:
+        path (str, optional): Pfad der Parquet-Datei. Standard: LOCAL_PATH.
+
+    Returns:
+        str: Die Release-Version, oder None wenn kein (vollständiger) Auszug vorhanden ist.
+    """
+    if not os.path.exists(path) or not os.path.exists(release_path(path)):
+        return None
+    try:
+        with open(release_path(path), encoding="utf-8") as f:
+            return json.load(f).get("release")
+    except (OSError, ValueError) as e:
+        print(f"Angaben zum Overture-Auszug nicht lesbar: {e}")
+        return None
+
+
+def places_source(release, path=LOCAL_PATH):
+    """Wählt die Quelle für die Abfrage der Overture-Orte.
+
+    Der lokale Auszug wird verwendet, wenn er zum gewünschten Release passt. Fehlt er oder ist er
+    veraltet, wird direkt auf S3 gelesen.
+
+    Args:
+        release (str): Gewünschte Release-Version, z.B. "2026-01-21.0".
+        path (str, optional): Pfad des lokalen Auszugs. Standard: LOCAL_PATH.
+
+    Returns:
+        str: Pfad für read_parquet (lokale Datei oder S3-Muster).
+    """
+    local_release = read_release(path)
+    if local_release == release:
+        print(f"Overture: lokaler Auszug {path} ({release})")
+        return path
+    if local_release is not None:
+        print(f"Overture: lokaler Auszug {path} ist veraltet ({local_release}, aktuell {release}), lese von S3")
+    return s3_path(release)
+
+
+def ingest(release, path=LOCAL_PATH, bbox=CH_BBOX):
+    """Schreibt den Schweizer Auszug eines Overture-Releases als lokale Parquet-Datei.
+
+    Args:
+        release (str): Release-Version, z.B. "2026-01-21.0".
+        path (str, optional): Ziel-Datei. Standard: LOCAL_PATH.
+        bbox (tuple, optional): Auszugsgebiet (minx, miny, maxx, maxy) in WGS84. Standard: CH_BBOX.
+
+    Returns:
+        int: Anzahl geschriebener Orte.
+    """
+    minx, miny, maxx, maxy = bbox
+
+    con = cursor()
+    try:
+        # Zuerst in eine temporäre Datei schreiben, damit ein abgebrochener Lauf keinen halben Auszug hinterlässt
+        tmp_path = path + ".tmp"
+        con.execute(f"""
+            COPY (
+                SELECT id, names, categories, addresses, bbox, geometry
+                FROM read_parquet('{s3_path(release)}', hive_partitioning=1)
+                WHERE {bbox_filter(bbox)}
+                ORDER BY ST_Hilbert(geometry, ST_Extent(ST_MakeEnvelope({minx}, {miny}, {maxx}, {maxy})))
+            ) TO '{tmp_path}' (FORMAT PARQUET, COMPRESSION ZSTD, ROW_GROUP_SIZE {ROW_GROUP_SIZE})
+        """)
+        count = con.execute(f"SELECT COUNT(*) FROM read_parquet('{tmp_path}')").fetchone()[0]
+    finally:
+        con.close()
+
+    os.replace(tmp_path, path)
+    with open(release_path(path), "w", encoding="utf-8") as f:
+        json.dump({
+            "release": release,
+            "created": datetime.now(timezone.utc).isoformat(),
+            "bbox": list(bbox),
+            "rows": count,
+        }, f, indent=2)
+
+    print(f"Overture-Auszug {release} mit {count} Orten nach {path} geschrieben.")
+    return count
+
+
+# Hauptprogramm
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Schweizer Auszug der Overture-Orte lokal speichern.")
+    parser.add_argument("release", nargs="?", help="Overture-Release, z.B. 2026-01-21.0 (Standard: das neueste)")
+    parser.add_argument("--path", default=LOCAL_PATH, help=f"Ziel-Datei (Standard: {LOCAL_PATH})")
+    args = parser.parse_args()
+
+    release = args.release
+    if release is None:
+        from overture_release import resolve_latest
+        release = resolve_latest()
+        if release is None:
+            raise SystemExit("Neuestes Overture-Release nicht ermittelbar, bitte angeben.")
+
+    ingest(release, args.path)
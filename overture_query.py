@@ -0,0 +1,289 @@
+"""
+Abfrage der Overture-Orte mit DuckDB
+
+Baut die Abfrage für pipeline.query_overture. Vor dem exakten
+ST_Intersects-Test wird auf die bbox-Spalten von Overture gefiltert. Dieser Filter wird bis in den
+Parquet-Reader durchgereicht, sodass Row Groups, deren Min/Max-Statistik nicht mit dem Polygon
+überlappt, gar nicht erst gelesen (bzw. von S3 geladen) werden.
+
+scan_stats zeigt anhand der Parquet-Metadaten, wie viele Row Groups und Bytes dadurch gelesen werden.
+
+Alle Abfragen laufen über eine prozessweite DuckDB-Verbindung, in der die Erweiterungen spatial und
+httpfs nur einmal geladen werden. Jede Abfrage erhält einen eigenen Cursor; die Cursor teilen sich die
+Datenbankinstanz und damit den Cache für Parquet-Metadaten und HTTP-Antworten.
+
+summarise_places ergänzt die Orte um die Geschäfte aus dem GWR, gruppiert und sortiert in DuckDB und
+gibt Arrow-Tabellen zurück, die Streamlit ohne Umweg über pandas anzeigt. Die Orte können vorher mit
+fetch_places als Arrow-Tabelle geholt werden (siehe pipeline.py), sodass die langsame Abfrage parallel
+zu den GWR-Abfragen laufen kann.
+"""
+
+import os
+import threading
+
+import duckdb as db
+import pyarrow as pa
+
+# Mit OVERTURE_SCAN_STATS=1 wird bei jeder Abfrage ausgegeben, wie viele Row Groups gelesen werden.
+# Standardmässig aus, da dafür die Metadaten aller Dateien gelesen werden müssen.
+SCAN_STATS = os.environ.get("OVERTURE_SCAN_STATS", "0") == "1"
+
+# Spalten der Geschäfte aus dem GWR (siehe gwr.GwrBusiness)
+GWR_BUSINESS_SCHEMA = pa.schema([
+    ("address", pa.string()),
+    ("category", pa.string()),
+    ("category_alt", pa.string()),
+])
+
+_connection = None
+_connection_lock = threading.Lock()
+
+
+def _connect():
+    """Öffnet die Verbindung und lädt Erweiterungen und Einstellungen."""
+    con = db.connect()
+
+    # To perform spatial operations, the spatial extension is required.
+    # src - https://duckdb.org/docs/api/python/overview.html#loading-and-installing-extensions
+    con.install_extension("spatial")
+    con.load_extension("spatial")
+
+    # To load a Parquet file from S3, the httpfs extension is required.
+    # src - https://duckdb.org/docs/guides/import/s3_import.html
+    con.install_extension("httpfs")
+    con.load_extension("httpfs")
+
+    # Tell DuckDB which S3 region to find Overture's data bucket in
+    # src - https://github.com/OvertureMaps/data/blob/main/README.md#how-to-access-overture-maps-data
+    # GLOBAL, damit die Einstellung auch für alle Cursor gilt
+    con.execute("SET GLOBAL s3_region='us-west-2'")
+
+    # Parquet-Footer und HTTP-Metadaten zwischen Abfragen behalten
+    for setting in ("enable_object_cache", "enable_http_metadata_cache"):
+        try:
+            con.execute(f"SET GLOBAL {setting}=true")
+        except db.Error as e:
+            print(f"DuckDB-Einstellung {setting} nicht verfügbar: {e}")
+
+    return con
+
+
+def get_connection():
+    """Gibt die prozessweite DuckDB-Verbindung zurück und öffnet sie beim ersten Aufruf.
+
+    Returns:
+        duckdb.DuckDBPyConnection: Die gemeinsam genutzte Verbindung. Nicht direkt für Abfragen
+        verwenden, sondern über cursor().
+    """
+    global _connection
+    with _connection_lock:
+        if _connection is None:
+            _connection = _connect()
+    return _connection
+
+
+def cursor():
+    """Gibt einen neuen Cursor auf der prozessweiten Verbindung zurück.
+
+    Cursor sind unabhängig voneinander und dürfen in verschiedenen Threads (z.B. gleichzeitigen
+    Streamlit-Sitzungen) verwendet werden. Nach Gebrauch mit close() schliessen.
+
+    Returns:
+        duckdb.DuckDBPyConnection: Der Cursor.
+    """
+    return get_connection().cursor()
+
+
+def warm_up():
+    """Öffnet die Verbindung im Hintergrund, damit die erste Abfrage nicht auf das Laden der Erweiterungen wartet."""
+    if _connection is None:
+        threading.Thread(target=get_connection, daemon=True).start()
+
+
+def bbox_filter(bounds):
+    """Erzeugt die SQL-Bedingung für Orte, deren bbox das Rechteck überlappt.
+
+    Args:
+        bounds (tuple): Rechteck (minx, miny, maxx, maxy) in WGS84.
+
+    Returns:
+        str: SQL-Bedingung auf den Spalten bbox.xmin, bbox.xmax, bbox.ymin und bbox.ymax.
+    """
+    minx, miny, maxx, maxy = bounds
+    return (
+        f"bbox.xmin <= {maxx} AND bbox.xmax >= {minx} "
+        f"AND bbox.ymin <= {maxy} AND bbox.ymax >= {miny}"
+    )
+
+
+def build_places_query(parquet_path, polygon):
+    """Baut die Abfrage der Orte innerhalb eines Polygons.
+
+    Die Adressen und die alternativen Kategorien werden direkt in SQL zu Zeichenketten
+    zusammengefügt, sodass das Resultat ohne weitere Verarbeitung pro Zeile verwendet werden kann.
+    Orte ohne Namen, Adressen oder Kategorien werden ausgelassen.
+
+    Args:
+        parquet_path (str): Pfad für read_parquet (lokaler Auszug oder S3-Muster).
+        polygon (shapely.geometry.Polygon): Das gezeichnete Polygon in WGS84.
+
+    Returns:
+        str: Die SQL-Abfrage mit den Spalten primary_name, category, category_alt und flattened_addresses.
+    """
+    return f"""
+        SELECT
+            names.primary AS primary_name,
+            categories.primary AS category,
+            -- Liste der alternativen Kategorien als "a,b,c"
+            array_to_string(categories.alternate, ',') AS category_alt,
+            -- freeform-Felder aller Adressen als "Strasse 1, Strasse 2"
+            array_to_string(list_transform(addresses, a -> a.freeform), ', ') AS flattened_addresses
+        FROM
+            read_parquet('{parquet_path}', filename=true, hive_partitioning=1)
+        WHERE
+            {bbox_filter(polygon.bounds)}
+            AND ST_Intersects(geometry, ST_GeomFromText('{polygon.wkt}'))
+            AND names.primary IS NOT NULL
+            AND addresses IS NOT NULL
+            AND categories.primary IS NOT NULL
+            AND categories.alternate IS NOT NULL
+        """
+
+
+def _fetch_arrow(con, sql):
+    """Führt eine Abfrage aus und gibt das Resultat als pyarrow.Table zurück."""
+    result = con.execute(sql).arrow()
+    # Ab DuckDB 1.4 liefert arrow() einen RecordBatchReader statt einer Tabelle
+    if isinstance(result, pa.RecordBatchReader):
+        result = result.read_all()
+    return result
+
+
+def fetch_places(con, query):
+    """Führt die Abfrage der Orte aus und gibt das Resultat als pyarrow.Table zurück.
+
+    Args:
+        con (duckdb.DuckDBPyConnection): Cursor, z.B. von cursor().
+        query (str): Abfrage der Orte von build_places_query.
+
+    Returns:
+        pyarrow.Table: Spalten primary_name, category, category_alt und flattened_addresses.
+    """
+    return _fetch_arrow(con, query)
+
+
+def summarise_places(con, query, gwr_businesses=None):
+    """Führt die Abfrage der Orte aus, ergänzt die Geschäfte aus dem GWR und fasst pro Adresse zusammen.
+
+    Zusammenführen, Gruppieren und Sortieren laufen in DuckDB; die Resultate bleiben Arrow-Tabellen
+    und werden nicht als pandas-DataFrames kopiert.
+
+    Args:
+        con (duckdb.DuckDBPyConnection): Cursor, z.B. von cursor().
+        query (str): Abfrage der Orte von build_places_query.
+        gwr_businesses (list, optional): Geschäfte aus dem GWR (gwr.GwrBusiness). Sie werden nur für
+            Adressen übernommen, die in Overture fehlen.
+
+    Returns:
+        tuple: Ein Tupel bestehend aus:
+            - num_frames (int): Anzahl Geschäfte.
+            - places (pyarrow.Table): Spalten Adresse, Geschäft, Kategorie und Kategorie_Alternative,
+              absteigend nach Adresse sortiert.
+            - places_per_address (pyarrow.Table): Spalten Adresse und Geschäfte, absteigend nach Anzahl sortiert.
+    """
+    gwr_businesses = gwr_businesses or []
+    con.register("gwr_businesses", pa.table({
+        "address": [b.address for b in gwr_businesses],
+        "category": [b.category for b in gwr_businesses],
+        "category_alt": [b.category_alt for b in gwr_businesses],
+    }, schema=GWR_BUSINESS_SCHEMA))
+    try:
+        # MATERIALIZED: die (womöglich entfernte) Abfrage der Orte wird nur einmal ausgeführt
+        places = _fetch_arrow(con, f"""
+            WITH places AS MATERIALIZED ({query})
+            SELECT
+                flattened_addresses AS "Adresse",
+                primary_name AS "Geschäft",
+                category AS "Kategorie",
+                category_alt AS "Kategorie_Alternative"
+            FROM (
+                SELECT flattened_addresses, primary_name, category, category_alt
+                FROM places
+                UNION ALL
+                SELECT address, 'Unbekannt', category, category_alt
+                FROM gwr_businesses
+                WHERE address NOT IN (SELECT flattened_addresses FROM places WHERE flattened_addresses IS NOT NULL)
+            )
+            ORDER BY "Adresse" DESC
+        """)
+
+        con.register("places", places)
+        places_per_address = _fetch_arrow(con, """
+            SELECT "Adresse", COUNT(*) AS "Geschäfte"
+            FROM places
+            WHERE "Adresse" IS NOT NULL
+            GROUP BY "Adresse"
+            ORDER BY "Geschäfte" DESC, "Adresse"
+        """)
+    finally:
+        con.unregister("gwr_businesses")
+        con.unregister("places")
+
+    return places.num_rows, places, places_per_address
+
+
+def scan_stats(con, parquet_path, bounds):
+    """Ermittelt aus den Parquet-Metadaten, wie viel der bbox-Vorfilter einspart.
+
+    Eine Row Group muss gelesen werden, wenn die Min/Max-Statistik ihrer bbox-Spalten das Rechteck
+    überlappt (oder keine Statistik vorhanden ist).
+
+    Args:
+        con (duckdb.DuckDBPyConnection): Verbindung mit geladener httpfs-Erweiterung.
+        parquet_path (str): Pfad für read_parquet (lokaler Auszug oder S3-Muster).
+        bounds (tuple): Rechteck (minx, miny, maxx, maxy) in WGS84.
+
+    Returns:
+        dict: 'row_groups' und 'bytes' (gesamt, komprimiert) sowie 'row_groups_read' und 'bytes_read'.
+    """
+    minx, miny, maxx, maxy = bounds
+    row = con.execute(f"""
+        WITH row_groups AS (
+            SELECT
+                file_name,
+                row_group_id,
+                SUM(total_compressed_size) AS bytes,
+                MIN(CASE WHEN path_in_schema = 'bbox, xmin' THEN TRY_CAST(stats_min AS DOUBLE) END) AS xmin,
+                MAX(CASE WHEN path_in_schema = 'bbox, xmax' THEN TRY_CAST(stats_max AS DOUBLE) END) AS xmax,
+                MIN(CASE WHEN path_in_schema = 'bbox, ymin' THEN TRY_CAST(stats_min AS DOUBLE) END) AS ymin,
+                MAX(CASE WHEN path_in_schema = 'bbox, ymax' THEN TRY_CAST(stats_max AS DOUBLE) END) AS ymax
+            FROM parquet_metadata('{parquet_path}')
+            GROUP BY file_name, row_group_id
+        ), flagged AS (
+            SELECT
+                bytes,
+                COALESCE(xmin <= {maxx} AND xmax >= {minx} AND ymin <= {maxy} AND ymax >= {miny}, true) AS needed
+            FROM row_groups
+        )
+        SELECT
+            COUNT(*),
+            COALESCE(SUM(bytes), 0),
+            COUNT(*) FILTER (WHERE needed),
+            COALESCE(SUM(bytes) FILTER (WHERE needed), 0)
+        FROM flagged
+    """).fetchone()
+
+    return {
+        "row_groups": row[0],
+        "bytes": int(row[1]),
+        "row_groups_read": row[2],
+        "bytes_read": int(row[3]),
+    }
+
+
+def print_scan_stats(stats):
+    """Gibt die Kennzahlen von scan_stats aus."""
+    print(
+        f"Overture: {stats['row_groups_read']} von {stats['row_groups']} Row Groups gelesen, "
+        f"{stats['bytes_read'] / 1e6:.1f} von {stats['bytes'] / 1e6:.1f} MB"
+    )
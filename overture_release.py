@@ -0,0 +1,169 @@
+"""
+Ermittlung des aktuellen Overture-Releases
+
+Einzige Stelle, an der die aktuelle Release-Version von Overture Maps bestimmt wird. Das Ergebnis wird
+im Prozess und in einer kleinen JSON-Datei zwischengespeichert. Ist der Eintrag älter als RELEASE_TTL,
+wird er im Hintergrund erneuert; eine Abfrage wartet nie auf das Netzwerk, sondern verwendet bis
+dahin den bisherigen Wert.
+
+Reihenfolge der Quellen:
+1. Auflistung des S3-Buckets (boto3, ohne Anmeldung)
+2. Release-Kalender auf docs.overturemaps.org
+
+Ist noch gar kein Release bekannt, wird das Release des lokalen Auszugs (overture_local.py) oder
+zuletzt FALLBACK_RELEASE verwendet.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+
+import requests
+
+from overture_local import read_release
+
+RELEASE_CACHE_PATH = os.environ.get("OVERTURE_RELEASE_CACHE_PATH", "overture_release.json")
+
+# Overture veröffentlicht etwa monatlich: ein paar Stunden alte Angaben genügen
+RELEASE_TTL = int(os.environ.get("OVERTURE_RELEASE_TTL", str(6 * 60 * 60)))
+
+# Nach einem Versuch frühestens so viele Sekunden später erneut nachfragen, auch wenn er fehlschlug
+RELEASE_RETRY = int(os.environ.get("OVERTURE_RELEASE_RETRY", str(10 * 60)))
+
+# Letzte Rückfallebene, wenn weder ein Cache noch ein lokaler Auszug vorhanden ist
+FALLBACK_RELEASE = "2026-01-21.0"
+
+RELEASE_PATTERN = re.compile(r"\d{4}-\d{2}-\d{2}\.\d+")
+
+_state = {"release": None, "checked": 0.0, "source": None, "attempted": 0.0}
+_lock = threading.Lock()
+_refreshing = threading.Event()
+
+
+def _from_s3():
+    """Listet die Releases im öffentlichen S3-Bucket und gibt das neueste zurück."""
+    import boto3
+    from botocore import UNSIGNED
+    from botocore.config import Config
+
+    # Create S3 client without credentials (public bucket)
+    s3 = boto3.client("s3", region_name="us-west-2", config=Config(signature_version=UNSIGNED))
+    response = s3.list_objects_v2(Bucket="overturemaps-us-west-2", Prefix="release/", Delimiter="/")
+
+    releases = []
+    for prefix in response.get("CommonPrefixes", []):
+        release_name = prefix["Prefix"].replace("release/", "").rstrip("/")
+        # Filter out any non-release directories (like README files)
+        if RELEASE_PATTERN.fullmatch(release_name):
+            releases.append(release_name)
+
+    # Date-based versions sort correctly alphabetically
+    return sorted(releases)[-1] if releases else None
+
+
+def _from_docs():
+    """Liest das neueste Release aus dem Release-Kalender auf docs.overturemaps.org."""
+    response = requests.get("https://docs.overturemaps.org/release-calendar/", timeout=10)
+    match = re.search(r"latest Overture data release is <code>(\d{4}-\d{2}-\d{2}\.\d+)</code>", response.text)
+    return match.group(1) if match else None
+
+
+def resolve_latest():
+    """Fragt das neueste Release direkt bei den Quellen ab (blockierend, ohne Cache).
+
+    Returns:
+        str: Die Release-Version, oder None wenn keine Quelle erreichbar war.
+    """
+    for source in (_from_s3, _from_docs):
+        try:
+            release = source()
+        except Exception as e:
+            print(f"Overture-Release über {source.__name__} nicht ermittelbar: {e}")
+            continue
+        if release:
+            return release
+    return None
+
+
+def _load():
+    """Lädt den Cache-Eintrag von der Festplatte in den Prozess (einmalig)."""
+    if _state["release"] is not None or not os.path.exists(RELEASE_CACHE_PATH):
+        return
+    try:
+        with open(RELEASE_CACHE_PATH, encoding="utf-8") as f:
+            cached = json.load(f)
+        _state.update(release=cached["release"], checked=cached["checked"], source="cache")
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Overture-Release-Cache nicht lesbar: {e}")
+
+
+def refresh():
+    """Ermittelt das neueste Release und speichert es im Prozess und auf der Festplatte.
+
+    Returns:
+        str: Die Release-Version, oder None wenn keine Quelle erreichbar war.
+    """
+    release = resolve_latest()
+    if release is None:
+        return None
+    checked = time.time()
+    with _lock:
+        _state.update(release=release, checked=checked, source="latest")
+    try:
+        tmp_path = RELEASE_CACHE_PATH + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"release": release, "checked": checked}, f)
+        os.replace(tmp_path, RELEASE_CACHE_PATH)
+    except OSError as e:
+        print(f"Overture-Release-Cache nicht schreibbar: {e}")
+    print(f"Overture release date: {release}")
+    return release
+
+
+def refresh_in_background():
+    """Startet refresh() in einem Hintergrund-Thread, sofern nicht bereits einer läuft."""
+    # Prüfen und Setzen unter dem Lock, damit gleichzeitige Reruns nur einen Thread starten
+    with _lock:
+        if _refreshing.is_set():
+            return
+        _refreshing.set()
+        _state["attempted"] = time.time()
+
+    def run():
+        try:
+            refresh()
+        finally:
+            _refreshing.clear()
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+def get_release():
+    """Gibt das aktuelle Overture-Release zurück, ohne auf das Netzwerk zu warten.
+
+    Ein abgelaufener oder fehlender Eintrag wird im Hintergrund erneuert, höchstens alle RELEASE_RETRY
+    Sekunden, damit gewöhnliche Reruns der App auch ohne erreichbare Quelle keine Anfragen auslösen.
+
+    Returns:
+        tuple: Ein Tupel bestehend aus:
+            - release (str): Die Release-Version.
+            - source (str): Herkunft: "latest" (in diesem Prozess ermittelt), "cache" (von der
+              Festplatte), "local" (Release des lokalen Auszugs) oder "fallback".
+    """
+    with _lock:
+        _load()
+        release, checked, source, attempted = _state["release"], _state["checked"], _state["source"], _state["attempted"]
+
+    now = time.time()
+    if (release is None or now - checked > RELEASE_TTL) and now - attempted > RELEASE_RETRY:
+        refresh_in_background()
+
+    if release is not None:
+        return release, source
+
+    local_release = read_release()
+    if local_release is not None:
+        return local_release, "local"
+    return FALLBACK_RELEASE, "fallback"
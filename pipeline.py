@@ -0,0 +1,205 @@
+"""
+Parallele Berechnung von Wohnungen (GWR) und Geschäften (Overture)
+
+Die Abfrage der Overture-Orte hängt nicht von den GWR-Abfragen ab; erst das Zusammenführen mit den
+Geschäften aus dem GWR braucht beide Resultate. Die Overture-Abfrage läuft deshalb in einem
+Hintergrund-Thread, während die Zellen bei der GeoAdmin API (bzw. im lokalen GWR-Bestand) abgefragt
+werden. Sind beide Stufen fertig, werden die Orte in DuckDB mit den GWR-Geschäften zusammengeführt.
+Die Laufzeit entspricht so etwa der längeren der beiden Stufen statt ihrer Summe.
+
+Stufen:
+1. query_overture: Orte im Polygon als Arrow-Tabelle (im Hintergrund, start_overture)
+2. fetch_polygon: Zellen abfragen und auswerten (im aufrufenden Thread, damit Callbacks z.B.
+   Streamlit-Elemente aktualisieren dürfen)
+3. merge_overture: Orte und GWR-Geschäfte zusammenführen, gruppieren und sortieren
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from checkpoint import open_checkpoint
+from geoadmin import fetch_polygon
+from gwr import GwrResult, extract_wohnungen_and_counts
+from overture_local import places_source
+from overture_query import build_places_query, cursor, fetch_places, print_scan_stats, scan_stats, summarise_places, SCAN_STATS
+from overture_release import get_release
+
+# Höchstens so viele Overture-Abfragen gleichzeitig (z.B. aus mehreren Streamlit-Sitzungen)
+OVERTURE_WORKERS = int(os.environ.get("PIPELINE_OVERTURE_WORKERS", "4"))
+
+_overture_executor = ThreadPoolExecutor(max_workers=max(OVERTURE_WORKERS, 1), thread_name_prefix="overture")
+
+
+class IncompleteError(RuntimeError):
+    """Einige Zellen konnten auch nach allen Wiederholungen nicht abgefragt werden.
+
+    Attributes:
+        calculation (dict): Das unvollständige Resultat von calculate.
+    """
+
+    def __init__(self, calculation):
+        self.calculation = calculation
+        failed = calculation["fetch_stats"]["failed_cells"]
+        super().__init__(f"{failed} Zellen konnten nicht abgefragt werden, die Summen wären unvollständig "
+                         f"(ein erneuter Versuch fragt nur diese Zellen ab)")
+
+
+def query_overture(polygon):
+    """Fragt die Overture-Orte innerhalb eines Polygons ab, noch ohne die Geschäfte aus dem GWR.
+
+    Args:
+        polygon (shapely.geometry.Polygon): Das gezeichnete Polygon in WGS84.
+
+    Returns:
+        tuple: Ein Tupel bestehend aus:
+            - places (pyarrow.Table): Resultat von build_places_query.
+            - release_date (str): Das abgefragte Overture-Release.
+    """
+    start = time.perf_counter()
+
+    # Aktuelles Overture-Release aus dem gemeinsamen Cache (wird im Hintergrund erneuert, blockiert nie)
+    release_date, release_source = get_release()
+    print(f"Overture release date: {release_date} ({release_source})")
+
+    # lokaler Schweizer Auszug, falls für dieses Release vorhanden, sonst S3
+    parquet_path = places_source(release_date)
+
+    con = cursor()
+    try:
+        if SCAN_STATS:
+            print_scan_stats(scan_stats(con, parquet_path, polygon.bounds))
+        places = fetch_places(con, build_places_query(parquet_path, polygon))
+    finally:
+        con.close()
+
+    print(f"Overture-Abfrage: {places.num_rows} Orte in {time.perf_counter() - start:.1f} s")
+    return places, release_date
+
+
+def merge_overture(overture, gwr_businesses=None):
+    """Führt die Overture-Orte mit den Geschäften aus dem GWR zusammen.
+
+    Args:
+        overture (tuple): (places, release_date) von query_overture.
+        gwr_businesses (list, optional): Geschäfte aus dem GWR (gwr.GwrBusiness).
+
+    Returns:
+        tuple: (num_frames, places, places_per_address, release_date), siehe summarise_places.
+    """
+    places, release_date = overture
+
+    con = cursor()
+    try:
+        con.register("overture_places", places)
+        num_frames, places, places_per_address = summarise_places(con, "SELECT * FROM overture_places", gwr_businesses)
+    finally:
+        con.unregister("overture_places")
+        con.close()
+
+    return num_frames, places, places_per_address, release_date
+
+
+def start_overture(polygon):
+    """Startet query_overture im Hintergrund.
+
+    Args:
+        polygon (shapely.geometry.Polygon): Das gezeichnete Polygon in WGS84.
+
+    Returns:
+        concurrent.futures.Future: Liefert (places, release_date), siehe query_overture.
+    """
+    return _overture_executor.submit(query_overture, polygon)
+
+
+def finish_overture(future, gwr_businesses=None):
+    """Wartet auf die Overture-Abfrage und führt sie mit den Geschäften aus dem GWR zusammen.
+
+    Args:
+        future (concurrent.futures.Future): Von start_overture.
+        gwr_businesses (list, optional): Geschäfte aus dem GWR (gwr.GwrBusiness).
+
+    Returns:
+        tuple: (num_frames, places, places_per_address, release_date), siehe merge_overture.
+    """
+    return merge_overture(future.result(), gwr_businesses)
+
+
+def run(polygon, max_area, gwr_result, on_result=None, on_cell=None, overture=None, on_fetched=None):
+    """Berechnet Wohnungen und Geschäfte eines Polygons, die Overture-Abfrage parallel zu den GWR-Abfragen.
+
+    Jede abgefragte Zelle wird als Checkpoint gespeichert (checkpoint.py); ein abgebrochener Lauf
+    setzt beim nächsten Aufruf für denselben Perimeter dort fort. Nach einem vollständigen Lauf
+    werden die Checkpoints gelöscht.
+
+    Args:
+        polygon (shapely.geometry.Polygon): Das gezeichnete Polygon in WGS84.
+        max_area (float): Zellfläche des festen Rasters (z.B. 0.000005 für ca. 130m x 130m).
+        gwr_result (gwr.GwrResult): Resultat der Berechnung, wird mit jeder Zelle ergänzt.
+        on_result (callable, optional): Fortschritts-Callback, siehe geoadmin.fetch_adaptive.
+        on_cell (callable, optional): Wird nach der Auswertung jeder Blattzelle mit (Zelle, sr,
+            Antwort, neu gezählte Wohnungen) aufgerufen.
+        overture (concurrent.futures.Future, optional): Bereits mit start_overture gestartete Abfrage,
+            z.B. um Zwischenstände der Geschäfte anzuzeigen. Standard: wird hier gestartet.
+        on_fetched (callable, optional): Wird ohne Argumente aufgerufen, sobald alle Zellen abgefragt
+            sind und nur noch auf die Overture-Abfrage gewartet wird.
+
+    Returns:
+        tuple: Ein Tupel bestehend aus:
+            - fetch_stats (dict): Wie bei geoadmin.fetch_polygon.
+            - overture (tuple): (num_frames, places, places_per_address, release_date), siehe merge_overture.
+    """
+    start = time.perf_counter()
+    if overture is None:
+        overture = start_overture(polygon)
+    checkpoint = open_checkpoint(polygon, max_area)
+
+    def add_cell(cell, sr, result):
+        before = gwr_result.total_wohnungen
+        if result:
+            extract_wohnungen_and_counts(result, gwr_result)
+        if on_cell is not None:
+            on_cell(cell, sr, result, gwr_result.total_wohnungen - before)
+
+    results, fetch_stats = fetch_polygon(polygon, max_area, on_result=on_result, on_cell=add_cell, checkpoint=checkpoint)
+    gwr_seconds = time.perf_counter() - start
+    if on_fetched is not None:
+        on_fetched()
+
+    merged = finish_overture(overture, gwr_result.businesses)
+    if checkpoint is not None and all(result is not None for result in results):
+        checkpoint.clear()
+    print(f"Pipeline: GWR {gwr_seconds:.1f} s, gesamt {time.perf_counter() - start:.1f} s")
+    return fetch_stats, merged
+
+
+def calculate(polygon, max_area, on_result=None):
+    """Berechnet einen Perimeter ohne Anzeige, z.B. für api.py und jobs.py.
+
+    Args:
+        polygon (shapely.geometry.Polygon): Das gezeichnete Polygon in WGS84.
+        max_area (float): Zellfläche des festen Rasters (z.B. 0.000005 für ca. 130m x 130m).
+        on_result (callable, optional): Fortschritts-Callback, siehe geoadmin.fetch_adaptive.
+
+    Returns:
+        dict: 'gwr_result', 'fetch_stats', 'total_geschaefte', 'place_and_address_df',
+        'total_places_pro_adresse_df' und 'release_date', wie app.calculate.
+
+    Raises:
+        IncompleteError: Wenn Zellen fehlen; ein unvollständiges Resultat wird nicht zurückgegeben.
+    """
+    gwr_result = GwrResult()
+    fetch_stats, (total_geschaefte, places, places_per_address, release_date) = run(
+        polygon, max_area, gwr_result, on_result=on_result
+    )
+    calculation = {
+        "gwr_result": gwr_result,
+        "fetch_stats": fetch_stats,
+        "total_geschaefte": total_geschaefte,
+        "place_and_address_df": places,
+        "total_places_pro_adresse_df": places_per_address,
+        "release_date": release_date,
+    }
+    if fetch_stats.get("failed_cells"):
+        raise IncompleteError(calculation)
+    return calculation
@@ -0,0 +1,149 @@
+"""
+Antwort-Cache für die GeoAdmin API
+
+Persistenter SQLite-Cache für die Antworten der identify-Schnittstelle. Der Schlüssel besteht aus
+der normalisierten Zellgeometrie, dem Layer und dem Raumbezugssystem. Einträge verfallen nach
+einem Tag (das GWR wird täglich aktualisiert), und der Cache wird nach dem LRU-Prinzip auf eine
+maximale Anzahl Einträge begrenzt.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+CACHE_PATH = os.environ.get("GEOADMIN_CACHE_PATH", "geoadmin_cache.sqlite")
+
+# Das GWR wird täglich aktualisiert: Antworten sind einen Tag gültig
+CACHE_TTL = int(os.environ.get("GEOADMIN_CACHE_TTL", str(24 * 60 * 60)))
+
+# Maximale Anzahl Einträge, darüber werden die am längsten nicht benutzten verdrängt
+CACHE_MAX_ENTRIES = int(os.environ.get("GEOADMIN_CACHE_MAX_ENTRIES", "200000"))
+
+# Koordinaten werden vor dem Hashen gerundet (1e-7 Grad entspricht rund 1 cm)
+COORD_PRECISION = 7
+
+
+def cache_key(rings, layer, sr, return_geometry=False):
+    """Erzeugt den Cache-Schlüssel für eine Anfrage.
+
+    Args:
+        rings (list): Koordinatenringe der Zelle, wie sie an die API gesendet werden.
+        layer (str): Abgefragter Layer, z.B. "all:ch.bfs.gebaeude_wohnungs_register".
+        sr (int): Raumbezugssystem (Spatial Reference).
+        return_geometry (bool, optional): Ob die Antwort die Geometrien enthält. Standard: False.
+
+    Returns:
+        str: SHA-1-Hash der normalisierten Anfrage.
+    """
+    normalised = [[[round(x, COORD_PRECISION), round(y, COORD_PRECISION)] for x, y in ring] for ring in rings]
+    # Ohne Geometrien bleibt der Schlüssel wie bisher, damit bestehende Einträge gültig bleiben
+    key_parts = [normalised, layer, sr] + ([True] if return_geometry else [])
+    payload = json.dumps(key_parts, separators=(",", ":"))
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Thread-sicherer SQLite-Cache mit TTL und LRU-Verdrängung.
+
+    Args:
+        path (str, optional): Pfad der SQLite-Datei. Standard: CACHE_PATH.
+        ttl (int, optional): Gültigkeit eines Eintrags in Sekunden. Standard: CACHE_TTL.
+        max_entries (int, optional): Maximale Anzahl Einträge. Standard: CACHE_MAX_ENTRIES.
+    """
+
+    def __init__(self, path=CACHE_PATH, ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0}
+        self._lock = threading.Lock()
+        self._con = sqlite3.connect(path, check_same_thread=False)
+        self._con.execute("PRAGMA journal_mode=WAL")
+        self._con.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, created REAL NOT NULL, accessed REAL NOT NULL, body TEXT NOT NULL)"
+        )
+        self._con.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self._con.commit()
+        self._entries = self._con.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def get(self, key):
+        """Gibt die gespeicherte Antwort zurück, oder None wenn sie fehlt oder abgelaufen ist."""
+        now = time.time()
+        with self._lock:
+            row = self._con.execute("SELECT created, body FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            if now - row[0] > self.ttl:
+                self._con.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._con.commit()
+                self._entries -= 1
+                self.stats["expired"] += 1
+                self.stats["misses"] += 1
+                return None
+            self._con.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self._con.commit()
+            self.stats["hits"] += 1
+        return json.loads(row[1])
+
+    def put(self, key, response):
+        """Speichert eine Antwort und verdrängt bei Bedarf die am längsten nicht benutzten Einträge."""
+        now = time.time()
+        body = json.dumps(response, separators=(",", ":"))
+        with self._lock:
+            exists = self._con.execute("SELECT 1 FROM responses WHERE key = ?", (key,)).fetchone()
+            self._con.execute(
+                "INSERT OR REPLACE INTO responses (key, created, accessed, body) VALUES (?, ?, ?, ?)",
+                (key, now, now, body),
+            )
+            if exists is None:
+                self._entries += 1
+            if self._entries > self.max_entries:
+                evicted = self._con.execute(
+                    "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY accessed LIMIT ?)",
+                    (self._entries - self.max_entries,),
+                ).rowcount
+                self._entries -= evicted
+                self.stats["evictions"] += evicted
+            self._con.commit()
+
+    def get_stats(self):
+        """Gibt Treffer-, Fehl-, Ablauf- und Verdrängungszähler sowie die aktuelle Grösse zurück.
+
+        Returns:
+            dict: Kopie der Zähler, ergänzt um 'entries'.
+        """
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entries"] = self._entries
+        return stats
+
+    def clear(self):
+        """Löscht alle Einträge."""
+        with self._lock:
+            self._con.execute("DELETE FROM responses")
+            self._con.commit()
+            self._entries = 0
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Gibt den prozessweiten Antwort-Cache zurück (oder None, wenn mit GEOADMIN_CACHE=0 abgeschaltet).
+
+    Returns:
+        ResponseCache: Der gemeinsam genutzte Cache.
+    """
+    global _cache
+    if os.environ.get("GEOADMIN_CACHE", "1") == "0":
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+    return _cache
@@ -0,0 +1,187 @@
+"""
+Resultat-Cache für ganze Berechnungen
+
+Prozessweiter Cache vor der ganzen Berechnung eines Perimeters (Wohnungen aus dem GWR, Overture-Orte
+und Zusammenführen). Er wird von allen Streamlit-Sitzungen geteilt: zeichnen zwei Personen denselben
+Perimeter oder klickt jemand erneut auf Berechnen, ist das Resultat sofort da.
+
+Der Schlüssel besteht aus einem kanonischen Hash des Perimeters (normalisierter Umlaufsinn und
+Startpunkt, gerundete Koordinaten) und den Versionen der Daten: dem Overture-Release und dem Stand
+des GWR (Tagesdatum bei der GeoAdmin API, Änderungszeit der Datei beim lokalen Bestand). Mit einer
+neuen Datenversion ändert sich der Schlüssel, veraltete Resultate werden nicht mehr getroffen und
+nach dem LRU-Prinzip verdrängt, sobald das Speicherbudget erreicht ist.
+"""
+
+import dataclasses
+import hashlib
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+import pyarrow as pa
+import shapely
+
+from geoadmin import BACKEND
+from gwr_snapshot import SNAPSHOT_PATH
+
+# Speicherbudget in MB, darüber werden die am längsten nicht benutzten Resultate verdrängt
+RESULT_CACHE_MAX_MB = float(os.environ.get("RESULT_CACHE_MAX_MB", "256"))
+
+# Koordinaten werden vor dem Hashen gerundet (1e-7 Grad entspricht rund 1 cm)
+GRID_SIZE = 1e-7
+
+
+def perimeter_key(polygon):
+    """Gibt einen kanonischen Schlüssel für einen Perimeter zurück.
+
+    Umlaufsinn und Startpunkt der Ringe spielen keine Rolle, die Koordinaten werden auf GRID_SIZE
+    gerundet, damit dasselbe Polygon nach einem Rerun oder aus einer anderen Sitzung denselben
+    Schlüssel erhält.
+
+    Args:
+        polygon (shapely.geometry.Polygon): Der Perimeter in WGS84.
+
+    Returns:
+        str: SHA-256 der normalisierten Geometrie.
+    """
+    return hashlib.sha256(shapely.set_precision(polygon, GRID_SIZE).normalize().wkb).hexdigest()
+
+
+def gwr_version():
+    """Gibt den Stand des GWR für den Schlüssel zurück.
+
+    Returns:
+        str: Beim lokalen Bestand die Änderungszeit der Datei, bei der GeoAdmin API das Tagesdatum (UTC),
+        da das GWR dort täglich aktualisiert wird.
+    """
+    if BACKEND == "snapshot":
+        try:
+            return f"snapshot-{os.path.getmtime(SNAPSHOT_PATH):.0f}"
+        except OSError:
+            return "snapshot-missing"
+    return f"api-{datetime.now(timezone.utc).date().isoformat()}"
+
+
+def result_key(polygon, overture_release):
+    """Erzeugt den Cache-Schlüssel für die Berechnung eines Perimeters.
+
+    Args:
+        polygon (shapely.geometry.Polygon): Der Perimeter in WGS84.
+        overture_release (str): Das verwendete Overture-Release.
+
+    Returns:
+        str: SHA-1-Hash aus Perimeter und Datenversionen.
+    """
+    payload = json.dumps([perimeter_key(polygon), gwr_version(), overture_release], separators=(",", ":"))
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def estimate_size(value):
+    """Schätzt den Speicherbedarf eines Resultats in Bytes.
+
+    Arrow-Tabellen zählen mit ihren Puffern (nbytes), Dataclasses, dicts, Listen und Mengen mit ihrem
+    Inhalt.
+
+    Args:
+        value: Das Resultat, z.B. das dict von app.calculate.
+
+    Returns:
+        int: Geschätzte Grösse in Bytes.
+    """
+    if isinstance(value, pa.Table):
+        return value.nbytes
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return sys.getsizeof(value) + sum(estimate_size(getattr(value, f.name)) for f in dataclasses.fields(value))
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+    """Thread-sicherer LRU-Cache im Arbeitsspeicher mit einem Budget in Bytes.
+
+    Die Resultate werden nicht kopiert; sie dürfen nach put() nicht mehr verändert werden.
+
+    Args:
+        max_bytes (int, optional): Speicherbudget in Bytes. Standard: RESULT_CACHE_MAX_MB.
+    """
+
+    def __init__(self, max_bytes=int(RESULT_CACHE_MAX_MB * 1024 * 1024)):
+        self.max_bytes = max_bytes
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Gibt das gespeicherte Resultat zurück, oder None wenn es fehlt."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+        return entry[0]
+
+    def put(self, key, value):
+        """Speichert ein Resultat und verdrängt bei Bedarf die am längsten nicht benutzten.
+
+        Ein Resultat, das allein das Budget übersteigt, wird nicht gespeichert.
+        """
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            print(f"Resultat-Cache: Resultat mit {size / 1e6:.1f} MB ist grösser als das Budget")
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.stats["evictions"] += 1
+
+    def get_stats(self):
+        """Gibt Treffer-, Fehl- und Verdrängungszähler sowie die aktuelle Grösse zurück.
+
+        Returns:
+            dict: Kopie der Zähler, ergänzt um 'entries' und 'bytes'.
+        """
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._bytes
+        return stats
+
+    def clear(self):
+        """Löscht alle Einträge."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache():
+    """Gibt den prozessweiten Resultat-Cache zurück (oder None, wenn mit RESULT_CACHE=0 abgeschaltet).
+
+    Returns:
+        ResultCache: Der gemeinsam genutzte Cache.
+    """
+    global _cache
+    if os.environ.get("RESULT_CACHE", "1") == "0":
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResultCache()
+    return _cache
@@ -0,0 +1,95 @@
+import json
+import threading
+import time
+
+import pyarrow as pa
+import pytest
+import requests
+from shapely.geometry import box, mapping
+
+import api
+from gwr import GwrResult
+
+PERIMETER = json.dumps(mapping(box(7.44, 46.94, 7.45, 46.95)))
+
+
+def calculation():
+    gwr_result = GwrResult(total_wohnungen=3, total_adressen=1)
+    gwr_result.wohnungen_by_streetnr["Bundesplatz 1"] = 3
+    gwr_result.wohnungen_by_street["Bundesplatz"] = 3
+    places = pa.table({"Adresse": ["Bundesplatz 1"], "Anzahl": [1]})
+    return {
+        "gwr_result": gwr_result,
+        "fetch_stats": {"requests": 1},
+        "total_geschaefte": 1,
+        "place_and_address_df": places,
+        "total_places_pro_adresse_df": places,
+        "release_date": "stub",
+    }
+
+
+@pytest.fixture
+def serve(monkeypatch):
+    """Startet die API mit einer Stub-Berechnung, ohne Resultat-Cache und Overture-Abfrage."""
+    monkeypatch.setattr(api, "get_result_cache", lambda: None)
+    monkeypatch.setattr(api, "get_release", lambda: ("stub", "cache"))
+
+    def start(calculate):
+        manager = api.JobManager(calculate=calculate)
+        return manager, f"http://127.0.0.1:{api.serve_in_thread(manager)}"
+
+    return start
+
+
+def test_identical_requests_are_coalesced(serve):
+    release = threading.Event()
+    calls = []
+
+    def calculate(polygon, on_result):
+        calls.append(polygon)
+        release.wait(5)
+        return calculation()
+
+    manager, url = serve(calculate)
+    responses = []
+
+    def post():
+        responses.append(requests.post(f"{url}/jobs?wait=1", data=PERIMETER, timeout=10))
+
+    threads = [threading.Thread(target=post) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while manager.stats["jobs"] < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert manager.stats["coalesced"] == 1
+    assert [r.status_code for r in responses] == [200, 200]
+    jobs = [r.json() for r in responses]
+    assert jobs[0]["id"] == jobs[1]["id"]
+    assert jobs[0]["result"]["briefkaesten"] == 4
+
+
+@pytest.mark.parametrize("body", ["kein json", '{"type": "Point", "coordinates": [7.44, 46.94]}', '{"type": "Feature"}'])
+def test_invalid_geojson_is_rejected(serve, body):
+    calls = []
+    _, url = serve(lambda polygon, on_result: calls.append(polygon))
+    response = requests.post(f"{url}/jobs", data=body, timeout=10)
+    assert response.status_code == 400
+    assert "error" in response.json()
+    assert calls == []
+
+
+def test_failing_calculation_returns_500(serve):
+    def calculate(polygon, on_result):
+        raise RuntimeError("GeoAdmin nicht erreichbar")
+
+    _, url = serve(calculate)
+    response = requests.post(f"{url}/jobs?wait=1", data=PERIMETER, timeout=10)
+    assert response.status_code == 500
+    assert response.json()["status"] == "failed"
+    assert response.json()["error"] == "GeoAdmin nicht erreichbar"
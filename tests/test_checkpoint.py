@@ -0,0 +1,27 @@
+from shapely.geometry import box
+
+import checkpoint
+
+PERIMETER = box(7.44, 46.94, 7.45, 46.95)
+
+
+def test_key_depends_on_grid(monkeypatch):
+    key = checkpoint.checkpoint_key(PERIMETER, 0.000005)
+    assert checkpoint.checkpoint_key(PERIMETER, 0.000005) == key
+    assert checkpoint.checkpoint_key(PERIMETER, 0.00001) != key
+
+    monkeypatch.setattr(checkpoint, "COARSE_FACTOR", 4)
+    coarse_key = checkpoint.checkpoint_key(PERIMETER, 0.000005)
+    assert coarse_key != key
+
+    monkeypatch.setattr(checkpoint, "TILE_SIZE", 100)
+    assert checkpoint.checkpoint_key(PERIMETER, 0.000005) not in (key, coarse_key)
+
+
+def test_cells_are_not_shared_between_grids(tmp_path):
+    store = checkpoint.CheckpointStore(str(tmp_path / "checkpoints.sqlite"))
+    fine = checkpoint.Checkpoint(store, checkpoint.checkpoint_key(PERIMETER, 0.000005))
+    coarse = checkpoint.Checkpoint(store, checkpoint.checkpoint_key(PERIMETER, 0.00002))
+    fine.put("0", {"results": []})
+    assert fine.get("0") == {"results": []}
+    assert coarse.get("0") is None
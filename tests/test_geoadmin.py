@@ -0,0 +1,96 @@
+import json
+import threading
+import time
+
+import pytest
+from shapely.geometry import MultiPolygon, box
+
+import geoadmin
+
+
+class StubResponse:
+    def __init__(self, status_code, headers=None, body=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self._body = body
+
+    def json(self):
+        return self._body
+
+
+class StubSession:
+    """Antwortet auf die ersten Anfragen mit einer festen Fehlerantwort, danach mit einem Gebäude."""
+
+    def __init__(self, failures=0, status_code=200, headers=None, delay=0):
+        self.failures = failures
+        self.status_code = status_code
+        self.headers = headers
+        self.delay = delay
+        self.calls = 0
+        self.params = []
+        self._lock = threading.Lock()
+
+    def get(self, url, params=None, timeout=None):
+        with self._lock:
+            self.calls += 1
+            self.params.append(params)
+            n = self.calls
+        time.sleep(self.delay)
+        if n <= self.failures:
+            return StubResponse(self.status_code, self.headers)
+        return StubResponse(200, body={"results": [{"featureId": f"{n}_0", "attributes": {"ganzwhg": 1}}]})
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """Client ohne Cache, mit schnellem Backoff und einem empfindlichen Circuit Breaker."""
+    monkeypatch.setattr(geoadmin, "get_cache", lambda: None)
+    monkeypatch.setattr(geoadmin, "BACKOFF_BASE", 0.01)
+    monkeypatch.setattr(geoadmin, "_bucket", geoadmin.TokenBucket(rate=1000, capacity=8))
+    monkeypatch.setattr(geoadmin, "_breaker", geoadmin.CircuitBreaker(threshold=3, cooldown=0.2))
+
+    def use(session):
+        monkeypatch.setattr(geoadmin, "get_session", lambda: session)
+        return session
+
+    return use
+
+
+def cells(count):
+    return [box(i * 0.001, 0, i * 0.001 + 0.001, 0.001) for i in range(count)]
+
+
+def test_burst_of_429_does_not_fail_cells(client):
+    session = client(StubSession(12, 429, {"Retry-After": "0.05"}))
+    results, stats = geoadmin.fetch_adaptive(cells(200), min_cell_area=1, max_workers=8)
+    assert stats["failed_cells"] == 0
+    assert all(result is not None for result in results)
+    assert session.calls == 212
+
+
+def test_open_breaker_waits_for_cooldown(client):
+    client(StubSession(5, 503))
+    results, stats = geoadmin.fetch_adaptive(cells(20), min_cell_area=1, max_workers=4)
+    assert stats["failed_cells"] == 0
+    assert all(result is not None for result in results)
+
+
+def test_callback_error_cancels_pending_requests(client):
+    session = client(StubSession(delay=0.05))
+
+    def on_result(done, total):
+        raise RuntimeError("Abbruch")
+
+    start = time.monotonic()
+    with pytest.raises(RuntimeError, match="Abbruch"):
+        geoadmin.fetch_adaptive(cells(400), min_cell_area=1, max_workers=8, on_result=on_result)
+    assert time.monotonic() - start < 0.5
+    assert session.calls <= 16
+
+
+def test_multipolygon_parts_are_separate_rings(client):
+    session = client(StubSession())
+    parts = cells(2)
+    assert geoadmin.query_geoadmin_with_polygon(MultiPolygon(parts)) is not None
+    rings = json.loads(session.params[0]["geometry"])["rings"]
+    assert rings == [[[x, y] for x, y in part.exterior.coords] for part in parts]
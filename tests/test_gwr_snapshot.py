@@ -0,0 +1,41 @@
+from pathlib import Path
+
+from shapely.geometry import box
+
+from gwr import GwrResult, extract_wohnungen_and_counts
+from gwr_snapshot import fetch_polygon_snapshot, ingest
+from tiling import to_wgs84
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+# Ausschnitt um den Bundesplatz in Bern (LV95), ohne das Gebäude in Zürich
+PERIMETER = to_wgs84(box(2599900, 1199900, 2600200, 1200200))
+
+
+def test_snapshot_pipeline(tmp_path):
+    db_path = str(tmp_path / "gwr.duckdb")
+    count = ingest(str(FIXTURES / "gwr_buildings.csv"), str(FIXTURES / "gwr_entrances.csv"), db_path)
+    # Eingang ohne Koordinate und ohne Gebäudekoordinate wird nicht eingelesen
+    assert count == 4
+
+    cells = []
+    results, stats = fetch_polygon_snapshot(PERIMETER, db_path, on_cell=lambda *args: cells.append(args))
+    assert len(cells) == 1
+    assert stats["requests"] == 0
+    assert stats["failed_cells"] == 0
+    assert stats["reused_cells"] == 0
+
+    features = {feature["featureId"]: feature["attributes"] for feature in results[0]["results"]}
+    assert sorted(features) == ["101_0", "102_0", "103_0"]
+    # Fehlende Hausnummer: None statt eines maskierten Werts
+    assert features["102_0"]["deinr"] is None
+    assert features["102_0"]["strname_deinr"] == "Bundesplatz"
+    assert features["103_0"]["strname_deinr"] == "Bundesgasse 3"
+
+    gwr_result = GwrResult()
+    for result in results:
+        extract_wohnungen_and_counts(result, gwr_result)
+    assert gwr_result.total_wohnungen == 5
+    assert gwr_result.wohnungen_by_street["Bundesgasse"] == 5
+    assert [business.address for business in gwr_result.businesses] == ["Bundesplatz"]
+    assert gwr_result.businesses[0].category_alt == "Bürogebäude"
@@ -0,0 +1,197 @@
+"""
+Unterteilung von Polygonen
+
+Gemeinsame Funktionen, um ein gezeichnetes Polygon in Teilpolygone (Zellen) für die Abfrage der
+GeoAdmin API zu zerlegen. Wird von app.py, madd_extract.py und geoadmin.py verwendet.
+
+split_polygon legt das Raster an die Bounding Box des Polygons, split_polygon_lv95 an ein festes,
+schweizweites Kachelraster in LV95, dessen Kacheln über Sitzungen hinweg wiederverwendbar sind.
+"""
+
+import math
+
+import geopandas as gpd
+import numpy as np
+from pyproj import Transformer
+from shapely.geometry import box
+from shapely.ops import transform, unary_union
+from shapely.prepared import prep
+from shapely.validation import explain_validity
+
+# Ursprung des schweizweiten Kachelrasters in LV95 (EPSG:2056), südwestlich der Landesgrenze
+GRID_ORIGIN = (2480000, 1070000)
+
+# Kantenlänge einer Kachel in Metern (Fläche ungefähr wie eine Zelle mit max_area = 0.000005 Grad²)
+TILE_SIZE = 200
+
+_to_lv95 = Transformer.from_crs("EPSG:4326", "EPSG:2056", always_xy=True)
+_to_wgs84 = Transformer.from_crs("EPSG:2056", "EPSG:4326", always_xy=True)
+
+
+def _polygonal(geometry):
+    """Entfernt Linien und Punkte aus dem Resultat einer Verschneidung (Berührungen an Kanten)."""
+    if geometry.geom_type == "GeometryCollection":
+        return unary_union([g for g in geometry.geoms if g.geom_type in ("Polygon", "MultiPolygon")])
+    return geometry
+
+
+def to_lv95(geometry):
+    """Transformiert eine Geometrie von WGS84 (EPSG:4326) nach LV95 (EPSG:2056)."""
+    return transform(_to_lv95.transform, geometry)
+
+
+def to_wgs84(geometry):
+    """Transformiert eine Geometrie von LV95 (EPSG:2056) nach WGS84 (EPSG:4326)."""
+    return transform(_to_wgs84.transform, geometry)
+
+
+def split_polygon(polygon, max_area, export_gpkg=False, gpkg_path="grid_output.gpkg"):
+    """Teilt ein Polygon in kleinere Polygone, deren Fläche eine vorgegebene Maximalgröße nicht überschreitet.
+
+    Args:
+        polygon (shapely.geometry.Polygon): Das zu teilende Polygon.
+        max_area (float): Maximale Fläche eines Teilpolygons.
+        export_gpkg (bool, optional): Gibt an, ob die Teilpolygone als GeoPackage exportiert werden sollen. Standard: False.
+        gpkg_path (str, optional): Pfad zur Ausgabe des GeoPackages. Standard: "grid_output.gpkg".
+
+    Returns:
+        list: Liste der generierten Teilpolygone.
+    """
+    # Check if the polygon is valid
+    if not polygon.is_valid:
+        print(f"Invalid polygon: {explain_validity(polygon)}")
+        # Attempt to fix the polygon
+        polygon = polygon.buffer(0)
+        if not polygon.is_valid:
+            raise ValueError("The input polygon is invalid and could not be fixed.")
+
+    bounds = polygon.bounds  # (minx, miny, maxx, maxy)
+    width = bounds[2] - bounds[0]
+    height = bounds[3] - bounds[1]
+
+    num_x = int(np.ceil(width / np.sqrt(max_area)))
+    num_y = int(np.ceil(height / np.sqrt(max_area)))
+
+    x_step = width / num_x
+    y_step = height / num_y
+
+    sub_polygons = []
+    for i in range(num_x):
+        for j in range(num_y):
+            minx = bounds[0] + i * x_step
+            miny = bounds[1] + j * y_step
+            maxx = minx + x_step
+            maxy = miny + y_step
+
+            grid_cell = box(minx, miny, maxx, maxy)
+            intersection = polygon.intersection(grid_cell)
+
+            if not intersection.is_empty:
+                sub_polygons.append(intersection)
+
+    if export_gpkg:
+        # Exportiere die Sub-Polygone als GeoPackage
+        gdf = gpd.GeoDataFrame(geometry=sub_polygons, crs="EPSG:4326")
+        gdf.to_file(gpkg_path, driver="GPKG")
+        print(f"GeoPackage wurde exportiert nach: {gpkg_path}")
+
+    return sub_polygons
+
+
+def split_polygon_lv95(polygon, tile_size=TILE_SIZE, export_gpkg=False, gpkg_path="grid_output.gpkg"):
+    """Teilt ein Polygon entlang eines festen, schweizweiten Kachelrasters in LV95.
+
+    Das Raster ist an GRID_ORIGIN verankert statt an der Bounding Box des Polygons. Zwei sich
+    überlappende Perimeter erzeugen im Innern deshalb identische Kacheln, deren Antworten im
+    Antwort-Cache von anderen Sitzungen und Benutzern wiederverwendet werden. Nur Randkacheln werden
+    auf das Polygon zugeschnitten; Kacheln vollständig im Innern werden ohne Verschneidung übernommen.
+
+    Args:
+        polygon (shapely.geometry.Polygon): Das zu teilende Polygon in WGS84.
+        tile_size (float, optional): Kantenlänge der Kacheln in Metern. Standard: TILE_SIZE.
+        export_gpkg (bool, optional): Gibt an, ob die Kacheln als GeoPackage exportiert werden sollen. Standard: False.
+        gpkg_path (str, optional): Pfad zur Ausgabe des GeoPackages. Standard: "grid_output.gpkg".
+
+    Returns:
+        tuple: Ein Tupel bestehend aus:
+            - tiles (list): Teilpolygone in LV95 (für Abfragen mit sr=2056).
+            - tile_bounds (list): Die unbeschnittenen Kachelgrenzen (minx, miny, maxx, maxy) pro Teilpolygon.
+    """
+    # Check if the polygon is valid
+    if not polygon.is_valid:
+        print(f"Invalid polygon: {explain_validity(polygon)}")
+        # Attempt to fix the polygon
+        polygon = polygon.buffer(0)
+        if not polygon.is_valid:
+            raise ValueError("The input polygon is invalid and could not be fixed.")
+
+    polygon = to_lv95(polygon)
+    prepared = prep(polygon)
+    minx, miny, maxx, maxy = polygon.bounds
+
+    first_i = math.floor((minx - GRID_ORIGIN[0]) / tile_size)
+    last_i = math.ceil((maxx - GRID_ORIGIN[0]) / tile_size)
+    first_j = math.floor((miny - GRID_ORIGIN[1]) / tile_size)
+    last_j = math.ceil((maxy - GRID_ORIGIN[1]) / tile_size)
+
+    tiles = []
+    tile_bounds = []
+    for i in range(first_i, last_i):
+        for j in range(first_j, last_j):
+            bounds = (
+                GRID_ORIGIN[0] + i * tile_size,
+                GRID_ORIGIN[1] + j * tile_size,
+                GRID_ORIGIN[0] + (i + 1) * tile_size,
+                GRID_ORIGIN[1] + (j + 1) * tile_size,
+            )
+            tile = box(*bounds)
+
+            if prepared.contains(tile):
+                # Kachel liegt ganz im Polygon: keine Verschneidung nötig
+                tiles.append(tile)
+            elif prepared.intersects(tile):
+                intersection = _polygonal(polygon.intersection(tile))
+                if intersection.is_empty or intersection.area == 0:
+                    continue
+                tiles.append(intersection)
+            else:
+                continue
+            tile_bounds.append(bounds)
+
+    if export_gpkg:
+        # Exportiere die Kacheln als GeoPackage
+        gdf = gpd.GeoDataFrame(geometry=tiles, crs="EPSG:2056")
+        gdf.to_file(gpkg_path, driver="GPKG")
+        print(f"GeoPackage wurde exportiert nach: {gpkg_path}")
+
+    return tiles, tile_bounds
+
+
+def split_cell(cell, bounds=None):
+    """Teilt eine Zelle in vier Quadranten (Quadtree-Schritt).
+
+    Args:
+        cell (shapely.geometry.Polygon or shapely.geometry.MultiPolygon): Die zu teilende Zelle.
+        bounds (tuple, optional): Rechteck (minx, miny, maxx, maxy), das in Quadranten geteilt wird.
+            Standard: die Bounding Box der Zelle.
+
+    Returns:
+        list: Liste von (Teilpolygon, Bounds)-Tupeln der nicht leeren Quadranten.
+    """
+    minx, miny, maxx, maxy = bounds if bounds is not None else cell.bounds
+    midx = (minx + maxx) / 2
+    midy = (miny + maxy) / 2
+
+    children = []
+    for child_bounds in [
+        (minx, miny, midx, midy),
+        (midx, miny, maxx, midy),
+        (minx, midy, midx, maxy),
+        (midx, midy, maxx, maxy),
+    ]:
+        child = _polygonal(cell.intersection(box(*child_bounds)))
+        # Nur flächige Teile behalten (Berührungen an Kanten ergeben Linien oder Punkte)
+        if not child.is_empty and child.area > 0:
+            children.append((child, child_bounds))
+
+    return children
@@ -14,10 +14,19 @@ Zeichnen Sie einfach ein Polygon auf der Karte, und wir analysieren die Daten f
         "button_calculate": "Berechnen",
         "warning_draw_polygon": "Bitte zeichnen Sie zuerst ein Polygon auf der Karte.",
         "error_large_polygon": "Das gezeichnete Polygon ist grösser als 150 km². Bitte zeichnen Sie ein kleineres Polygon.",
-        "warning_large_polygon": "Das gezeichnete Polygon ist grösser als 10 km². Die Berechnung kann sehr lange dauern und möglicherweise aufgrund von API-Limitierungen von geo.admin.ch abbrechen.",
+        "warning_large_polygon": "Das gezeichnete Polygon ist grösser als 10 km². Die Berechnung läuft im Hintergrund und wird auch fortgesetzt, wenn Sie die Seite schliessen; mit dem Link unten kommen Sie später zum Resultat zurück.",
         "progress_text": "Wohnungen: subset noch auszulesen: ",
         "progress_complete": "Auslesen Wohnungen abgeschlossen",
         "spinner_text": "Auslesen Geschäfte (dauert ca 1 min)...",
+        "interim_header": "Zwischenstand",
+        "businesses_pending": "Geschäfte werden ausgelesen",
+        "businesses_interim": "Geschäfte in Overture",
+        "job_queued": "Berechnung wartet auf einen freien Platz",
+        "job_progress": "Zellen abgefragt",
+        "job_reused": "aus einem früheren Versuch übernommen",
+        "job_link": "Link zu dieser Berechnung",
+        "job_failed": "Die Berechnung ist fehlgeschlagen",
+        "job_not_found": "Die Berechnung wurde nicht gefunden (möglicherweise abgelaufen).",
         "mailboxes_header": "Briefkästen",
         "mailboxes_explanation_1": "Entspricht der Summe der [Wohnungen](https://github.com/davidoesch/wo-sind-briefkaesten/tree/master?tab=readme-ov-file#apartments)" ,
         "mailboxes_explanation_2": " und der Summe der [Geschäfte](https://github.com/davidoesch/wo-sind-briefkaesten/tree/master?tab=readme-ov-file#businesses)",
@@ -32,6 +41,12 @@ Zeichnen Sie einfach ein Polygon auf der Karte, und wir analysieren die Daten f
         "no_addresses_found": "Keine Adressen gefunden.",
         "no_streets_found": "Keine Strassen gefunden.",
         "total_addresses": "Gesamtanzahl Adressen im Polygon: ",
+        "api_requests": "Anfragen an api3.geo.admin.ch: ",
+        "api_requests_saved": "Eingesparte Anfragen gegenüber festem Raster: ",
+        "saturated_cells": "Zellen am Trefferlimit (neu abgefragt): ",
+        "max_depth": "Rekursionstiefe: ",
+        "reused_cells": "Zellen aus einem abgebrochenen Lauf übernommen: ",
+        "failed_cells": "Unvollständig: Die Zahlen enthalten nicht alle Adressen, weil einige Zellen auch nach mehreren Versuchen nicht von geo.admin.ch abgefragt werden konnten. Klicken Sie erneut auf Berechnen, um nur die fehlenden Zellen abzufragen. Fehlende Zellen:",
         "no_businesses_found": "Keine Geschäfte gefunden.",
         "footer_text": "🏠 **Wohnungs-Briefkasten-Analyse** © 2024 David Oesch, [Overture Maps Foundation](https://overturemaps.org), Overture  Release ",
         "footer_link": "Mehr infos und :star: unter [github.com/davidoesch/wo-sind-briefkaesten](https://github.com/davidoesch/wo-sind-briefkaesten)"
@@ -50,10 +65,19 @@ Vous pouvez rapidement estimer le nombre de boîtes aux lettres dans une zone. D
         "button_calculate": "Calculer",
         "warning_draw_polygon": "Veuillez d'abord dessiner un polygone sur la carte.",
         "error_large_polygon": "Le polygone dessiné est plus grand que 150 km². Veuillez dessiner un polygone plus petit.",
-        "warning_large_polygon": "Le polygone dessiné est plus grand que 10 km². Le calcul peut prendre beaucoup de temps et peut s'arrêter en raison des limitations de l'API de geo.admin.ch.",
+        "warning_large_polygon": "Le polygone dessiné est plus grand que 10 km². Le calcul s'effectue en arrière-plan et se poursuit même si vous fermez la page ; le lien ci-dessous vous permet de revenir plus tard au résultat.",
         "progress_text": "Logements : sous-ensembles restants à lire : ",
         "progress_complete": "Lecture des logements terminée",
         "spinner_text": "Lecture des entreprises (prend environ 1 min)...",
+        "interim_header": "État intermédiaire",
+        "businesses_pending": "Lecture des entreprises en cours",
+        "businesses_interim": "Entreprises dans Overture",
+        "job_queued": "Le calcul attend une place libre",
+        "job_progress": "Cellules interrogées",
+        "job_reused": "reprises d'une tentative précédente",
+        "job_link": "Lien vers ce calcul",
+        "job_failed": "Le calcul a échoué",
+        "job_not_found": "Le calcul est introuvable (peut-être expiré).",
         "mailboxes_header": "Boîtes aux lettres",
         "mailboxes_explanation_1": "Correspond à la somme des [logements](https://github.com/davidoesch/wo-sind-briefkaesten/tree/master?tab=readme-ov-file#apartments) ",
         "mailboxes_explanation_2": " et de la somme des [entreprises](https://github.com/davidoesch/wo-sind-briefkaesten/tree/master?tab=readme-ov-file#businesses)",
@@ -68,6 +92,12 @@ Vous pouvez rapidement estimer le nombre de boîtes aux lettres dans une zone. D
         "no_addresses_found": "Aucune adresse trouvée.",
         "no_streets_found": "Aucune rue trouvée.",
         "total_addresses": "Nombre total d'adresses dans le polygone : ",
+        "api_requests": "Requêtes à api3.geo.admin.ch : ",
+        "api_requests_saved": "Requêtes économisées par rapport à la grille fixe : ",
+        "saturated_cells": "Cellules à la limite de résultats (réinterrogées) : ",
+        "max_depth": "profondeur de récursion : ",
+        "reused_cells": "Cellules reprises d'un calcul interrompu : ",
+        "failed_cells": "Incomplet : les chiffres ne contiennent pas toutes les adresses, car certaines cellules n'ont pas pu être interrogées auprès de geo.admin.ch malgré plusieurs tentatives. Cliquez à nouveau sur Calculer pour n'interroger que les cellules manquantes. Cellules manquantes :",
         "no_businesses_found": "Aucune entreprise trouvée.",
         "footer_text": "🏠 **Analyse des boîtes aux lettres résidentielles** © 2024 David Oesch, [Overture Maps Foundation](https://overturemaps.org), Version Overture ",
         "footer_link": "Plus d'infos et :star: sur [github.com/davidoesch/wo-sind-briefkaesten](https://github.com/davidoesch/wo-sind-briefkaesten)"
@@ -86,10 +116,19 @@ Puoi stimare rapidamente il numero di cassette postali in un'area. Disegna sempl
         "button_calculate": "Calcola",
         "warning_draw_polygon": "Per favore, disegna prima un poligono sulla mappa.",
         "error_large_polygon": "Il poligono disegnato è più grande di 150 km². Per favore, disegna un poligono più piccolo.",
-        "warning_large_polygon": "Il poligono disegnato è più grande di 10 km². Il calcolo potrebbe richiedere molto tempo e potrebbe interrompersi a causa delle limitazioni dell'API di geo.admin.ch.",
+        "warning_large_polygon": "Il poligono disegnato è più grande di 10 km². Il calcolo viene eseguito in background e prosegue anche se chiudi la pagina; con il link qui sotto puoi tornare più tardi al risultato.",
         "progress_text": "Abitazioni: sottoinsiemi ancora da leggere: ",
         "progress_complete": "Lettura delle abitazioni completata",
         "spinner_text": "Lettura delle attività commerciali (richiede circa 1 min)...",
+        "interim_header": "Stato intermedio",
+        "businesses_pending": "Lettura delle attività commerciali in corso",
+        "businesses_interim": "Attività commerciali in Overture",
+        "job_queued": "Il calcolo è in attesa di un posto libero",
+        "job_progress": "Celle lette",
+        "job_reused": "riprese da un tentativo precedente",
+        "job_link": "Link a questo calcolo",
+        "job_failed": "Il calcolo non è riuscito",
+        "job_not_found": "Calcolo non trovato (forse scaduto).",
         "mailboxes_header": "Cassette postali",
         "mailboxes_explanation_1": "Corrisponde alla somma delle [abitazioni](https://github.com/davidoesch/wo-sind-briefkaesten/tree/master?tab=readme-ov-file#apartments) ",
         "mailboxes_explanation_2": " e alla somma delle [attività commerciali](https://github.com/davidoesch/wo-sind-briefkaesten/tree/master?tab=readme-ov-file#businesses) ",
@@ -104,6 +143,12 @@ Puoi stimare rapidamente il numero di cassette postali in un'area. Disegna sempl
         "no_addresses_found": "Nessun indirizzo trovato.",
         "no_streets_found": "Nessuna strada trovata.",
         "total_addresses": "Numero totale di indirizzi nel poligono: ",
+        "api_requests": "Richieste a api3.geo.admin.ch: ",
+        "api_requests_saved": "Richieste risparmiate rispetto alla griglia fissa: ",
+        "saturated_cells": "Celle al limite di risultati (interrogate di nuovo): ",
+        "max_depth": "profondità di ricorsione: ",
+        "reused_cells": "Celle riprese da un calcolo interrotto: ",
+        "failed_cells": "Incompleto: i numeri non contengono tutti gli indirizzi, perché alcune celle non hanno potuto essere lette da geo.admin.ch nonostante diversi tentativi. Fai di nuovo clic su Calcola per leggere solo le celle mancanti. Celle mancanti:",
         "no_businesses_found": "Nessuna attività commerciale trovata.",
         "footer_text": "🏠 **Analisi delle cassette postali residenziali** © 2024 David Oesch, [Overture Maps Foundation](https://overturemaps.org), Versione Overture ",
         "footer_link": "Maggiori informazioni e :star: su [github.com/davidoesch/wo-sind-briefkaesten](https://github.com/davidoesch/wo-sind-briefkaesten)"
@@ -122,10 +167,19 @@ You can quickly estimate the number of mailboxes in an area. Simply draw a polyg
         "button_calculate": "Calculate",
         "warning_draw_polygon": "Please draw a polygon on the map first.",
         "error_large_polygon": "The drawn polygon is larger than 150 km². Please draw a smaller polygon.",
-        "warning_large_polygon": "The drawn polygon is larger than 10 km². The calculation may take a very long time and might be interrupted due to API limitations from geo.admin.ch.",
+        "warning_large_polygon": "The drawn polygon is larger than 10 km². The calculation runs in the background and continues even if you close the page; use the link below to come back to the result later.",
         "progress_text": "Apartments: subsets left to read: ",
         "progress_complete": "Reading apartments completed",
         "spinner_text": "Reading businesses (takes about 1 min)...",
+        "interim_header": "Interim result",
+        "businesses_pending": "Reading businesses",
+        "businesses_interim": "Businesses in Overture",
+        "job_queued": "Calculation is waiting for a free slot",
+        "job_progress": "Cells queried",
+        "job_reused": "taken over from an earlier attempt",
+        "job_link": "Link to this calculation",
+        "job_failed": "The calculation failed",
+        "job_not_found": "Calculation not found (it may have expired).",
         "mailboxes_header": "Mailboxes",
         "mailboxes_explanation_1": "Corresponds to the sum of [apartments](https://github.com/davidoesch/wo-sind-briefkaesten/tree/master?tab=readme-ov-file#apartments) ",
         "mailboxes_explanation_2": " and the sum of [businesses](https://github.com/davidoesch/wo-sind-briefkaesten/tree/master?tab=readme-ov-file#businesses) ",
@@ -140,6 +194,12 @@ You can quickly estimate the number of mailboxes in an area. Simply draw a polyg
         "no_addresses_found": "No addresses found.",
         "no_streets_found": "No streets found.",
         "total_addresses": "Total number of addresses in the polygon: ",
+        "api_requests": "Requests to api3.geo.admin.ch: ",
+        "api_requests_saved": "Requests saved compared with the fixed grid: ",
+        "saturated_cells": "Cells at the result limit (re-queried): ",
+        "max_depth": "recursion depth: ",
+        "reused_cells": "Cells taken over from an interrupted run: ",
+        "failed_cells": "Incomplete: the numbers do not include all addresses because some cells could not be queried from geo.admin.ch even after several attempts. Click Calculate again to query only the missing cells. Missing cells:",
         "no_businesses_found": "No businesses found.",
         "footer_text": "🏠 **Residential Mailbox Analysis** © 2024 David Oesch, [Overture Maps Foundation](https://overturemaps.org), Overture Release ",
         "footer_link": "More info and :star: at [github.com/davidoesch/wo-sind-briefkaesten](https://github.com/davidoesch/wo-sind-briefkaesten)"